@@ -1,18 +1,18 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
+import threading
 import warnings
 
 from .config import config
-from .defaults import get_default_project
-from .factory import SigOptFactory
-from .interface import Connection
 from .run_context import global_run_context as _global_run_context
 from .sigopt_logging import enable_print_logging
 from .version import VERSION
 
 
 params = _global_run_context.params
+batch_updates = _global_run_context.batch_updates
+log_artifact = _global_run_context.log_artifact
 log_checkpoint = _global_run_context.log_checkpoint
 log_dataset = _global_run_context.log_dataset
 log_failure = _global_run_context.log_failure
@@ -21,23 +21,65 @@ log_metadata = _global_run_context.log_metadata
 log_metric = _global_run_context.log_metric
 log_metrics = _global_run_context.log_metrics
 log_model = _global_run_context.log_model
+should_stop = _global_run_context.should_stop
 config.set_context_entry(_global_run_context)
 
-_global_factory = SigOptFactory(get_default_project())
-create_run = _global_factory.create_run
-create_aiexperiment = _global_factory.create_aiexperiment
-create_experiment = _global_factory.create_experiment
-create_project = _global_factory.create_project
-get_aiexperiment = _global_factory.get_aiexperiment
-get_experiment = _global_factory.get_experiment
-archive_aiexperiment = _global_factory.archive_aiexperiment
-archive_experiment = _global_factory.archive_experiment
-unarchive_aiexperiment = _global_factory.unarchive_aiexperiment
-unarchive_experiment = _global_factory.unarchive_experiment
-archive_run = _global_factory.archive_run
-unarchive_run = _global_factory.unarchive_run
-get_run = _global_factory.get_run
-upload_runs = _global_factory.upload_runs
+# The factory, the connection and their dependencies are loaded on first use by __getattr__,
+# so that processes which only log to an existing run don't pay for them on import.
+_GLOBAL_FACTORY_METHODS = (
+  "create_run",
+  "create_aiexperiment",
+  "create_experiment",
+  "create_project",
+  "get_aiexperiment",
+  "get_experiment",
+  "archive_aiexperiment",
+  "archive_experiment",
+  "unarchive_aiexperiment",
+  "unarchive_experiment",
+  "archive_run",
+  "unarchive_run",
+  "get_run",
+  "upload_runs",
+)
+_global_factory_lock = threading.Lock()
+
+
+def _get_global_factory():
+  with _global_factory_lock:
+    global_factory = globals().get("_global_factory")
+    if global_factory is None:
+      from .defaults import get_default_project
+      from .factory import SigOptFactory as _SigOptFactory
+
+      global_factory = _SigOptFactory(get_default_project())
+      globals()["_global_factory"] = global_factory
+    return global_factory
+
+
+def __getattr__(name):
+  if name == "SigOptFactory":
+    from .factory import SigOptFactory as value
+  elif name == "Connection":
+    from .interface import Connection as value
+  elif name == "ObservationReporter":
+    from .observation_reporter import ObservationReporter as value
+  elif name == "SuggestionPool":
+    from .suggestion_pool import SuggestionPool as value
+  elif name == "_global_factory":
+    return _get_global_factory()
+  elif name in _GLOBAL_FACTORY_METHODS:
+    value = getattr(_get_global_factory(), name)
+  else:
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+  globals()[name] = value
+  return value
+
+
+def __dir__():
+  return sorted(
+    set(globals()) | {"SigOptFactory", "Connection", "ObservationReporter", "SuggestionPool", *_GLOBAL_FACTORY_METHODS}
+  )
 
 
 def load_ipython_extension(ipython):
@@ -61,4 +103,4 @@ def set_project(project):
       ),
       UserWarning,
     )
-  return _global_factory.set_project(project)
+  return _get_global_factory().set_project(project)
@@ -1,13 +1,25 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
+import concurrent.futures
 import json
 import threading
 
 from .objects import Parameter
-from .run_context import global_run_context
+from .pruning import DEFAULT_REFRESH_INTERVAL, PRUNING_RULES, Pruner
+from .run_context import RunContext, global_run_context
 from .run_factory import BaseRunFactory
-from .validate.aiexperiment_input import validate_aiexperiment_update_input
+from .sigopt_logging import print_logger
+
+
+_LOOP_FINISHED = object()
+PREFETCHED_RUN_STOPPING_REASON = "unused prefetched run"
+OPTIMIZE_EXECUTORS = ("thread", "process")
+
+
+def _run_trial_in_process(fn, run_json):
+  # runs in a worker process, which logs to the run with a connection configured from its own environment
+  fn(RunContext.from_json(run_json))
 
 
 class AIExperimentContext(BaseRunFactory):
@@ -17,6 +29,7 @@ class AIExperimentContext(BaseRunFactory):
     self._aiexperiment = aiexperiment
     self._refresh_lock = threading.Lock()
     self._connection = connection
+    self._pruner = None
 
   def refresh(self):
     """Refresh the state of the AIExperiment from the SigOpt API."""
@@ -29,11 +42,164 @@ class AIExperimentContext(BaseRunFactory):
     self.refresh()
     return self.progress.remaining_budget is not None and self.progress.remaining_budget <= 0
 
-  def loop(self, name=None):
-    """Create runs until the AIExperiment has finished."""
+  def loop(self, name=None, prefetch=False):
+    """
+    Create runs until the AIExperiment has finished.
+    With prefetch=True the budget check and the creation of the next run happen in a background thread
+    while the current run is in progress, as long as the remaining budget and parallel_bandwidth allow it.
+    """
+    if prefetch:
+      yield from self._prefetching_loop(name)
+      return
     while not self.is_finished():
       yield self.create_run(name=name)
 
+  def _prefetch_next_run(self, name):
+    if self.is_finished():
+      return _LOOP_FINISHED
+    progress = self.progress
+    # active runs have not consumed their budget yet, so only create a run ahead of time if it would still fit
+    active_run_count = progress.active_run_count or 0
+    remaining_budget = progress.remaining_budget
+    parallel_bandwidth = self.parallel_bandwidth
+    if remaining_budget is not None and remaining_budget - active_run_count <= 0:
+      return None
+    if parallel_bandwidth is not None and active_run_count >= parallel_bandwidth:
+      return None
+    return self.create_run(name=name)
+
+  def create_run_within_budget(self, name=None):
+    """Create a run if the remaining budget, minus the active runs, leaves room for it, otherwise return None."""
+    self.refresh()
+    progress = self.progress
+    remaining_budget = progress.remaining_budget
+    # active runs will consume the budget when they end, so they count as used
+    if remaining_budget is not None and remaining_budget - (progress.active_run_count or 0) <= 0:
+      return None
+    return self.create_run(name=name)
+
+  def _cancel_prefetched_run(self, run_context):
+    # the unused run is ended first so that it is not left active, then archived rather than deleted,
+    # so it stays in the history and can be unarchived
+    with run_context.batch_updates():
+      run_context.stop(PREFETCHED_RUN_STOPPING_REASON)
+      run_context.log_failure()
+    self._connection.training_runs(run_context.id).update(deleted=True)
+
+  def _prefetching_loop(self, name):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+      next_run = self._prefetch_next_run(name)
+      future = None
+      try:
+        while next_run is not _LOOP_FINISHED:
+          if next_run is None:
+            # the next run could not be created ahead of time, so check the budget again now
+            if self.is_finished():
+              break
+            next_run = self.create_run(name=name)
+          run_context, next_run = next_run, None
+          future = executor.submit(self._prefetch_next_run, name)
+          yield run_context
+          next_run, future = future.result(), None
+      finally:
+        if future is not None and future.exception() is None:
+          next_run = future.result()
+        if next_run is not None and next_run is not _LOOP_FINISHED:
+          self._cancel_prefetched_run(next_run)
+
+  def optimize(self, fn, workers=None, executor="thread", name=None, stop_on_failure=False):
+    """
+    Run fn(run) for each run of the AIExperiment on up to `workers` concurrent workers until it has finished.
+    workers defaults to and is capped at the parallel_bandwidth of the AIExperiment.
+    With executor="process" each trial runs in a separate process, so fn must be picklable.
+    With stop_on_failure=True no more runs are created once a trial fails, the trials in progress still finish.
+    Returns a list of (run_id, exception) pairs for the trials that failed, which are marked as failed runs.
+    """
+    if executor not in OPTIMIZE_EXECUTORS:
+      raise ValueError(f"executor must be one of {list(OPTIMIZE_EXECUTORS)}, got {executor!r}")
+    parallel_bandwidth = self.parallel_bandwidth or 1
+    if workers is None:
+      workers = parallel_bandwidth
+    if workers < 1:
+      raise ValueError(f"workers must be at least 1, got {workers}")
+    workers = min(workers, parallel_bandwidth)
+    stop_event = threading.Event()
+    run_lock = threading.Lock()
+    failures = []
+    failures_lock = threading.Lock()
+    process_pool = None
+    if executor == "process":
+      process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+    def run_trial(run_context):
+      if process_pool is None:
+        with run_context:
+          fn(run_context)
+      else:
+        # the run is ended by this process so that its state is set even if the worker process dies
+        with run_context:
+          process_pool.submit(_run_trial_in_process, fn, run_context.to_json()).result()
+
+    def next_run():
+      # the workers share one budget check, so that they can't all see room for the last run and each create one
+      with run_lock:
+        if stop_event.is_set():
+          return None
+        return self.create_run_within_budget(name=name)
+
+    def work():
+      for run_context in iter(next_run, None):
+        try:
+          run_trial(run_context)
+        except Exception as e:  # pylint: disable=broad-except
+          print_logger.error("Run %s failed: %r", run_context.id, e)
+          with failures_lock:
+            failures.append((run_context.id, e))
+          if stop_on_failure:
+            stop_event.set()
+        if stop_event.is_set():
+          break
+
+    thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+      for future in [thread_pool.submit(work) for _ in range(workers)]:
+        future.result()
+    except BaseException:
+      stop_event.set()
+      raise
+    finally:
+      thread_pool.shutdown(wait=True)
+      if process_pool is not None:
+        process_pool.shutdown(wait=True)
+    return failures
+
+  @property
+  def pruner(self):
+    return self._pruner
+
+  def enable_pruning(self, rule="median", metric=None, refresh_interval=DEFAULT_REFRESH_INTERVAL, **rule_options):
+    """
+    Stop unpromising runs early by comparing their checkpoints with the checkpoints of completed runs.
+    rule is one of "median" or "successive_halving", and metric defaults to the first optimized metric.
+    Runs created afterwards report the decision through run.should_stop().
+    """
+    if rule not in PRUNING_RULES:
+      raise ValueError(f"rule must be one of {sorted(PRUNING_RULES)}, got {rule!r}")
+    metrics = [m for m in self.metrics or [] if m.strategy in (None, "optimize")]
+    if metric is None:
+      if not metrics:
+        raise ValueError("The AIExperiment has no optimized metric to prune on, please provide one")
+      metric = metrics[0].name
+    objective = next((m.objective for m in metrics if m.name == metric and m.objective), "maximize")
+    rule_options.setdefault("objective", objective)
+    self._pruner = Pruner(
+      self._connection,
+      self,
+      PRUNING_RULES[rule](metric, **rule_options),
+      refresh_interval=refresh_interval,
+    )
+    return self._pruner
+
   def archive(self):
     connection = self._connection
     connection.aiexperiments(self.id).delete()
@@ -59,6 +225,8 @@ class AIExperimentContext(BaseRunFactory):
       )
     )
     run_context = self.run_context_class(connection, run, global_run_context.params)
+    if self._pruner is not None:
+      run_context.set_pruner(self._pruner)
     return run_context
 
   def get_runs(self):
@@ -95,5 +263,7 @@ class AIExperimentContext(BaseRunFactory):
     if "parameters" in kwargs:
       parameters = [self._parse_parameter(p) for p in kwargs["parameters"]]
       kwargs["parameters"] = parameters
+    from .validate.aiexperiment_input import validate_aiexperiment_update_input
+
     kwargs = validate_aiexperiment_update_input(kwargs)
     return self._connection.aiexperiments(self.id).update(**kwargs)
@@ -0,0 +1,248 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import base64
+import concurrent.futures
+import errno
+import hashlib
+import json
+import mimetypes
+import mmap
+import os
+import threading
+
+from .compat import lazy_import
+from .paths import get_root_subdir
+
+
+backoff = lazy_import("backoff")
+requests = lazy_import("requests")
+
+
+DEFAULT_MAX_UPLOAD_WORKERS = 4
+PART_UPLOAD_TIMEOUT = 300
+PART_UPLOAD_MAX_TRIES = 5
+HASH_READ_SIZE = 2**20
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+UPLOAD_STATE_IN_PROGRESS = "in_progress"
+UPLOAD_STATE_COMPLETE = "complete"
+
+
+class ArtifactSource(object):
+  """
+    Random access to the bytes of an artifact without loading them into memory.
+    Files are memory-mapped, other buffers are read with seek + read.
+    """
+
+  def __init__(self, artifact):
+    self._owned_fp = None
+    self._mmap = None
+    self._buffer = None
+    self._lock = threading.Lock()
+    self.filename = None
+    if isinstance(artifact, (str, os.PathLike)):
+      self.filename = os.fspath(artifact)
+      self._owned_fp = open(self.filename, "rb")
+      self._init_from_fp(self._owned_fp)
+    elif isinstance(artifact, (bytes, bytearray, memoryview)):
+      self._buffer = memoryview(artifact).cast("B")
+      self.size = len(self._buffer)
+    else:
+      name = getattr(artifact, "name", None)
+      self.filename = name if isinstance(name, str) else None
+      self._init_from_fp(artifact)
+
+  def _init_from_fp(self, fp):
+    self._fp = fp
+    try:
+      fileno = fp.fileno()
+    except (AttributeError, OSError, ValueError):
+      fileno = None
+    if fileno is not None:
+      size = os.fstat(fileno).st_size
+      if size:
+        self._mmap = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+      self.size = size
+    else:
+      fp.seek(0, os.SEEK_END)
+      self.size = fp.tell()
+
+  def read_range(self, offset, length):
+    if self._buffer is not None:
+      return bytes(self._buffer[offset : offset + length])
+    if self.size == 0:
+      return b""
+    with self._lock:
+      self._fp.seek(offset)
+      return self._fp.read(length)
+
+  def get_upload_body(self):
+    # files are passed through so that requests can stream them with a known Content-Length
+    if self._mmap is not None or (self._buffer is None and self.size):
+      self._fp.seek(0)
+      return self._fp
+    return self.read_range(0, self.size)
+
+  def iter_chunks(self, chunk_size=HASH_READ_SIZE):
+    for offset in range(0, self.size, chunk_size):
+      yield self.read_range(offset, chunk_size)
+
+  def close(self):
+    if self._buffer is not None and self._mmap is not None:
+      self._buffer.release()
+      self._mmap.close()
+    if self._owned_fp is not None:
+      self._owned_fp.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, typ, value, trace):
+    del trace
+    self.close()
+
+
+def get_artifact_hashes(source):
+  md5 = hashlib.md5()  # nosec
+  sha256 = hashlib.sha256()
+  for chunk in source.iter_chunks():
+    md5.update(chunk)
+    sha256.update(chunk)
+  return base64.b64encode(md5.digest()).decode(), sha256.hexdigest()
+
+
+def guess_artifact_content_type(filename):
+  if filename is None:
+    return DEFAULT_CONTENT_TYPE
+  content_type, _ = mimetypes.guess_type(filename)
+  return content_type or DEFAULT_CONTENT_TYPE
+
+
+class ArtifactIndex(object):
+  """
+    A content-addressed record of artifact uploads, stored under SIGOPT_HOME.
+    Each entry is its own file so that concurrent processes never rewrite each other's records.
+    Entries hold the state of in-progress multipart uploads so that they can be resumed.
+    """
+
+  def __init__(self, api_url, root=None):
+    if root is None:
+      root = get_root_subdir("artifacts")
+    api_url_key = hashlib.sha256(str(api_url).encode()).hexdigest()[:16]
+    self.root = os.path.join(root, api_url_key)
+
+  def _entry_path(self, sha256):
+    return os.path.join(self.root, sha256[:2], f"{sha256}.json")
+
+  def get(self, sha256):
+    try:
+      with open(self._entry_path(sha256)) as entry_fp:
+        return json.load(entry_fp)
+    except (IOError, OSError) as e:
+      if e.errno == errno.ENOENT:
+        return None
+      raise
+    except ValueError:
+      return None
+
+  def put(self, sha256, entry):
+    path = self._entry_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as entry_fp:
+      json.dump(entry, entry_fp)
+    os.replace(tmp_path, path)
+
+  def remove(self, sha256):
+    try:
+      os.remove(self._entry_path(sha256))
+    except FileNotFoundError:
+      pass
+
+
+def is_fatal_upload_error(e):
+  response = getattr(e, "response", None)
+  if response is None:
+    return False
+  return response.status_code < 500 and response.status_code != 429
+
+
+def _send_upload_request_once(upload_info, get_data):
+  response = requests.request(
+    upload_info["method"],
+    upload_info["url"],
+    headers=upload_info.get("headers"),
+    data=get_data(),
+    timeout=PART_UPLOAD_TIMEOUT,
+  )
+  response.raise_for_status()
+  return response
+
+
+def _send_upload_request(upload_info, get_data):
+  # the retry policy is built on use so that importing this module doesn't load backoff and requests
+  send_with_retries = backoff.on_exception(
+    backoff.expo,
+    requests.exceptions.RequestException,
+    max_tries=PART_UPLOAD_MAX_TRIES,
+    giveup=is_fatal_upload_error,
+    jitter=backoff.full_jitter,
+  )(_send_upload_request_once)
+  return send_with_retries(upload_info, get_data)
+
+
+def upload_single_part(source, upload_info):
+  _send_upload_request(upload_info, source.get_upload_body)
+
+
+class MultipartUpload(object):
+  """
+    Uploads the parts described by the files endpoint in parallel and then completes the upload.
+    The upload info has the form:
+      {"parts": [{"part_number", "method", "url", "headers"}, ...], "complete": {"method", "url", "headers"}}
+    where part N (counting from 1) covers the bytes starting at (N - 1) * part_size.
+    Completed parts are recorded in the ArtifactIndex entry after each part, so a failed upload
+    resumes from the last confirmed part.
+    """
+
+  def __init__(self, source, index, sha256, entry, max_workers):
+    self.source = source
+    self.index = index
+    self.sha256 = sha256
+    self.entry = entry
+    self.max_workers = max_workers
+    self._entry_lock = threading.Lock()
+
+  def _upload_part(self, part):
+    part_size = self.entry["part_size"]
+    offset = (part["part_number"] - 1) * part_size
+    response = _send_upload_request(part, lambda: self.source.read_range(offset, part_size))
+    etag = response.headers.get("ETag")
+    with self._entry_lock:
+      self.entry["completed_parts"][str(part["part_number"])] = etag
+      self.index.put(self.sha256, self.entry)
+
+  def run(self):
+    upload_info = self.entry["upload"]
+    completed_parts = self.entry.setdefault("completed_parts", {})
+    pending_parts = [part for part in upload_info["parts"] if str(part["part_number"]) not in completed_parts]
+    if pending_parts:
+      with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        for future in [executor.submit(self._upload_part, part) for part in pending_parts]:
+          future.result()
+    complete_info = upload_info["complete"]
+    response = requests.request(
+      complete_info["method"],
+      complete_info["url"],
+      headers=complete_info.get("headers"),
+      json={
+        "parts": [
+          {"part_number": int(part_number), "etag": etag}
+          for part_number, etag in sorted(completed_parts.items(), key=lambda item: int(item[0]))
+        ]
+      },
+      timeout=PART_UPLOAD_TIMEOUT,
+    )
+    response.raise_for_status()
@@ -6,6 +6,8 @@ from .experiment_file import experiment_file_option
 from .experiment_id import experiment_id_argument
 from .load_yaml import load_yaml_callback
 from .project import project_name_option, project_option
+from .pruner import pruner_option
 from .run_file import run_file_option
 from .source_file import source_file_option
 from .validate import validate_id, validate_ids
+from .workers import cpu_affinity_option, workers_option
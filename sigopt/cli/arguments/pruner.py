@@ -0,0 +1,16 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import click
+
+from sigopt.pruning import PRUNING_RULES
+
+
+pruner_option = click.option(
+  "--pruner",
+  type=click.Choice(sorted(PRUNING_RULES)),
+  help="""
+  Stop runs early when their checkpoints fall behind the completed runs of the AIExperiment.
+  Runs are compared on the first optimized metric.
+  """,
+)
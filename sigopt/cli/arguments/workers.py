@@ -0,0 +1,21 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import click
+
+
+workers_option = click.option(
+  "-w",
+  "--workers",
+  type=click.IntRange(min=1),
+  help="""
+  The number of runs to execute concurrently.
+  Defaults to the parallel bandwidth of the AIExperiment, limited by the number of CPUs.
+  """,
+)
+
+cpu_affinity_option = click.option(
+  "--cpu-affinity/--no-cpu-affinity",
+  default=False,
+  help="Pin each worker to its own share of the available CPUs.",
+)
@@ -1,12 +1,5 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
-import sigopt.cli.commands.config
-import sigopt.cli.commands.experiment
-import sigopt.cli.commands.init
-import sigopt.cli.commands.local
-import sigopt.cli.commands.project
-import sigopt.cli.commands.training_run
-import sigopt.cli.commands.version
-
+# subcommands are imported on demand, see the lazy_subcommands of each group in .base
 from .base import sigopt_cli
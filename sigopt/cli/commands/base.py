@@ -5,24 +5,58 @@ import click
 
 from sigopt.config import config
 
+from ..lazy_group import LazyGroup
 from ..utils import setup_cli
 
 
-@click.group()
+@click.group(
+  cls=LazyGroup,
+  lazy_subcommands={
+    "config": ("sigopt.cli.commands.config", "Configure the SigOpt client."),
+    "init": ("sigopt.cli.commands.init", "Initialize a directory for a SigOpt project."),
+    "local-server": ("sigopt.cli.commands.local_server", "Serve the SigOpt runs API from a local database."),
+    "optimize": ("sigopt.cli.commands.local.optimize", "Run a SigOpt AIExperiment."),
+    "proxy": ("sigopt.cli.commands.proxy", "Forward SigOpt API requests through a shared connection pool."),
+    "run": ("sigopt.cli.commands.local.run", "Create a SigOpt Run."),
+    "start-worker": ("sigopt.cli.commands.local.start_worker", "Start a worker for the given AIExperiment."),
+    "version": ("sigopt.cli.commands.version", "Show the installed SigOpt version."),
+  },
+)
 def sigopt_cli():
   setup_cli(config)
 
 
-@sigopt_cli.group("create")
+@sigopt_cli.group(
+  "create",
+  cls=LazyGroup,
+  lazy_subcommands={
+    "experiment": ("sigopt.cli.commands.experiment.create", "Create a SigOpt AIExperiment."),
+    "project": ("sigopt.cli.commands.project.create", "Create a SigOpt Project."),
+  },
+)
 def create_command():
   """Commands for creating SigOpt Objects."""
 
 
-@sigopt_cli.group("archive")
+@sigopt_cli.group(
+  "archive",
+  cls=LazyGroup,
+  lazy_subcommands={
+    "experiment": ("sigopt.cli.commands.experiment.archive", "Archive SigOpt Experiments."),
+    "run": ("sigopt.cli.commands.training_run.archive", "Archive SigOpt Runs."),
+  },
+)
 def archive_command():
   """Commands for archiving SigOpt Objects."""
 
 
-@sigopt_cli.group("unarchive")
+@sigopt_cli.group(
+  "unarchive",
+  cls=LazyGroup,
+  lazy_subcommands={
+    "experiment": ("sigopt.cli.commands.experiment.unarchive", "Unarchive SigOpt Experiments."),
+    "run": ("sigopt.cli.commands.training_run.unarchive", "Unarchive SigOpt Runs."),
+  },
+)
 def unarchive_command():
   """Commands for unarchiving SigOpt Objects."""
@@ -1,6 +1,3 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
-import sigopt.cli.commands.experiment.archive
-import sigopt.cli.commands.experiment.create
-import sigopt.cli.commands.experiment.unarchive
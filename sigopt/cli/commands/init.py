@@ -4,7 +4,6 @@
 import os
 
 import click
-import pkg_resources
 
 from .base import sigopt_cli
 
@@ -20,6 +19,8 @@ def write_file(path, resource):
   else:
     should_write = True
   if should_write:
+    import pkg_resources
+
     contents = pkg_resources.resource_string("sigopt.cli.resources", resource)
     with open(path, "wb") as fp:
       fp.write(contents)
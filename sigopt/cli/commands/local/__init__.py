@@ -1,6 +1,3 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
-import sigopt.cli.commands.local.optimize
-import sigopt.cli.commands.local.run
-import sigopt.cli.commands.local.start_worker
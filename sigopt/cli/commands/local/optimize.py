@@ -3,8 +3,8 @@
 # SPDX-License-Identifier: MIT
 from sigopt.config import config
 
-from ...arguments import project_option, source_file_option
-from ...utils import cli_experiment_loop, create_aiexperiment_from_validated_data
+from ...arguments import cpu_affinity_option, project_option, pruner_option, source_file_option, workers_option
+from ...utils import cli_experiment_loop, create_aiexperiment_from_validated_data, get_cli_worker_count
 from ..base import sigopt_cli
 from ..optimize_base import optimize_command
 
@@ -18,7 +18,19 @@ from ..optimize_base import optimize_command
 @optimize_command
 @source_file_option
 @project_option
-def optimize(command, run_options, experiment_file, source_file, project):
+@workers_option
+@cpu_affinity_option
+@pruner_option
+def optimize(command, run_options, experiment_file, source_file, project, workers, cpu_affinity, pruner):
   """Run a SigOpt AIExperiment. Requires a path to an experiment YAML file."""
   experiment = create_aiexperiment_from_validated_data(experiment_file, project)
-  cli_experiment_loop(config, experiment, command, run_options, source_file)
+  cli_experiment_loop(
+    config,
+    experiment,
+    command,
+    run_options,
+    source_file,
+    workers=get_cli_worker_count(experiment, workers),
+    cpu_affinity=cpu_affinity,
+    pruner=pruner,
+  )
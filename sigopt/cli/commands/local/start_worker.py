@@ -6,8 +6,14 @@ import click
 from sigopt.config import config
 from sigopt.factory import SigOptFactory
 
-from ...arguments import experiment_id_argument, source_file_option
-from ...utils import cli_experiment_loop
+from ...arguments import (
+  cpu_affinity_option,
+  experiment_id_argument,
+  pruner_option,
+  source_file_option,
+  workers_option,
+)
+from ...utils import cli_experiment_loop, get_cli_worker_count
 from ..base import sigopt_cli
 from ..run_base import run_command
 
@@ -21,7 +27,10 @@ from ..run_base import run_command
 @experiment_id_argument
 @run_command
 @source_file_option
-def start_worker(experiment_id, command, run_options, source_file):
+@workers_option
+@cpu_affinity_option
+@pruner_option
+def start_worker(experiment_id, command, run_options, source_file, workers, cpu_affinity, pruner):
   """Start a worker for the given AIExperiment."""
   factory = SigOptFactory.from_default_project()
   factory.set_up_cli()
@@ -29,4 +38,13 @@ def start_worker(experiment_id, command, run_options, source_file):
     experiment = factory.get_aiexperiment(experiment_id)
   except ValueError as ve:
     raise click.ClickException(str(ve))
-  cli_experiment_loop(config, experiment, command, run_options, source_file)
+  cli_experiment_loop(
+    config,
+    experiment,
+    command,
+    run_options,
+    source_file,
+    workers=get_cli_worker_count(experiment, workers),
+    cpu_affinity=cpu_affinity,
+    pruner=pruner,
+  )
@@ -0,0 +1,68 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import click
+
+from sigopt.interface import DRIVER_KEY_HTTP, Connection
+from sigopt.local_server import (
+  DEFAULT_LOCAL_SERVER_HOST,
+  DEFAULT_LOCAL_SERVER_PORT,
+  DEFAULT_UPSTREAM_BATCH_SIZE,
+  DEFAULT_UPSTREAM_SYNC_INTERVAL,
+  UpstreamSync,
+  create_local_server,
+)
+from sigopt.sigopt_logging import print_logger
+
+from .base import sigopt_cli
+
+
+@sigopt_cli.command("local-server")
+@click.option("--host", default=DEFAULT_LOCAL_SERVER_HOST, show_default=True, help="The address to listen on.")
+@click.option("--port", default=DEFAULT_LOCAL_SERVER_PORT, show_default=True, type=int, help="The port to listen on.")
+@click.option(
+  "--db",
+  "db_path",
+  type=click.Path(dir_okay=False),
+  help="The SQLite database that stores the runs, defaults to the one used by the sqlite driver.",
+)
+@click.option("--upstream-url", help="Upload finished runs in batches to the SigOpt API at this URL.")
+@click.option(
+  "--upstream-sync-interval",
+  default=DEFAULT_UPSTREAM_SYNC_INTERVAL,
+  show_default=True,
+  type=click.IntRange(min=1),
+  help="Seconds between uploads to the upstream API.",
+)
+@click.option(
+  "--upstream-batch-size",
+  default=DEFAULT_UPSTREAM_BATCH_SIZE,
+  show_default=True,
+  type=click.IntRange(min=1),
+  help="Maximum number of runs in each upload to the upstream API.",
+)
+def local_server(host, port, db_path, upstream_url, upstream_sync_interval, upstream_batch_size):
+  """Serve the SigOpt runs API from a local database, so that many workers can log runs without a round trip to the
+  SigOpt API for each update."""
+  server = create_local_server(path=db_path, host=host, port=port)
+  upstream_sync = None
+  if upstream_url:
+    upstream_sync = UpstreamSync(
+      server.driver,
+      Connection(driver=DRIVER_KEY_HTTP, api_url=upstream_url),
+      batch_size=upstream_batch_size,
+    )
+    upstream_sync.start(upstream_sync_interval)
+  print_logger.info("Serving the runs in %s at %s", server.driver.path, server.api_url)
+  print_logger.info("To log runs to this server, set the SIGOPT_API_URL environment variable of the workers:")
+  print_logger.info("> export SIGOPT_API_URL='%s'", server.api_url)
+  print_logger.info("SIGOPT_API_TOKEN must still be set, but the local server accepts any token.")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    if upstream_sync is not None:
+      upstream_sync.stop()
+      upstream_sync.flush()
@@ -1,4 +1,3 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
-import sigopt.cli.commands.project.create
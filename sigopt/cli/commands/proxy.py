@@ -0,0 +1,53 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import click
+
+from sigopt.proxy import DEFAULT_PROXY_MAX_CONNECTIONS, DEFAULT_PROXY_REQUESTS_PER_SECOND, create_proxy_server
+from sigopt.proxy_driver import get_default_proxy_socket_path
+from sigopt.sigopt_logging import print_logger
+
+from .base import sigopt_cli
+
+
+@sigopt_cli.command()
+@click.option(
+  "--socket",
+  "socket_path",
+  type=click.Path(dir_okay=False),
+  help="The Unix socket to listen on, defaults to $SIGOPT_PROXY_SOCKET or proxy.sock in the SigOpt home directory.",
+)
+@click.option(
+  "--max-connections",
+  default=DEFAULT_PROXY_MAX_CONNECTIONS,
+  show_default=True,
+  type=click.IntRange(min=1),
+  help="Maximum number of requests sent to the SigOpt API at the same time.",
+)
+@click.option(
+  "--max-requests-per-second",
+  default=DEFAULT_PROXY_REQUESTS_PER_SECOND,
+  show_default=True,
+  type=click.FloatRange(min=0),
+  help="Rate limit shared by all the processes that use the proxy, 0 disables it.",
+)
+def proxy(socket_path, max_connections, max_requests_per_second):
+  """Forward the SigOpt API requests of the processes on this machine through one shared connection pool."""
+  socket_path = socket_path or get_default_proxy_socket_path()
+  try:
+    server = create_proxy_server(
+      socket_path,
+      max_connections=max_connections,
+      requests_per_second=max_requests_per_second,
+    )
+  except ValueError as ve:
+    raise click.ClickException(str(ve))
+  print_logger.info("Forwarding SigOpt API requests from %s", socket_path)
+  print_logger.info("To send the requests of a process through the proxy, set its environment variables:")
+  print_logger.info("> export SIGOPT_DRIVER=proxy SIGOPT_PROXY_SOCKET='%s'", socket_path)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
@@ -1,5 +1,3 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
-import sigopt.cli.commands.training_run.archive
-import sigopt.cli.commands.training_run.unarchive
@@ -0,0 +1,42 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import importlib
+
+import click
+
+
+class LazyGroup(click.Group):
+  """
+    A click group that imports the module of a subcommand only when the subcommand is used.
+    lazy_subcommands maps each subcommand name to a (module, short_help) pair, where the module registers the
+    subcommand on this group and short_help is listed by --help, so that listing the subcommands imports none of them.
+    """
+
+  def __init__(self, *args, lazy_subcommands=None, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.lazy_subcommands = dict(lazy_subcommands or {})
+
+  def list_commands(self, ctx):
+    return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+  def get_command(self, ctx, cmd_name):
+    if cmd_name not in self.commands and cmd_name in self.lazy_subcommands:
+      module, _ = self.lazy_subcommands[cmd_name]
+      importlib.import_module(module)
+      if cmd_name not in self.commands:
+        raise RuntimeError(f"{module} did not register the {cmd_name!r} command")
+    return super().get_command(ctx, cmd_name)
+
+  def format_commands(self, ctx, formatter):
+    rows = []
+    for cmd_name in self.list_commands(ctx):
+      cmd = self.commands.get(cmd_name)
+      if cmd is None:
+        _, short_help = self.lazy_subcommands[cmd_name]
+        rows.append((cmd_name, short_help))
+      elif not cmd.hidden:
+        rows.append((cmd_name, cmd.get_short_help_str(formatter.width - 6 - len(cmd_name))))
+    if rows:
+      with formatter.section("Commands"):
+        formatter.write_dl(rows)
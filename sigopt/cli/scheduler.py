@@ -0,0 +1,209 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import contextlib
+import glob
+import math
+import os
+import re
+import threading
+
+from sigopt.lib import is_mapping, is_number
+
+
+MEMORY_SUFFIXES = {
+  "": 1,
+  "k": 10**3,
+  "m": 10**6,
+  "g": 10**9,
+  "t": 10**12,
+  "ki": 2**10,
+  "mi": 2**20,
+  "gi": 2**30,
+  "ti": 2**40,
+}
+MEMORY_QUANTITY = re.compile(r"\A\s*([0-9]*\.?[0-9]+)\s*([kmgt]i?)?b?\s*\Z", re.IGNORECASE)
+NUMA_NODE_PATH = "/sys/devices/system/node"
+
+
+def parse_cpu_quantity(value):
+  # accepts a number of cores, or millicores in the kubernetes style, ex. "500m"
+  if isinstance(value, str) and value.endswith("m"):
+    value = float(value[:-1]) / 1000
+  elif isinstance(value, str):
+    value = float(value)
+  if not is_number(value) or value <= 0:
+    raise ValueError(f"cpu must be a positive number of cores, got {value!r}")
+  return math.ceil(value)
+
+
+def parse_memory_quantity(value):
+  # accepts a number of bytes, or a quantity with a suffix, ex. "512Mi" or "2G"
+  if is_number(value):
+    if value <= 0:
+      raise ValueError(f"memory must be a positive number of bytes, got {value!r}")
+    return int(value)
+  match = MEMORY_QUANTITY.match(str(value))
+  if not match:
+    raise ValueError(f"memory must be a number of bytes or a quantity like '512Mi' or '2G', got {value!r}")
+  number, suffix = match.groups()
+  return int(float(number) * MEMORY_SUFFIXES[(suffix or "").lower()])
+
+
+def parse_cpu_list(cpu_list):
+  cpus = set()
+  for cpu_range in cpu_list.strip().split(","):
+    if not cpu_range:
+      continue
+    start, _, end = cpu_range.partition("-")
+    cpus.update(range(int(start), int(end or start) + 1))
+  return cpus
+
+
+class ResourceRequest(object):
+  def __init__(self, cpus=None, memory=None, numa_node=None):
+    self.cpus = cpus
+    self.memory = memory
+    self.numa_node = numa_node
+
+  @classmethod
+  def from_run_options(cls, resources):
+    """
+      Reads the `resources` section of a run file. Resources can be provided at the top level,
+      or in a `requests` mapping as in the kubernetes style. Unrecognized keys, ex. `gpus`, are ignored.
+      """
+    if not resources:
+      return None
+    requests = resources.get("requests", resources)
+    if not is_mapping(requests):
+      raise ValueError("resources.requests must be a mapping")
+    cpus = requests.get("cpu", requests.get("cpus"))
+    memory = requests.get("memory")
+    numa_node = requests.get("numa_node")
+    if cpus is None and memory is None and numa_node is None:
+      return None
+    if numa_node is not None and (not isinstance(numa_node, int) or isinstance(numa_node, bool) or numa_node < 0):
+      raise ValueError(f"numa_node must be a non-negative integer, got {numa_node!r}")
+    return cls(
+      cpus=None if cpus is None else parse_cpu_quantity(cpus),
+      memory=None if memory is None else parse_memory_quantity(memory),
+      numa_node=numa_node,
+    )
+
+
+class Allocation(object):
+  def __init__(self, cpus, memory):
+    self.cpus = cpus
+    self.memory = memory
+
+
+def get_available_cpus():
+  if hasattr(os, "sched_getaffinity"):
+    return set(os.sched_getaffinity(0))
+  return set(range(os.cpu_count() or 1))
+
+
+def get_total_memory():
+  try:
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+  except (AttributeError, ValueError, OSError):
+    return None
+
+
+def get_numa_nodes(available_cpus):
+  nodes = {}
+  for node_path in glob.glob(os.path.join(NUMA_NODE_PATH, "node[0-9]*")):
+    try:
+      with open(os.path.join(node_path, "cpulist")) as cpu_list_fp:
+        node_cpus = parse_cpu_list(cpu_list_fp.read())
+    except OSError:
+      continue
+    nodes[int(os.path.basename(node_path)[len("node") :])] = node_cpus & available_cpus
+  if not nodes:
+    nodes[0] = set(available_cpus)
+  return nodes
+
+
+class LocalResourceScheduler(object):
+  """
+    Packs concurrent runs onto the CPUs and memory of this host.
+    A run waits in allocate() until its request fits into the free capacity.
+    CPUs are taken from the NUMA node with the fewest free CPUs that can still fit the request,
+    which keeps runs on a single node and leaves larger gaps for larger requests.
+    Memory is only accounted for when packing runs, it is not enforced as a limit on the programs.
+    """
+
+  def __init__(self, cpus=None, memory=None, numa_nodes=None):
+    available_cpus = get_available_cpus() if cpus is None else set(cpus)
+    self.total_memory = get_total_memory() if memory is None else memory
+    self.numa_nodes = get_numa_nodes(available_cpus) if numa_nodes is None else numa_nodes
+    self.free_cpus = {node: set(node_cpus) for node, node_cpus in self.numa_nodes.items()}
+    self.free_memory = self.total_memory
+    self.condition = threading.Condition()
+
+  def _candidate_nodes(self, request):
+    if request.numa_node is not None:
+      return [request.numa_node]
+    return sorted(self.free_cpus, key=lambda node: (len(self.free_cpus[node]), node))
+
+  def check_request(self, request):
+    if request.numa_node is not None and request.numa_node not in self.numa_nodes:
+      raise ValueError(f"NUMA node {request.numa_node} is not available on this host")
+    if request.cpus is not None:
+      candidate_sizes = [len(self.numa_nodes[node]) for node in self._candidate_nodes(request)]
+      if request.numa_node is None:
+        candidate_sizes.append(sum(len(node_cpus) for node_cpus in self.numa_nodes.values()))
+      if request.cpus > max(candidate_sizes):
+        raise ValueError(f"The run requests {request.cpus} CPUs but only {max(candidate_sizes)} are available")
+    if request.memory is not None and self.total_memory is not None and request.memory > self.total_memory:
+      raise ValueError(f"The run requests {request.memory} bytes of memory but only {self.total_memory} are available")
+
+  def _try_allocate(self, request):
+    if request.memory is not None and self.free_memory is not None and request.memory > self.free_memory:
+      return None
+    cpus = None
+    if request.cpus is not None:
+      for node in self._candidate_nodes(request):
+        if len(self.free_cpus[node]) >= request.cpus:
+          cpus = sorted(self.free_cpus[node])[: request.cpus]
+          break
+      else:
+        if request.numa_node is not None:
+          return None
+        # no single node has enough free CPUs, so spread the run across nodes
+        all_free_cpus = sorted(cpu for node_cpus in self.free_cpus.values() for cpu in node_cpus)
+        if len(all_free_cpus) < request.cpus:
+          return None
+        cpus = all_free_cpus[: request.cpus]
+    elif request.numa_node is not None:
+      cpus = sorted(self.numa_nodes[request.numa_node])
+    if request.cpus is not None:
+      for node_cpus in self.free_cpus.values():
+        node_cpus.difference_update(cpus)
+    if request.memory is not None and self.free_memory is not None:
+      self.free_memory -= request.memory
+    return Allocation(cpus=cpus, memory=request.memory)
+
+  def _release(self, request, allocation):
+    with self.condition:
+      if request.cpus is not None:
+        for cpu in allocation.cpus:
+          for node, node_cpus in self.numa_nodes.items():
+            if cpu in node_cpus:
+              self.free_cpus[node].add(cpu)
+      if request.memory is not None and self.free_memory is not None:
+        self.free_memory += request.memory
+      self.condition.notify_all()
+
+  @contextlib.contextmanager
+  def allocate(self, request):
+    self.check_request(request)
+    with self.condition:
+      allocation = self._try_allocate(request)
+      while allocation is None:
+        self.condition.wait()
+        allocation = self._try_allocate(request)
+    try:
+      yield allocation
+    finally:
+      self._release(request, allocation)
@@ -1,6 +1,8 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
+import concurrent.futures
+import contextlib
 import errno
 import io
 import os
@@ -8,22 +10,23 @@ import shlex
 import signal
 import subprocess  # nosec
 import sys
+import tempfile
 import threading
 
 import click
 
-from sigopt.factory import SigOptFactory
-from sigopt.run_context import GlobalRunContext
 from sigopt.sigopt_logging import enable_print_logging, print_logger
 
-from .arguments.load_yaml import ValidatedData
+
+DEFAULT_STOP_CHECK_INTERVAL = 10
 
 
 class StreamThread(threading.Thread):
-  def __init__(self, input_stream, output_stream):
+  def __init__(self, input_stream, output_stream, prefix=None):
     super().__init__()
     self.input_stream = input_stream
     self.output_stream = output_stream
+    self.prefix = prefix
     self.buffer = io.StringIO()
     self.lock = threading.Lock()
 
@@ -42,7 +45,8 @@ class StreamThread(threading.Thread):
         data = "Failed to decode binary data to utf-8"
       finally:
         self.buffer.write(data)
-        self.output_stream.write(data)
+        # the prefix tells apart the output of concurrent runs, the collected logs don't need it
+        self.output_stream.write(data if self.prefix is None else self.prefix + data)
 
   def stop(self):
     with self.lock:
@@ -51,6 +55,35 @@ class StreamThread(threading.Thread):
     return self.buffer.getvalue()
 
 
+class StopCheckThread(threading.Thread):
+  def __init__(self, proc, stop_check, interval):
+    super().__init__(daemon=True)
+    self.proc = proc
+    self.stop_check = stop_check
+    self.interval = interval
+    self.stopped = threading.Event()
+    self.reason = None
+
+  def run(self):
+    while not self.stopped.wait(self.interval):
+      if self.proc.poll() is not None:
+        return
+      try:
+        reason = self.stop_check()
+      except Exception as e:
+        print_logger.warning("failed to check if the run should stop: %s", e)
+        continue
+      if reason:
+        self.reason = reason
+        self.proc.terminate()
+        return
+
+  def stop(self):
+    self.stopped.set()
+    self.join()
+    return self.reason
+
+
 def get_git_hexsha():
   try:
     import git
@@ -64,20 +97,84 @@ def get_git_hexsha():
     return None
 
 
-def get_subprocess_environment(config, run_context, env=None):
+def get_subprocess_environment(config, run_context, env=None, context_file=None):
+  from sigopt.run_context import GlobalRunContext
+
   config.set_context_entry(GlobalRunContext(run_context))
   ret = os.environ.copy()
-  ret.update(config.get_environment_context())
+  # the context that this process received is included in the context of the child
+  ret.pop(config.CONTEXT_ENVIRONMENT_KEY, None)
+  ret.pop(config.CONTEXT_FILE_ENVIRONMENT_KEY, None)
+  ret.update(config.get_environment_context(context_file=context_file))
   ret.update(env or {})
   return ret
 
 
-def run_subprocess(config, run_context, commands, env=None):
-  return run_subprocess_command(config, run_context, cmd=commands, env=env)
+@contextlib.contextmanager
+def subprocess_context_file():
+  # readable only by the current user, and removed once the subprocess has finished
+  context_file = tempfile.NamedTemporaryFile("w", prefix="sigopt-context-", suffix=".json", delete=False)
+  try:
+    with context_file:
+      yield context_file
+  finally:
+    os.remove(context_file.name)
+
+
+def run_subprocess(
+  config,
+  run_context,
+  commands,
+  env=None,
+  cpus=None,
+  stop_check=None,
+  output_prefix=None,
+):
+  return run_subprocess_command(
+    config,
+    run_context,
+    cmd=commands,
+    env=env,
+    cpus=cpus,
+    stop_check=stop_check,
+    output_prefix=output_prefix,
+  )
+
+
+def run_subprocess_command(
+  config,
+  run_context,
+  cmd,
+  env=None,
+  cpus=None,
+  stop_check=None,
+  stop_check_interval=None,
+  output_prefix=None,
+):
+  with subprocess_context_file() as context_file:
+    env = get_subprocess_environment(config, run_context, env, context_file=context_file)
+    return _run_subprocess_with_environment(
+      config,
+      run_context,
+      cmd,
+      env,
+      cpus,
+      stop_check,
+      stop_check_interval,
+      output_prefix,
+    )
 
 
-def run_subprocess_command(config, run_context, cmd, env=None):
-  env = get_subprocess_environment(config, run_context, env)
+def _run_subprocess_with_environment(
+  config,
+  run_context,
+  cmd,
+  env,
+  cpus,
+  stop_check,
+  stop_check_interval,
+  output_prefix,
+):
   proc_stdout, proc_stderr = subprocess.PIPE, subprocess.PIPE
   try:
     proc = subprocess.Popen(
@@ -104,9 +201,22 @@ def run_subprocess_command(config, run_context, cmd, env=None):
       elif is_sh and not is_executable:
         msg += f"\nPlease make your shell script executable, ex:\n$ chmod +x {ose.filename}"
     raise click.ClickException(msg) from ose
-  stdout, stderr = StreamThread(proc.stdout, sys.stdout), StreamThread(proc.stderr, sys.stderr)
+  if cpus is not None:
+    # set right after the program starts, so that the threads it starts, ex. BLAS or OpenMP, inherit the mask
+    try:
+      os.sched_setaffinity(proc.pid, list(cpus))
+    except ProcessLookupError:
+      pass
+  stdout = StreamThread(proc.stdout, sys.stdout, prefix=output_prefix)
+  stderr = StreamThread(proc.stderr, sys.stderr, prefix=output_prefix)
   stdout.start()
   stderr.start()
+  stop_check_thread = None
+  if stop_check is not None:
+    if stop_check_interval is None:
+      stop_check_interval = DEFAULT_STOP_CHECK_INTERVAL
+    stop_check_thread = StopCheckThread(proc, stop_check, stop_check_interval)
+    stop_check_thread.start()
   return_code = 0
   try:
     return_code = proc.wait()
@@ -118,6 +228,8 @@ def run_subprocess_command(config, run_context, cmd, env=None):
     proc.wait()
     raise
   finally:
+    if stop_check_thread is not None:
+      stop_check_thread.stop()
     stdout_content, stderr_content = stdout.stop(), stderr.stop()
     if config.log_collection_enabled:
       run_context.set_logs(
@@ -129,7 +241,15 @@ def run_subprocess_command(config, run_context, cmd, env=None):
   return return_code
 
 
-def run_user_program(config, run_context, commands, source_code_content):
+def run_user_program(
+  config,
+  run_context,
+  commands,
+  source_code_content,
+  cpus=None,
+  pruner=None,
+  output_prefix=None,
+):
   source_code = {}
   git_hash = get_git_hexsha()
   if git_hash:
@@ -137,7 +257,32 @@ def run_user_program(config, run_context, commands, source_code_content):
   if source_code_content is not None:
     source_code["content"] = source_code_content
   run_context.log_source_code(**source_code)
-  exit_code = run_subprocess(config, run_context, commands)
+  stopping_reasons = []
+  stop_check = None
+  if pruner is not None:
+
+    def stop_check():
+      reason = pruner.check_run(run_context.id)
+      if reason:
+        stopping_reasons.append(reason)
+      return reason
+
+  exit_code = run_subprocess(
+    config,
+    run_context,
+    commands,
+    cpus=cpus,
+    stop_check=stop_check,
+    output_prefix=output_prefix,
+  )
+  if stopping_reasons:
+    print_logger.info("run was stopped early: %s", stopping_reasons[0])
+    run_context.stop(stopping_reasons[0])
+    # the program was terminated before it could log its metrics, so report the last checkpoint instead
+    curve = pruner.fetch_curve(run_context.id)
+    if curve:
+      run_context.log_metric(pruner.metric, curve[-1])
+    return exit_code
   if exit_code != 0:
     print_logger.error("command exited with non-zero status: %s", exit_code)
   return exit_code
@@ -149,12 +294,133 @@ def setup_cli(config):
 
 
 def create_aiexperiment_from_validated_data(experiment_file, project):
+  from sigopt.factory import SigOptFactory
+
+  from .arguments.load_yaml import ValidatedData
+
   assert isinstance(experiment_file, ValidatedData)
   factory = SigOptFactory(project)
   return factory.create_prevalidated_aiexperiment(experiment_file.data)
 
 
-def cli_experiment_loop(config, experiment, command, run_options, source_code_content):
-  for run_context in experiment.loop(name=run_options.get("name")):
-    with run_context:
-      run_user_program(config, run_context, command, source_code_content)
+def get_cli_worker_count(experiment, workers):
+  if workers is not None:
+    return workers
+  return max(1, min(experiment.parallel_bandwidth or 1, os.cpu_count() or 1))
+
+
+def get_cpu_partitions(workers):
+  if not hasattr(os, "sched_getaffinity"):
+    raise click.ClickException("CPU affinity is not supported on this platform.")
+  cpus = sorted(os.sched_getaffinity(0))
+  if len(cpus) < workers:
+    raise click.ClickException(f"Cannot pin {workers} workers to {len(cpus)} available CPUs.")
+  partition_size, remainder = divmod(len(cpus), workers)
+  partitions = []
+  start = 0
+  for index in range(workers):
+    end = start + partition_size + (1 if index < remainder else 0)
+    partitions.append(cpus[start:end])
+    start = end
+  return partitions
+
+
+def get_resource_request(run_options, cpu_affinity=False):
+  from .scheduler import ResourceRequest
+
+  try:
+    resource_request = ResourceRequest.from_run_options(run_options.get("resources"))
+  except ValueError as ve:
+    raise click.ClickException(f"Invalid resources in the run file: {ve}") from ve
+  requests_cpus = resource_request and (resource_request.cpus is not None or resource_request.numa_node is not None)
+  if cpu_affinity and requests_cpus:
+    raise click.ClickException("--cpu-affinity cannot be used when the run file requests cpu or numa_node resources.")
+  return resource_request
+
+
+def cli_experiment_loop(
+  config,
+  experiment,
+  command,
+  run_options,
+  source_code_content,
+  workers=1,
+  cpu_affinity=False,
+  pruner=None,
+):
+  from .scheduler import LocalResourceScheduler
+
+  stop_event = threading.Event()
+  if pruner is not None:
+    try:
+      experiment.enable_pruning(rule=pruner)
+    except ValueError as ve:
+      raise click.ClickException(str(ve)) from ve
+  resource_request = get_resource_request(run_options, cpu_affinity=cpu_affinity)
+  scheduler = None
+  if resource_request:
+    scheduler = LocalResourceScheduler()
+    try:
+      scheduler.check_request(resource_request)
+    except ValueError as ve:
+      raise click.ClickException(str(ve)) from ve
+
+  def allocate():
+    if scheduler is None:
+      return contextlib.nullcontext()
+    return scheduler.allocate(resource_request)
+
+  run_name = run_options.get("name")
+  if workers == 1:
+    runs = experiment.loop(name=run_name)
+
+    def next_run():
+      return next(runs, None)
+
+  else:
+    run_lock = threading.Lock()
+
+    def next_run():
+      # the workers share one budget check, so that they can't all see room for the last run and each create one
+      with run_lock:
+        return experiment.create_run_within_budget(name=run_name)
+
+  def work(cpus):
+    try:
+      while not stop_event.is_set():
+        # resources are acquired before the next run is created so that queued trials don't hold open runs
+        with allocate() as allocation:
+          run_context = next_run()
+          if run_context is None:
+            break
+          run_cpus = cpus
+          # the requested memory only limits how many runs are packed onto the host, the program is not capped by it
+          if allocation is not None and allocation.cpus is not None:
+            run_cpus = allocation.cpus
+          with run_context:
+            run_user_program(
+              config,
+              run_context,
+              command,
+              source_code_content,
+              cpus=run_cpus,
+              pruner=experiment.pruner,
+              output_prefix=None if workers == 1 else f"[run {run_context.id}] ",
+            )
+    except BaseException:
+      stop_event.set()
+      raise
+
+  cpu_partitions = get_cpu_partitions(workers) if cpu_affinity else [None] * workers
+  if workers == 1:
+    work(cpu_partitions[0])
+    return
+  with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+    futures = [executor.submit(work, cpus) for cpus in cpu_partitions]
+    try:
+      for future in futures:
+        future.result()
+    except BaseException:
+      # let the other workers finish their current runs without starting new ones
+      stop_event.set()
+      raise
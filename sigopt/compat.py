@@ -2,6 +2,11 @@
 #
 # SPDX-License-Identifier: MIT
 # pylint: disable=unused-import
+import importlib.util
+import sys
+import threading
+import types
+
 
 try:
   import json
@@ -12,3 +17,41 @@ except ImportError:
     raise ImportError(
       "No json library installed. Try running `pip install simplejson` to install a compatible json library."
     ) from ie
+
+
+_lazy_import_lock = threading.RLock()
+_loading_modules = set()
+
+
+class _LazyModule(types.ModuleType):
+  # importlib.util.LazyLoader is not thread safe before python 3.12, a thread could see the module half executed
+  def __getattribute__(self, attr):
+    with _lazy_import_lock:
+      if type(self) is _LazyModule:
+        spec = types.ModuleType.__getattribute__(self, "__spec__")
+        # the module can access its own attributes while it is executed by this thread
+        if spec.name not in _loading_modules:
+          _loading_modules.add(spec.name)
+          try:
+            spec.loader.exec_module(self)
+          finally:
+            _loading_modules.discard(spec.name)
+          self.__class__ = types.ModuleType
+    return types.ModuleType.__getattribute__(self, attr)
+
+
+def lazy_import(name):
+  """
+    Returns a module that is only executed when one of its attributes is first accessed.
+    Used for heavy dependencies that most short-lived processes never touch.
+    """
+  with _lazy_import_lock:
+    if name in sys.modules:
+      return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+      raise ImportError(f"No module named {name!r}", name=name)
+    module = importlib.util.module_from_spec(spec)
+    module.__class__ = _LazyModule
+    sys.modules[name] = module
+    return module
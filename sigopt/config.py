@@ -30,6 +30,7 @@ class Config(object):
   CELL_TRACKING_ENABLED_KEY = "code_tracking_enabled"
   LOG_COLLECTION_ENABLED_KEY = "log_collection_enabled"
   CONTEXT_ENVIRONMENT_KEY = "SIGOPT_CONTEXT"
+  CONTEXT_FILE_ENVIRONMENT_KEY = "SIGOPT_CONTEXT_FILE"
 
   def __init__(self):
     self._config_json_path = os.path.abspath(
@@ -38,17 +39,32 @@ class Config(object):
         "config.json",
       )
     )
-    self._configuration = self._read_config_json()
-    self._json_context = {}
-    try:
-      encoded_context = os.environ[self.CONTEXT_ENVIRONMENT_KEY]
-    except KeyError:
-      pass
-    else:
-      decoded = base64.b64decode(encoded_context).decode("utf-8")
-      self._json_context = json.loads(decoded)
+    # config.json and the environment context are parsed on first use to keep `import sigopt` cheap
+    self._loaded_configuration = None
+    self._encoded_json_context = os.environ.get(self.CONTEXT_ENVIRONMENT_KEY)
+    self._json_context_path = os.environ.get(self.CONTEXT_FILE_ENVIRONMENT_KEY)
+    self._loaded_json_context = None
     self._object_context = {}
 
+  @property
+  def _configuration(self):
+    if self._loaded_configuration is None:
+      self._loaded_configuration = self._read_config_json()
+    return self._loaded_configuration
+
+  @property
+  def _json_context(self):
+    if self._loaded_json_context is None:
+      json_context = {}
+      if self._json_context_path is not None:
+        with open(self._json_context_path) as context_fp:
+          json_context.update(json.load(context_fp))
+      if self._encoded_json_context is not None:
+        decoded = base64.b64decode(self._encoded_json_context).decode("utf-8")
+        json_context.update(json.loads(decoded))
+      self._loaded_json_context = json_context
+    return self._loaded_json_context
+
   def get_context_data(self, entry_cls):
     key = entry_cls.CONFIG_CONTEXT_KEY
     instance = self._object_context.get(key)
@@ -56,13 +72,25 @@ class Config(object):
       return instance.to_json()
     return self._json_context.get(key)
 
+  def get_environment_context_data(self, entry_cls):
+    return self._json_context.get(entry_cls.CONFIG_CONTEXT_KEY)
+
   def set_context_entry(self, entry):
     self._object_context[entry.CONFIG_CONTEXT_KEY] = entry
 
-  def get_environment_context(self):
+  def get_environment_context(self, context_file=None):
+    """
+      Returns the environment variables that pass the context to a child process.
+      With a context_file the context is written to the file and only its path is passed,
+      which keeps large runs out of the environment of the child.
+      """
     context = dict(self._json_context)
     for key, value in self._object_context.items():
       context[key] = value.to_json()
+    if context_file is not None:
+      json.dump(context, context_file)
+      context_file.flush()
+      return {self.CONTEXT_FILE_ENVIRONMENT_KEY: context_file.name}
     return {self.CONTEXT_ENVIRONMENT_KEY: base64.b64encode(json.dumps(context).encode())}
 
   @property
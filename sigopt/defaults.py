@@ -7,6 +7,7 @@ import os
 import re
 
 from .exception import ApiException, ProjectNotFoundException
+from .lookup_cache import get_lookup_cache
 
 
 INVALID_PROJECT_ID_STRING_CHARACTERS = re.compile(r"[^a-z0-9\-_\.]")
@@ -49,16 +50,35 @@ def get_default_name(project):
   return f"{project} {datetime_string}"
 
 
-def get_client_id(connection):
-  return connection.tokens("self").fetch().client
+def get_client_id(connection, use_cache=True):
+  lookup_cache = get_lookup_cache(connection)
+  if use_cache and lookup_cache is not None:
+    client_id = lookup_cache.get_client_id()
+    if client_id is not None:
+      return client_id
+  client_id = connection.tokens("self").fetch().client
+  if lookup_cache is not None:
+    lookup_cache.set_client_id(client_id)
+  return client_id
 
 
-def ensure_project_exists(connection, project_id):
-  client_id = get_client_id(connection)
+def ensure_project_exists(connection, project_id, use_cache=True):
+  lookup_cache = get_lookup_cache(connection)
+  client_id = get_client_id(connection, use_cache=use_cache)
+  if use_cache and lookup_cache is not None and lookup_cache.has_project(client_id, project_id):
+    return client_id
   try:
     connection.clients(client_id).projects(project_id).fetch()
   except ApiException as e:
     if e.status_code == http.HTTPStatus.NOT_FOUND:
       raise ProjectNotFoundException(project_id) from e
     raise
+  if lookup_cache is not None:
+    lookup_cache.add_project(client_id, project_id)
   return client_id
+
+
+def invalidate_lookup_cache(connection):
+  lookup_cache = get_lookup_cache(connection)
+  if lookup_cache is not None:
+    lookup_cache.invalidate()
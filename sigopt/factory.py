@@ -3,22 +3,33 @@
 # SPDX-License-Identifier: MIT
 import http
 
-import click
-
-from sigopt.validate import validate_aiexperiment_input
-
 from .aiexperiment_context import AIExperimentContext
+from .config import config
 from .defaults import check_valid_project_id
 from .defaults import ensure_project_exists as _ensure_project_exists
-from .defaults import get_client_id, get_default_project
+from .defaults import get_client_id, get_default_project, invalidate_lookup_cache
 from .exception import ApiException, ConflictingProjectException, ProjectNotFoundException
 from .interface import get_connection
+from .lookup_cache import get_lookup_cache
 from .run_context import global_run_context
 from .run_factory import BaseRunFactory
 from .sigopt_logging import print_logger
 from .utils import batcher
 
 
+class ResolvedProjectContext(object):
+  """The client and project checked by a parent process, passed to child processes so that they skip the lookups."""
+
+  CONFIG_CONTEXT_KEY = "resolved_project"
+
+  def __init__(self, client_id, project_id):
+    self.client_id = client_id
+    self.project_id = project_id
+
+  def to_json(self):
+    return {"client": self.client_id, "project": self.project_id}
+
+
 class SigOptFactory(BaseRunFactory):
   """A SigOptFactory creates Runs and AIExperiments that belong to a specified Project."""
 
@@ -71,43 +82,78 @@ class SigOptFactory(BaseRunFactory):
       raise
     self._client_id = client_id
     self._assume_project_exists = True
+    self._add_created_project_to_lookup_cache()
+    config.set_context_entry(ResolvedProjectContext(self._client_id, self.project))
     return project
 
+  def _add_created_project_to_lookup_cache(self):
+    lookup_cache = get_lookup_cache(self.connection)
+    if lookup_cache is not None:
+      lookup_cache.add_project(self._client_id, self.project)
+
   def set_up_cli(self):
     try:
       self.ensure_project_exists()
     except ProjectNotFoundException as pnfe:
+      import click
+
       raise click.ClickException(pnfe) from pnfe
 
-  def ensure_project_exists(self):
+  def ensure_project_exists(self, use_cache=True):
     # if we have already ensured that the project exists then we can skip this step in the future
     if not self._assume_project_exists:
-      self._client_id = _ensure_project_exists(self.connection, self.project)
+      inherited = config.get_environment_context_data(ResolvedProjectContext) if use_cache else None
+      if inherited and inherited.get("project") == self.project:
+        self._client_id = inherited["client"]
+      else:
+        self._client_id = _ensure_project_exists(self.connection, self.project, use_cache=use_cache)
       self._assume_project_exists = True
+      config.set_context_entry(ResolvedProjectContext(self._client_id, self.project))
     return self._client_id, self.project
 
+  def _request_in_project(self, request):
+    client_id, project_id = self.ensure_project_exists()
+    try:
+      return request(client_id, project_id)
+    except ApiException as e:
+      # the client and project may have come from a stale lookup cache, so check them again before retrying once
+      if e.status_code not in (http.HTTPStatus.NOT_FOUND, http.HTTPStatus.FORBIDDEN):
+        raise
+      invalidate_lookup_cache(self.connection)
+      self._assume_project_exists = False
+      client_id, project_id = self.ensure_project_exists(use_cache=False)
+      return request(client_id, project_id)
+
   def _create_run(self, name, metadata):
     connection = self.connection
-    client_id, project_id = self.ensure_project_exists()
-    run = connection.clients(client_id).projects(project_id).training_runs().create(name=name, metadata=metadata)
+    run = self._request_in_project(
+      lambda client_id, project_id: connection.clients(client_id)
+      .projects(project_id)
+      .training_runs()
+      .create(name=name, metadata=metadata)
+    )
     run_context = self.run_context_class(connection, run, global_run_context.params)
     return run_context
 
   def upload_runs(self, runs, max_batch_size=10000):
     connection = self.connection
-    client_id, project_id = self.ensure_project_exists()
     result = []
     for batch in batcher(runs, max_batch_size):
       result.extend(
-        connection.clients(client_id).projects(project_id).training_runs().create_batch(runs=batch, fields="id").data
+        self._request_in_project(
+          lambda client_id, project_id, batch=batch: connection.clients(client_id)
+          .projects(project_id)
+          .training_runs()
+          .create_batch(runs=batch, fields="id")
+          .data
+        )
       )
     return result
 
   def create_prevalidated_aiexperiment(self, validated_body):
     connection = self.connection
-    client_id, project_id = self.ensure_project_exists()
-    aiexperiment = (
-      connection.clients(client_id)
+    aiexperiment = self._request_in_project(
+      lambda client_id, project_id: connection.clients(client_id)
       .projects(project_id)
       .aiexperiments()
       .create(
@@ -126,6 +172,8 @@ class SigOptFactory(BaseRunFactory):
     aiexperiment_body["name"] = name
     aiexperiment_body["parameters"] = parameters
     aiexperiment_body["metrics"] = metrics
+    from .validate import validate_aiexperiment_input
+
     validated = validate_aiexperiment_input(aiexperiment_body)
     return self.create_prevalidated_aiexperiment(validated)
 
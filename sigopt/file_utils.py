@@ -7,7 +7,10 @@ import io
 import mimetypes
 import warnings
 
-import png
+from .compat import lazy_import
+
+
+png = lazy_import("png")
 
 
 def try_load_pil_image(image):
@@ -1,6 +1,8 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
+import os
+
 from .endpoint import ApiEndpoint
 from .exception import SigOptException
 from .objects import (
@@ -22,7 +24,6 @@ from .objects import (
   Token,
   TrainingRun,
 )
-from .request_driver import RequestDriver
 from .resource import ApiResource
 
 
@@ -309,6 +310,13 @@ class ConnectionImpl(object):
     self.driver.set_client_token(client_token)
 
 
+def instantiate_http_driver(*args, **kwargs):
+  # requests and urllib3 are only imported once a connection is made
+  from .request_driver import RequestDriver
+
+  return RequestDriver(*args, **kwargs)
+
+
 def instantiate_lite_driver(*args, **kwargs):
   try:
     from sigoptlite import LocalDriver
@@ -319,22 +327,68 @@ def instantiate_lite_driver(*args, **kwargs):
   return LocalDriver(*args, **kwargs)
 
 
+def instantiate_sqlite_driver(*args, **kwargs):
+  from .sqlite_driver import SQLiteDriver
+
+  return SQLiteDriver(*args, **kwargs)
+
+
+def instantiate_proxy_driver(*args, **kwargs):
+  from .proxy_driver import ProxyDriver
+
+  return ProxyDriver(*args, **kwargs)
+
+
 DRIVER_KEY_HTTP = "http"
 DRIVER_KEY_LITE = "lite"
+DRIVER_KEY_PROXY = "proxy"
+DRIVER_KEY_SQLITE = "sqlite"
+DRIVER_ENTRY_POINT_GROUP = "sigopt.drivers"
+DRIVER_ENV_KEY = "SIGOPT_DRIVER"
 driver_map = {
-  DRIVER_KEY_HTTP: RequestDriver,
+  DRIVER_KEY_HTTP: instantiate_http_driver,
   DRIVER_KEY_LITE: instantiate_lite_driver,
+  DRIVER_KEY_PROXY: instantiate_proxy_driver,
+  DRIVER_KEY_SQLITE: instantiate_sqlite_driver,
 }
 
 
+def get_driver_entry_points():
+  # only read when a driver is not built in, since reading the installed distributions is slow
+  try:
+    from importlib import metadata
+  except ImportError:
+    return {}
+  entry_points = metadata.entry_points()
+  if hasattr(entry_points, "select"):
+    entry_points = entry_points.select(group=DRIVER_ENTRY_POINT_GROUP)
+  else:
+    entry_points = entry_points.get(DRIVER_ENTRY_POINT_GROUP, [])
+  return {entry_point.name: entry_point for entry_point in entry_points}
+
+
+def get_driver_factory(name):
+  """
+    Returns the callable that creates the driver with the given name, either built in or registered by another package
+    as an entry point in the sigopt.drivers group.
+    """
+  if name in driver_map:
+    return driver_map[name]
+  entry_points = get_driver_entry_points()
+  try:
+    entry_point = entry_points[name]
+  except KeyError as ke:
+    raise ValueError(
+      f"The driver {name!r} is unknown. Only the following options are available: {[*driver_map, *entry_points]}"
+    ) from ke
+  return entry_point.load()
+
+
 def create_driver_instance(driver, args, kwargs):
+  if driver is None:
+    driver = os.environ.get(DRIVER_ENV_KEY) or DRIVER_KEY_HTTP
   if isinstance(driver, str):
-    try:
-      driver = driver_map[driver]
-    except KeyError as ke:
-      raise ValueError(
-        f"The driver {driver!r} is unknown. Only the following options are available: {list(driver_map.keys())}"
-      ) from ke
+    driver = get_driver_factory(driver)
   return driver(*args, **kwargs)
 
 
@@ -344,7 +398,7 @@ class Connection(object):
     Shouldn't be changed without a major version change.
     """
 
-  def __init__(self, *args, driver="http", **kwargs):
+  def __init__(self, *args, driver=None, **kwargs):
     driver_instance = create_driver_instance(
       driver,
       args,
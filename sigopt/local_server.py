@@ -0,0 +1,193 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import http
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .compat import json
+from .defaults import get_client_id
+from .exception import ApiException
+from .sigopt_logging import print_logger
+from .sqlite_driver import SQLiteDriver
+
+
+API_VERSION = "v1"
+DEFAULT_LOCAL_SERVER_HOST = "127.0.0.1"
+DEFAULT_LOCAL_SERVER_PORT = 5000
+DEFAULT_UPSTREAM_SYNC_INTERVAL = 60
+DEFAULT_UPSTREAM_BATCH_SIZE = 100
+# fields of a local run that are assigned by the API when the run is uploaded
+UPSTREAM_EXCLUDED_RUN_FIELDS = [
+  "checkpoint_count",
+  "client",
+  "completed",
+  "created",
+  "deleted",
+  "finished",
+  "id",
+  "object",
+  "project",
+  "updated",
+]
+
+
+def parse_query_params(query):
+  # RequestDriver sends dicts and lists as JSON and everything else as strings
+  params = {}
+  for key, value in urllib.parse.parse_qsl(query, keep_blank_values=True):
+    if value.startswith(("{", "[")):
+      try:
+        value = json.loads(value)
+      except ValueError:
+        pass
+    params[key] = value
+  return params
+
+
+class LocalApiRequestHandler(BaseHTTPRequestHandler):
+  """Serves the REST paths of the SigOpt API from the driver of the server."""
+
+  protocol_version = "HTTP/1.1"
+
+  def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+    pass
+
+  def _send_json(self, status, body):
+    content = b"" if body is None else json.dumps(body).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(content)))
+    self.end_headers()
+    self.wfile.write(content)
+
+  def _handle(self):
+    url = urllib.parse.urlsplit(self.path)
+    path = [urllib.parse.unquote(component) for component in url.path.strip("/").split("/")]
+    content_length = int(self.headers.get("Content-Length") or 0)
+    body = self.rfile.read(content_length) if content_length else b""
+    if not path or path[0] != API_VERSION:
+      self._send_json(http.HTTPStatus.NOT_FOUND, {"message": f"Unknown path {url.path}"})
+      return
+    try:
+      data = json.loads(body) if body else parse_query_params(url.query)
+    except ValueError:
+      self._send_json(http.HTTPStatus.BAD_REQUEST, {"message": "The request body is not valid JSON"})
+      return
+    try:
+      response = self.server.driver.request(self.command, path[1:], data, dict(self.headers))
+    except ApiException as e:
+      self._send_json(e.status_code, e.to_json())
+      return
+    except Exception as e:  # pylint: disable=broad-except
+      self._send_json(http.HTTPStatus.INTERNAL_SERVER_ERROR, {"message": str(e)})
+      return
+    self._send_json(http.HTTPStatus.OK if response is not None else http.HTTPStatus.NO_CONTENT, response)
+
+  do_GET = _handle
+  do_POST = _handle
+  do_PUT = _handle
+  do_MERGE = _handle
+  do_DELETE = _handle
+
+
+class LocalServer(ThreadingHTTPServer):
+  """
+    A local stand-in for the SigOpt API that workers reach through SIGOPT_API_URL.
+    Requests are served by a SQLiteDriver, so the data outlives the server and can be shared with other processes.
+    """
+
+  daemon_threads = True
+
+  def __init__(self, driver, host=DEFAULT_LOCAL_SERVER_HOST, port=DEFAULT_LOCAL_SERVER_PORT):
+    self.driver = driver
+    super().__init__((host, port), LocalApiRequestHandler)
+
+  @property
+  def api_url(self):
+    host, port = self.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+class UpstreamSync(object):
+  """
+    Uploads the finished runs of the local database to the SigOpt API in batches, one batch request per project.
+    The ids of the uploaded runs are kept in the database, so that each run is only uploaded once.
+    """
+
+  def __init__(self, driver, connection, batch_size=DEFAULT_UPSTREAM_BATCH_SIZE):
+    self.driver = driver
+    self.connection = connection
+    self.batch_size = batch_size
+    self._stopped = threading.Event()
+    with driver._transaction(driver.db) as db:
+      db.execute("CREATE TABLE IF NOT EXISTS upstream_runs (training_run INTEGER PRIMARY KEY, upstream_id TEXT)")
+
+  def get_pending_runs(self):
+    return self.driver.db.execute(
+      """
+        SELECT training_runs.id, training_runs.project, training_runs.body FROM training_runs
+        LEFT JOIN upstream_runs ON upstream_runs.training_run = training_runs.id
+        WHERE upstream_runs.training_run IS NULL AND training_runs.deleted = 0
+          AND json_extract(training_runs.body, '$.finished')
+        ORDER BY training_runs.id
+        LIMIT ?
+      """,
+      [self.batch_size],
+    ).fetchall()
+
+  def upload(self, project_id, runs):
+    client_id = get_client_id(self.connection)
+    project = self.connection.clients(client_id).projects(project_id)
+    try:
+      return project.training_runs().create_batch(runs=runs)
+    except ApiException as e:
+      if e.status_code != http.HTTPStatus.NOT_FOUND:
+        raise
+    self.connection.clients(client_id).projects().create(id=project_id, name=project_id)
+    return project.training_runs().create_batch(runs=runs)
+
+  def sync_once(self):
+    """Uploads a batch of the runs that have finished since the last sync and returns the number of runs uploaded."""
+    rows = self.get_pending_runs()
+    by_project = {}
+    for row in rows:
+      run = json.loads(row["body"])
+      for field in UPSTREAM_EXCLUDED_RUN_FIELDS:
+        run.pop(field, None)
+      by_project.setdefault(row["project"], []).append((row["id"], run))
+    for project_id, project_runs in by_project.items():
+      uploaded = self.upload(project_id, [run for _, run in project_runs])
+      # the response of a batch create is a single page of the created runs, in the order they were sent, so it is read
+      # as is rather than paged, and without the warning of .data, which would be logged on every sync
+      upstream_ids = [upstream_run.id for upstream_run in uploaded._unsafe_data]
+      with self.driver._transaction(self.driver.db) as db:
+        db.executemany(
+          "INSERT OR REPLACE INTO upstream_runs (training_run, upstream_id) VALUES (?, ?)",
+          [(run_id, upstream_id) for (run_id, _), upstream_id in zip(project_runs, upstream_ids)],
+        )
+    return len(rows)
+
+  def flush(self):
+    try:
+      while self.sync_once() == self.batch_size:
+        pass
+    except Exception as e:  # pylint: disable=broad-except
+      print_logger.warning("Upstream sync failed, it will be retried: %s", e)
+
+  def run_forever(self, interval):
+    while not self._stopped.wait(interval):
+      self.flush()
+
+  def start(self, interval=DEFAULT_UPSTREAM_SYNC_INTERVAL):
+    thread = threading.Thread(target=self.run_forever, args=(interval,), daemon=True)
+    thread.start()
+    return thread
+
+  def stop(self):
+    self._stopped.set()
+
+
+def create_local_server(path=None, host=DEFAULT_LOCAL_SERVER_HOST, port=DEFAULT_LOCAL_SERVER_PORT):
+  return LocalServer(SQLiteDriver(path=path), host=host, port=port)
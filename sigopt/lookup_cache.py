@@ -0,0 +1,98 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .paths import get_root_subdir
+
+
+DEFAULT_LOOKUP_CACHE_TTL = 24 * 60 * 60
+LOOKUP_CACHE_TTL_ENV_KEY = "SIGOPT_LOOKUP_CACHE_TTL"
+
+
+def get_lookup_cache_ttl():
+  ttl = os.environ.get(LOOKUP_CACHE_TTL_ENV_KEY)
+  if ttl is None:
+    return DEFAULT_LOOKUP_CACHE_TTL
+  try:
+    return float(ttl)
+  except ValueError as ve:
+    raise ValueError(f"{LOOKUP_CACHE_TTL_ENV_KEY} must be a number of seconds, got {ttl!r}") from ve
+
+
+class LookupCache(object):
+  """
+    Caches the client of an API token and the projects that are known to exist for that client.
+    The cache is a small JSON file under SIGOPT_HOME, keyed by a hash of the token and the API url,
+    so that it can be shared by every process on the machine without ever storing the token itself.
+    """
+
+  def __init__(self, api_url, client_token, ttl, root=None):
+    if root is None:
+      root = get_root_subdir("cache")
+    key = hashlib.sha256("\n".join([api_url, client_token]).encode()).hexdigest()
+    self.path = os.path.join(root, "lookups", f"{key}.json")
+    self.ttl = ttl
+
+  def _read(self):
+    try:
+      with open(self.path) as cache_fp:
+        data = json.load(cache_fp)
+    except (OSError, ValueError):
+      return {}
+    return data if isinstance(data, dict) else {}
+
+  def _write(self, data):
+    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as cache_fp:
+      json.dump(data, cache_fp)
+    os.replace(tmp_path, self.path)
+
+  def _is_fresh(self, expires):
+    return isinstance(expires, (int, float)) and expires > time.time()
+
+  def get_client_id(self):
+    client = self._read().get("client")
+    if not client or not self._is_fresh(client.get("expires")):
+      return None
+    return client.get("id")
+
+  def set_client_id(self, client_id):
+    data = self._read()
+    if data.get("client", {}).get("id") != client_id:
+      data["projects"] = {}
+    data["client"] = {"id": client_id, "expires": time.time() + self.ttl}
+    self._write(data)
+
+  def has_project(self, client_id, project_id):
+    expires = self._read().get("projects", {}).get(f"{client_id}/{project_id}")
+    return self._is_fresh(expires)
+
+  def add_project(self, client_id, project_id):
+    data = self._read()
+    projects = data.setdefault("projects", {})
+    projects[f"{client_id}/{project_id}"] = time.time() + self.ttl
+    self._write(data)
+
+  def invalidate(self):
+    try:
+      os.remove(self.path)
+    except FileNotFoundError:
+      pass
+
+
+def get_lookup_cache(connection):
+  ttl = get_lookup_cache_ttl()
+  if ttl <= 0:
+    return None
+  driver = getattr(getattr(connection, "impl", None), "driver", None)
+  api_url = getattr(driver, "api_url", None)
+  client_token = getattr(getattr(driver, "auth", None), "username", None)
+  if not isinstance(api_url, str) or not isinstance(client_token, str):
+    return None
+  return LookupCache(api_url, client_token, ttl)
@@ -0,0 +1,162 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import concurrent.futures
+import http
+import threading
+import time
+
+from .compat import json
+from .exception import ApiException
+
+
+DEFAULT_MAX_BATCH_SIZE = 100
+DEFAULT_MAX_DELAY = 1.0
+
+
+def get_observation_key(suggestion, assignments):
+  # an observation is reported either for a suggestion or for assignments, which identify it within a batch
+  if suggestion is not None:
+    return ("suggestion", str(suggestion))
+  return ("assignments", json.dumps(dict(assignments or {}), sort_keys=True))
+
+
+class ObservationReporter(object):
+  """
+    Collects the observations of a core API experiment from many threads and sends them with
+    experiments(id).observations().create_batch(), once max_batch_size are waiting or the oldest has waited max_delay
+    seconds. report returns a future that resolves to the created Observation.
+    When the API rejects a batch, its observations are sent one at a time, so that only the invalid ones fail.
+    """
+
+  def __init__(self, connection, experiment_id, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_delay=DEFAULT_MAX_DELAY):
+    if max_batch_size < 1:
+      raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+    if max_delay < 0:
+      raise ValueError(f"max_delay must not be negative, got {max_delay}")
+    self.connection = connection
+    self.experiment_id = experiment_id
+    self.max_batch_size = max_batch_size
+    self.max_delay = max_delay
+    self._pending = []
+    self._in_flight = 0
+    self._flush_requested = False
+    self._condition = threading.Condition()
+    self._closed = False
+    self._thread = threading.Thread(target=self._run, daemon=True)
+    self._thread.start()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.close()
+
+  def report(self, **observation):
+    """Queues an observation, with the same arguments as observations().create(), and returns its future."""
+    future = concurrent.futures.Future()
+    with self._condition:
+      if self._closed:
+        raise ValueError("The observation reporter is closed")
+      self._pending.append((observation, future, time.monotonic()))
+      # the first observation starts the max_delay timer of the background thread, a full batch is sent right away
+      if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+        self._condition.notify_all()
+    return future
+
+  def _is_ready(self):
+    if not self._pending:
+      return self._closed
+    return (
+      self._closed
+      or self._flush_requested
+      or len(self._pending) >= self.max_batch_size
+      or time.monotonic() - self._pending[0][2] >= self.max_delay
+    )
+
+  def _take_batch(self):
+    with self._condition:
+      while not self._is_ready():
+        timeout = None if not self._pending else self._pending[0][2] + self.max_delay - time.monotonic()
+        self._condition.wait(timeout)
+      batch = [(observation, future) for observation, future, _ in self._pending[: self.max_batch_size]]
+      del self._pending[: self.max_batch_size]
+      self._in_flight = len(batch)
+      if not self._pending:
+        self._flush_requested = False
+      return batch
+
+  def _run(self):
+    while True:
+      batch = self._take_batch()
+      if not batch:
+        return
+      self._send(batch)
+      with self._condition:
+        self._in_flight = 0
+        self._condition.notify_all()
+
+  def _send(self, batch):
+    observations = self.connection.experiments(self.experiment_id).observations()
+    try:
+      # the response of a batch create is a single page of the created observations, so it is not paged
+      created = observations.create_batch(observations=[observation for observation, _ in batch])._unsafe_data
+    except ApiException as e:
+      if len(batch) > 1 and 400 <= e.status_code < 500 and e.status_code != http.HTTPStatus.TOO_MANY_REQUESTS:
+        self._send_one_at_a_time(observations, batch)
+      else:
+        for _, future in batch:
+          future.set_exception(e)
+      return
+    except Exception as e:  # pylint: disable=broad-except
+      for _, future in batch:
+        future.set_exception(e)
+      return
+    if len(created) == len(batch):
+      for (_, future), observation in zip(batch, created):
+        future.set_result(observation)
+      return
+    self._resolve_matching(batch, created)
+
+  def _resolve_matching(self, batch, created):
+    # the created observations can't be paired with the batch by position, so they are paired by their suggestion
+    # or assignments, and only the observations that were not returned fail
+    by_key = {}
+    for observation in created:
+      keys = {get_observation_key(observation.suggestion, observation.assignments)}
+      if observation.assignments is not None:
+        keys.add(get_observation_key(None, observation.assignments))
+      for key in keys:
+        by_key.setdefault(key, []).append(observation)
+    resolved = set()
+    for observation, future in batch:
+      key = get_observation_key(observation.get("suggestion"), observation.get("assignments"))
+      candidates = [candidate for candidate in by_key.get(key, []) if id(candidate) not in resolved]
+      if candidates:
+        resolved.add(id(candidates[0]))
+        future.set_result(candidates[0])
+      else:
+        message = f"The observation is not among the {len(created)} created for a batch of {len(batch)} observations"
+        future.set_exception(ValueError(message))
+
+  def _send_one_at_a_time(self, observations, batch):
+    for observation, future in batch:
+      try:
+        future.set_result(observations.create(**observation))
+      except Exception as e:  # pylint: disable=broad-except
+        future.set_exception(e)
+
+  def flush(self):
+    """Sends the queued observations now and waits until they have been sent."""
+    with self._condition:
+      if self._pending:
+        self._flush_requested = True
+        self._condition.notify_all()
+      self._condition.wait_for(lambda: not self._pending and not self._in_flight)
+
+  def close(self):
+    """Sends the queued observations and stops the background thread."""
+    with self._condition:
+      self._closed = True
+      self._condition.notify_all()
+    self._thread.join()
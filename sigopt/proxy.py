@@ -0,0 +1,204 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import concurrent.futures
+import http
+import os
+import socket
+import socketserver
+import threading
+
+from .compat import json
+from .exception import ApiException
+from .proxy_driver import read_message, write_message
+from .ratelimit import RequestRateLimit
+from .run_context import merge_update_body
+
+
+DEFAULT_PROXY_MAX_CONNECTIONS = 8
+DEFAULT_PROXY_REQUESTS_PER_SECOND = 20
+
+
+class QueuedMerge(object):
+  def __init__(self, data):
+    self.data = data
+    self.result = concurrent.futures.Future()
+    # resolved with the batch to send when this caller has to send the updates that queued up
+    self.lead = concurrent.futures.Future()
+
+
+class RequestCoalescer(object):
+  """
+    Forwards requests to the upstream driver while combining the ones that would be redundant.
+    Identical GETs that arrive while one is in flight share its response, unless the object was written since the GET
+    was sent, so that a GET that follows a write always reads the result of the write.
+    MERGEs to the same object that arrive while one is in flight are merged into a single request, which is sent by
+    the first of them once the one in flight finishes, and they all get its response. When the API rejects a merged
+    request its updates are sent one at a time, so that only the invalid ones fail.
+    """
+
+  def __init__(self, driver, max_connections=DEFAULT_PROXY_MAX_CONNECTIONS, rate_limit=None):
+    self.driver = driver
+    self.rate_limit = rate_limit
+    self.thread_lock = threading.Lock()
+    self.connection_slots = threading.BoundedSemaphore(max_connections)
+    self.in_flight_gets = {}
+    self.pending_merges = {}
+
+  def send(self, method, path, data, headers):
+    try:
+      with self.connection_slots:
+        if self.rate_limit is not None:
+          self.rate_limit.acquire()
+        return self.driver.request(method, path, data, headers)
+    finally:
+      # invalidated before the callers of the write get its response, even if it failed, since it may have been applied
+      if method != "GET":
+        self.invalidate_gets(path)
+
+  def invalidate_gets(self, path):
+    # a write changes the object at its path, the objects under it, and the lists and parents that contain it
+    path = tuple(path)
+    with self.thread_lock:
+      for key in list(self.in_flight_gets):
+        get_path = key[0]
+        common_length = min(len(get_path), len(path))
+        if get_path[:common_length] == path[:common_length]:
+          del self.in_flight_gets[key]
+
+  def request(self, method, path, data, headers):
+    if method == "GET":
+      return self.get(path, data, headers)
+    if method == "MERGE":
+      return self.merge(path, data, headers)
+    return self.send(method, path, data, headers)
+
+  def get(self, path, data, headers):
+    key = (tuple(path), json.dumps(data, sort_keys=True), json.dumps(headers, sort_keys=True))
+    with self.thread_lock:
+      future = self.in_flight_gets.get(key)
+      is_leader = future is None
+      if is_leader:
+        future = self.in_flight_gets[key] = concurrent.futures.Future()
+    if is_leader:
+      try:
+        future.set_result(self.send("GET", path, data, headers))
+      except Exception as e:  # pylint: disable=broad-except
+        future.set_exception(e)
+      finally:
+        with self.thread_lock:
+          if self.in_flight_gets.get(key) is future:
+            del self.in_flight_gets[key]
+    return future.result()
+
+  def merge(self, path, data, headers):
+    key = (tuple(path), json.dumps(headers, sort_keys=True))
+    queued = QueuedMerge(data)
+    with self.thread_lock:
+      queue = self.pending_merges.get(key)
+      if queue is None:
+        # nothing is in flight for the object, so the update is sent right away
+        self.pending_merges[key] = []
+        queued.lead.set_result([queued])
+      else:
+        queue.append(queued)
+    concurrent.futures.wait([queued.lead, queued.result], return_when=concurrent.futures.FIRST_COMPLETED)
+    if queued.lead.done():
+      self.flush_merges(key, path, headers, queued.lead.result())
+    return queued.result.result()
+
+  def flush_merges(self, key, path, headers, batch):
+    self.send_merges(path, headers, batch)
+    # the updates that queued up behind the batch are sent by the first of their callers, so that this one can return
+    with self.thread_lock:
+      queue = self.pending_merges[key]
+      if not queue:
+        del self.pending_merges[key]
+        return
+      self.pending_merges[key] = []
+    queue[0].lead.set_result(queue)
+
+  def send_merges(self, path, headers, batch):
+    body = {}
+    for queued in batch:
+      merge_update_body(body, queued.data or {})
+    try:
+      response = self.send("MERGE", path, body, headers)
+    except ApiException as e:
+      if len(batch) > 1 and 400 <= e.status_code < 500 and e.status_code != http.HTTPStatus.TOO_MANY_REQUESTS:
+        # one invalid update rejects the merged request, so they are sent one at a time to only fail that one
+        for queued in batch:
+          self.send_merges(path, headers, [queued])
+      else:
+        for queued in batch:
+          queued.result.set_exception(e)
+    except Exception as e:  # pylint: disable=broad-except
+      for queued in batch:
+        queued.result.set_exception(e)
+    else:
+      for queued in batch:
+        queued.result.set_result(response)
+
+
+class ProxyRequestHandler(socketserver.StreamRequestHandler):
+  def handle(self):
+    while True:
+      try:
+        message = read_message(self.rfile)
+      except (OSError, ValueError):
+        return
+      if message is None:
+        return
+      try:
+        body = self.server.coalescer.request(message["method"], message["path"], message["data"], message["headers"])
+        response = {"status": 200 if body is not None else 204, "body": body}
+      except ApiException as e:
+        response = {"status": e.status_code, "body": e.to_json()}
+      except Exception as e:  # pylint: disable=broad-except
+        response = {"error": str(e)}
+      try:
+        write_message(self.wfile, response)
+      except OSError:
+        return
+
+
+class ProxyServer(socketserver.ThreadingUnixStreamServer):
+  """
+    A node-local sidecar that forwards the requests of the processes on the node to the SigOpt API, so that they share
+    one connection pool and one rate limit.
+    """
+
+  daemon_threads = True
+
+  def __init__(self, socket_path, coalescer):
+    self.socket_path = socket_path
+    self.coalescer = coalescer
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    if os.path.exists(socket_path):
+      with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        if sock.connect_ex(socket_path) == 0:
+          raise ValueError(f"A SigOpt proxy is already listening on {socket_path}")
+      # the socket file was left behind by a proxy that did not shut down cleanly
+      os.unlink(socket_path)
+    super().__init__(socket_path, ProxyRequestHandler)
+    # the socket grants the access of the proxy token, so only the owner can connect
+    os.chmod(socket_path, 0o600)
+
+  def server_close(self):
+    super().server_close()
+    if os.path.exists(self.socket_path):
+      os.unlink(self.socket_path)
+
+
+def create_proxy_server(
+  socket_path,
+  max_connections=DEFAULT_PROXY_MAX_CONNECTIONS,
+  requests_per_second=DEFAULT_PROXY_REQUESTS_PER_SECOND,
+  driver=None,
+):
+  if driver is None:
+    from .request_driver import RequestDriver, get_expiring_session
+
+    driver = RequestDriver(session=get_expiring_session(pool_maxsize=max_connections))
+  rate_limit = RequestRateLimit(requests_per_second) if requests_per_second else None
+  return ProxyServer(socket_path, RequestCoalescer(driver, max_connections=max_connections, rate_limit=rate_limit))
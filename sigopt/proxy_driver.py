@@ -0,0 +1,123 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import os
+import socket
+import threading
+
+from .compat import json
+from .exception import ApiException, ConnectionException
+from .objects import ApiObject
+from .paths import get_root_dir
+
+
+DEFAULT_PROXY_SOCKET_FILENAME = "proxy.sock"
+PROXY_SOCKET_ENV_KEY = "SIGOPT_PROXY_SOCKET"
+
+
+def get_default_proxy_socket_path():
+  return os.environ.get(PROXY_SOCKET_ENV_KEY) or os.path.join(get_root_dir(), DEFAULT_PROXY_SOCKET_FILENAME)
+
+
+def write_message(stream, message):
+  # messages are single lines of JSON, since JSON strings can't contain a raw newline
+  stream.write(json.dumps(message).encode("utf-8") + b"\n")
+  stream.flush()
+
+
+def read_message(stream):
+  line = stream.readline()
+  if not line:
+    return None
+  return json.loads(line)
+
+
+class ProxyDriver(object):
+  """
+    A driver that sends the requests of a Connection to a `sigopt proxy` sidecar over a Unix socket, so that the
+    processes on a node share the connection pool and the rate limit of the sidecar.
+    The sidecar authenticates with its own API token, so client_token is ignored.
+    """
+
+  def __init__(self, socket_path=None, client_token=None, timeout=None, **kwargs):
+    del client_token, kwargs
+    self.socket_path = socket_path or get_default_proxy_socket_path()
+    self.timeout = timeout
+    self._local = threading.local()
+    self._lock = threading.Lock()
+    self._sockets = set()
+
+  def set_api_url(self, api_url):
+    pass
+
+  def set_client_token(self, client_token):
+    pass
+
+  def _connect(self):
+    # each thread keeps its own connection, and a forked process must not reuse the connection of its parent
+    pid = os.getpid()
+    stream = getattr(self._local, "stream", None)
+    if stream is not None and self._local.pid == pid:
+      return stream
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(self.timeout)
+    try:
+      sock.connect(self.socket_path)
+    except OSError as oe:
+      sock.close()
+      raise ConnectionException(
+        f"Could not connect to the SigOpt proxy at {self.socket_path}, start it with `sigopt proxy`.\n{oe}"
+      ) from oe
+    self._local.pid = pid
+    self._local.stream = sock.makefile("rwb")
+    self._local.socket = sock
+    with self._lock:
+      self._sockets.add((sock, self._local.stream))
+    return self._local.stream
+
+  def _disconnect(self):
+    stream = getattr(self._local, "stream", None)
+    if stream is not None:
+      sock = self._local.socket
+      with self._lock:
+        self._sockets.discard((sock, stream))
+      stream.close()
+      sock.close()
+      self._local.stream = None
+
+  def _send(self, message):
+    stream = self._connect()
+    try:
+      write_message(stream, message)
+      response = read_message(stream)
+    except OSError as oe:
+      self._disconnect()
+      raise ConnectionException(f"The connection to the SigOpt proxy failed.\n{oe}") from oe
+    if response is None:
+      self._disconnect()
+      raise ConnectionException("The SigOpt proxy closed the connection.")
+    return response
+
+  def request(self, method, path, data, headers):
+    message = {
+      "method": method.upper(),
+      "path": [str(component) for component in path],
+      "data": ApiObject.as_json(data),
+      "headers": headers or {},
+    }
+    response = self._send(message)
+    if "error" in response:
+      raise ConnectionException(response["error"])
+    status_code = response["status"]
+    if 200 <= status_code <= 299:
+      return response["body"]
+    raise ApiException(response["body"], status_code)
+
+  def close(self):
+    """Closes the connections of all the threads."""
+    with self._lock:
+      sockets, self._sockets = self._sockets, set()
+    for sock, stream in sockets:
+      stream.close()
+      sock.close()
+    self._local = threading.local()
@@ -0,0 +1,172 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import math
+import statistics
+import threading
+import time
+
+
+STOPPING_REASON_KEY = "stopping_reason"
+DEFAULT_REFRESH_INTERVAL = 30
+DEFAULT_MIN_COMPLETED_RUNS = 3
+OBJECTIVES = ("maximize", "minimize")
+
+
+class PruningRule(object):
+  name = None
+
+  def __init__(self, metric, objective="maximize", min_checkpoints=1, min_completed_runs=DEFAULT_MIN_COMPLETED_RUNS):
+    if objective not in OBJECTIVES:
+      raise ValueError(f"objective must be one of {OBJECTIVES}, got {objective!r}")
+    if min_checkpoints < 1:
+      raise ValueError(f"min_checkpoints must be at least 1, got {min_checkpoints!r}")
+    self.metric = metric
+    self.objective = objective
+    self.min_checkpoints = min_checkpoints
+    self.min_completed_runs = min_completed_runs
+
+  def is_worse(self, value, reference):
+    if self.objective == "maximize":
+      return value < reference
+    return value > reference
+
+  def best(self, values):
+    return max(values) if self.objective == "maximize" else min(values)
+
+  def check(self, curve, completed_curves):
+    """
+      Returns the reason that a run with the given checkpoint values should stop, or None.
+      curve is the list of the run's values for the metric, completed_curves holds the lists of completed runs.
+      """
+    raise NotImplementedError()
+
+
+class MedianStoppingRule(PruningRule):
+  """
+    Stops a run when the running average of its metric is worse than the median of the running averages
+    of completed runs over the same number of checkpoints.
+    """
+
+  name = "median"
+
+  def check(self, curve, completed_curves):
+    step = len(curve)
+    if step < self.min_checkpoints:
+      return None
+    references = [statistics.fmean(completed[:step]) for completed in completed_curves if len(completed) >= step]
+    if len(references) < self.min_completed_runs:
+      return None
+    median = statistics.median(references)
+    running_average = statistics.fmean(curve)
+    if not self.is_worse(running_average, median):
+      return None
+    return (
+      f"median stopping: the running average of {self.metric} ({running_average:g}) at checkpoint {step}"
+      f" is worse than the median of completed runs ({median:g})"
+    )
+
+
+class SuccessiveHalvingRule(PruningRule):
+  """
+    Stops a run at each rung of min_checkpoints * reduction_factor ** k checkpoints, unless the best value
+    of its metric so far is in the top 1 / reduction_factor of the completed runs at the same rung.
+    """
+
+  name = "successive_halving"
+
+  def __init__(self, metric, reduction_factor=3, **kwargs):
+    super().__init__(metric, **kwargs)
+    if reduction_factor < 2:
+      raise ValueError(f"reduction_factor must be at least 2, got {reduction_factor!r}")
+    self.reduction_factor = reduction_factor
+
+  def is_rung(self, step):
+    rung = self.min_checkpoints
+    while rung < step:
+      rung *= self.reduction_factor
+    return rung == step
+
+  def check(self, curve, completed_curves):
+    step = len(curve)
+    if step < self.min_checkpoints or not self.is_rung(step):
+      return None
+    references = [self.best(completed[:step]) for completed in completed_curves if len(completed) >= step]
+    if len(references) < self.min_completed_runs:
+      return None
+    value = self.best(curve)
+    rank = sum(1 for reference in references if self.is_worse(value, reference))
+    promoted_count = max(1, math.floor((len(references) + 1) / self.reduction_factor))
+    if rank < promoted_count:
+      return None
+    return (
+      f"successive halving: {self.metric} ({value:g}) at checkpoint {step}"
+      f" is not in the top {promoted_count} of {len(references) + 1} runs"
+    )
+
+
+PRUNING_RULES = {rule.name: rule for rule in [MedianStoppingRule, SuccessiveHalvingRule]}
+
+
+def get_checkpoint_value(checkpoint_values, metric):
+  for checkpoint_value in checkpoint_values:
+    if isinstance(checkpoint_value, dict):
+      name, value = checkpoint_value.get("name"), checkpoint_value.get("value")
+    else:
+      name, value = checkpoint_value.name, checkpoint_value.value
+    if name == metric:
+      return value
+  return None
+
+
+class Pruner(object):
+  """
+    Decides whether the runs of an AIExperiment should stop early by comparing their checkpoints
+    with the checkpoints of the completed runs. The checkpoints of completed runs never change,
+    so each completed run is fetched once and the list of completed runs is refreshed at most
+    once every refresh_interval seconds.
+    """
+
+  def __init__(self, connection, aiexperiment, rule, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    self.connection = connection
+    self.aiexperiment = aiexperiment
+    self.rule = rule
+    self.refresh_interval = refresh_interval
+    self._completed_curves = {}
+    self._last_refresh = None
+    self._lock = threading.Lock()
+
+  @property
+  def metric(self):
+    return self.rule.metric
+
+  def fetch_curve(self, run_id):
+    # created only has a resolution of seconds, so the checkpoints created in the same second are ordered by id
+    checkpoints = sorted(
+      self.connection.training_runs(run_id).checkpoints().fetch().iterate_pages(),
+      key=lambda checkpoint: (checkpoint.created or 0, int(checkpoint.id or 0)),
+    )
+    curve = []
+    for checkpoint in checkpoints:
+      value = get_checkpoint_value(checkpoint.values or [], self.metric)
+      if value is not None:
+        curve.append(value)
+    return curve
+
+  def get_completed_curves(self):
+    with self._lock:
+      now = time.time()
+      if self._last_refresh is None or now - self._last_refresh >= self.refresh_interval:
+        self._last_refresh = now
+        for run in self.aiexperiment.get_runs():
+          if run.state == "completed" and run.id not in self._completed_curves:
+            self._completed_curves[run.id] = self.fetch_curve(run.id)
+      return [curve for curve in self._completed_curves.values() if curve]
+
+  def check(self, curve):
+    if len(curve) < self.rule.min_checkpoints:
+      return None
+    return self.rule.check(list(curve), self.get_completed_curves())
+
+  def check_run(self, run_id):
+    return self.check(self.fetch_curve(run_id))
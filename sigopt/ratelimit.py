@@ -27,3 +27,25 @@ class _FailedStatusRateLimit(object):
 
 
 failed_status_rate_limit = _FailedStatusRateLimit(5)
+
+
+class RequestRateLimit(object):
+  """A token bucket that lets a burst of requests through and then spaces them out to the given rate."""
+
+  def __init__(self, requests_per_second, burst=None):
+    self.requests_per_second = requests_per_second
+    self.burst = burst or max(1, int(requests_per_second))
+    self.thread_lock = threading.Lock()
+    self.tokens = float(self.burst)
+    self.updated = time.monotonic()
+
+  def acquire(self):
+    with self.thread_lock:
+      now = time.monotonic()
+      self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.requests_per_second)
+      self.updated = now
+      self.tokens -= 1
+      # the token is taken now, so the requests that wait are let through in the order they arrived
+      wait = -self.tokens / self.requests_per_second if self.tokens < 0 else 0
+    if wait:
+      time.sleep(wait)
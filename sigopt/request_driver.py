@@ -21,8 +21,8 @@ DEFAULT_API_URL = "https://api.sigopt.com"
 DEFAULT_HTTP_TIMEOUT = 150
 
 
-def get_expiring_session():
-  adapter = HTTPAdapter()
+def get_expiring_session(pool_maxsize=None):
+  adapter = HTTPAdapter() if pool_maxsize is None else HTTPAdapter(pool_maxsize=pool_maxsize)
   adapter.poolmanager.pool_classes_by_scheme = {
     "http": ExpiringHTTPConnectionPool,
     "https": ExpiringHTTPSConnectionPool,
@@ -1,19 +1,36 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
+import contextlib
 import functools
-
-import requests
-
+import os
+import threading
+
+from .artifacts import (
+  DEFAULT_MAX_UPLOAD_WORKERS,
+  UPLOAD_STATE_COMPLETE,
+  UPLOAD_STATE_IN_PROGRESS,
+  ArtifactIndex,
+  ArtifactSource,
+  MultipartUpload,
+  get_artifact_hashes,
+  guess_artifact_content_type,
+  is_fatal_upload_error,
+  upload_single_part,
+)
+from .compat import lazy_import
 from .config import config
 from .file_utils import create_api_image_payload, get_blob_properties
 from .interface import get_connection
-from .lib import is_mapping, is_string, remove_nones, sanitize_number, validate_name
+from .lib import is_integer, is_mapping, is_string, remove_nones, sanitize_number, validate_name
 from .objects import TrainingRun
+from .pruning import STOPPING_REASON_KEY, get_checkpoint_value
 from .run_params import GlobalRunParameters, RunParameters
 from .sigopt_logging import print_logger
 
 
+requests = lazy_import("requests")
+
 _UNSET = object()
 
 
@@ -86,6 +103,12 @@ class BaseRunContext(object):
   def _log_image(self, name, payload):
     raise NotImplementedError
 
+  def _log_artifact(self, name, source, content_type, part_size):
+    raise NotImplementedError
+
+  def _should_stop(self):
+    raise NotImplementedError
+
   def _end(self, exception):
     raise NotImplementedError
 
@@ -267,6 +290,50 @@ class BaseRunContext(object):
     with image_data:
       self._log_image(name, payload)
 
+  def log_artifact(self, artifact, name=None, content_type=None, part_size=None):
+    """
+        sigopt.log_artifact(artifact, name=None, content_type=None, part_size=None)
+          Uploads a file artifact, such as model weights or a dataset, to your Run.
+          Artifacts with the same content as a previous upload are linked instead of being uploaded again.
+        artifact: string, path-like or binary buffer, required
+          The path of the file to upload, or a bytes-like object or binary file object.
+        name: string
+          An optional name to give your uploaded artifact.
+        content_type: string
+          The MIME type of the artifact. Guessed from the filename when not provided.
+        part_size: integer
+          Opt in to multipart uploads for servers that support them. Artifacts larger than part_size bytes are uploaded
+          in parallel parts and resume from the last confirmed part after a failure.
+          By default the artifact is uploaded with a single request.
+        """
+    if name is not None:
+      validate_name("artifact name", name)
+    if part_size is not None and (not is_integer(part_size) or part_size <= 0):
+      raise ValueError(f"part_size must be a positive integer, got {part_size!r}")
+    with ArtifactSource(artifact) as source:
+      if content_type is None:
+        content_type = guess_artifact_content_type(source.filename)
+      self._log_artifact(name, source, content_type, part_size)
+
+  def should_stop(self):
+    """
+        sigopt.should_stop()
+          Checks whether the run has been pruned based on the checkpoints it has logged so far.
+          Training code that logs checkpoints can call this after each checkpoint and stop early when it returns True.
+          The reason is recorded in the run's sys_metadata.
+        """
+    return bool(self._should_stop())
+
+  @contextlib.contextmanager
+  def batch_updates(self):
+    """
+        with run.batch_updates():
+          Collects the parameters, metadata, metrics and other updates made to the run inside the block and sends
+          them in a single request when the block exits, instead of one request for each update.
+          Checkpoints are still sent as they are logged.
+        """
+    yield self
+
   def end(self, exception=None):
     """
         run.end(exception=None)
@@ -303,6 +370,16 @@ def creates_checkpoint():
   return function_wrapper
 
 
+def merge_update_body(body, update):
+  # the same semantics as a MERGE request, so that merged updates have the same effect as sending them in order
+  for key, value in update.items():
+    if is_mapping(value) and is_mapping(body.get(key)):
+      merge_update_body(body[key], value)
+    else:
+      body[key] = merge_update_body({}, value) if is_mapping(value) else value
+  return body
+
+
 def allow_state_update(new_state, old_state):
   if new_state == old_state:
     return False
@@ -322,6 +399,11 @@ class RunContext(BaseRunContext):
     self.run = run
     fixed_values = dict(run.assignments)
     self._params = RunParameters(self, fixed_values, default_params)
+    self._files_unsupported_warned = False
+    self._pruner = None
+    self._pruning_curve = []
+    self._stopping_reason = None
+    self._pending_update = None
 
   def to_json(self):
     data = {"run": self.run.to_json()}
@@ -370,7 +452,24 @@ class RunContext(BaseRunContext):
       headers,
     )
 
+  @contextlib.contextmanager
+  def batch_updates(self):
+    if self._pending_update is not None:
+      # already batching, the outermost block sends the update
+      yield self
+      return
+    self._pending_update = {}
+    try:
+      yield self
+    finally:
+      pending_update, self._pending_update = self._pending_update, None
+      if pending_update:
+        self._update_run(pending_update)
+
   def _update_run(self, body):
+    if self._pending_update is not None:
+      merge_update_body(self._pending_update, body)
+      return
     self._request(
       method="MERGE",
       path=[],
@@ -436,9 +535,47 @@ class RunContext(BaseRunContext):
 
   @creates_checkpoint()
   def _log_checkpoint(self, values):
+    if self._pruner is not None:
+      value = get_checkpoint_value(values, self._pruner.metric)
+      if value is not None:
+        self._pruning_curve.append(value)
     return values
 
+  @property
+  def stopping_reason(self):
+    return self._stopping_reason
+
+  def set_pruner(self, pruner):
+    self._pruner = pruner
+    self._pruning_curve = []
+
+  def stop(self, reason):
+    if self._stopping_reason is None:
+      self._stopping_reason = reason
+      self._log_sys_metadata({STOPPING_REASON_KEY: reason})
+
+  def _should_stop(self):
+    if self._stopping_reason is None and self._pruner is not None:
+      reason = self._pruner.check(self._pruning_curve)
+      if reason is not None:
+        self.stop(reason)
+    return self._stopping_reason is not None
+
+  def _supports_files(self):
+    # drivers that only keep the run data, ex. the SQLite driver, have nowhere to upload files to
+    if getattr(self.connection.impl.driver, "supports_files", True):
+      return True
+    if not self._files_unsupported_warned:
+      self._files_unsupported_warned = True
+      print_logger.warning(
+        "Warning: images and artifacts of run %s are not logged, since the connection does not store files",
+        self.id,
+      )
+    return False
+
   def _log_image(self, name, payload):
+    if not self._supports_files():
+      return
     filename, image_data, content_type = payload
     content_length, content_md5_base64 = get_blob_properties(image_data)
     file_info = self._request(
@@ -463,6 +600,63 @@ class RunContext(BaseRunContext):
     )
     response.raise_for_status()
 
+  def _link_file(self, file_id):
+    # the files of the run are replaced as a whole, so the file is appended to the current list rather than to
+    # self.run.files, which misses the files uploaded since the run was fetched
+    files = list(self._request(method="GET", path=[], params=None).get("files") or [])
+    if file_id in files:
+      return
+    files.append(file_id)
+    self._request(
+      method="MERGE",
+      path=[],
+      params={"files": files},
+      headers={"X-Response-Content": "skip"},
+    )
+
+  def _log_artifact(self, name, source, content_type, part_size):
+    if not self._supports_files():
+      return
+    content_md5, sha256 = get_artifact_hashes(source)
+    index = ArtifactIndex(getattr(self.connection.impl.driver, "api_url", None))
+    entry = index.get(sha256)
+    if entry is not None and entry.get("state") == UPLOAD_STATE_COMPLETE and entry.get("file_id"):
+      self._link_file(entry["file_id"])
+      return
+    if entry is None or entry.get("state") != UPLOAD_STATE_IN_PROGRESS:
+      file_params = {
+        "content_length": source.size,
+        "content_md5": content_md5,
+        "content_type": content_type,
+        "name": name,
+        "filename": source.filename and os.path.basename(source.filename),
+      }
+      if part_size is not None and source.size > part_size:
+        file_params["part_size"] = part_size
+      file_info = self._request(method="POST", path=["files"], params=file_params)
+      entry = {
+        "state": UPLOAD_STATE_IN_PROGRESS,
+        "file_id": file_info.get("id"),
+        "part_size": part_size,
+        "upload": file_info["upload"],
+        "completed_parts": {},
+      }
+      index.put(sha256, entry)
+    try:
+      if "parts" in entry["upload"]:
+        MultipartUpload(source, index, sha256, entry, max_workers=DEFAULT_MAX_UPLOAD_WORKERS).run()
+      else:
+        upload_single_part(source, entry["upload"])
+    except requests.exceptions.HTTPError as e:
+      # a rejected upload, ex. expired urls or a digest mismatch, has to start over, but other errors can be resumed
+      if is_fatal_upload_error(e):
+        index.remove(sha256)
+      raise
+    entry["state"] = UPLOAD_STATE_COMPLETE
+    entry.pop("upload", None)
+    entry.pop("completed_parts", None)
+    index.put(sha256, entry)
+
 
 class GlobalRunContext(BaseRunContext):
   """
@@ -472,12 +666,22 @@ class GlobalRunContext(BaseRunContext):
 
   CONFIG_CONTEXT_KEY = "global_run_context"
 
-  def __init__(self, run_context):
+  def __init__(self, run_context, config_=None):
     self._run_context = run_context
+    self._config = config_
     self._params = GlobalRunParameters(self)
+    self._run_context_lock = threading.Lock()
+
+  def _get_config_data(self):
+    # the run passed down by a parent process, ex. the CLI
+    return self._config.get_environment_context_data(type(self))
 
   @property
   def id(self):
+    if self._run_context is _UNSET:
+      # the id is read without creating the run context, which needs a connection
+      data = self._get_config_data()
+      return None if data is None else data["run"]["id"]
     if self._run_context is None:
       return None
     return self._run_context.id
@@ -488,26 +692,49 @@ class GlobalRunContext(BaseRunContext):
 
   @property
   def run_context(self):
+    if self._run_context is _UNSET:
+      # the threads of a program could otherwise each create a run context, with its own connection and upload state
+      with self._run_context_lock:
+        if self._run_context is _UNSET:
+          data = self._get_config_data()
+          self._run_context = None if data is None else RunContext.from_json(data)
     return self._run_context
 
   def set_run_context(self, run_context):
-    self._run_context = run_context
+    with self._run_context_lock:
+      self._run_context = run_context
 
   def clear_run_context(self):
-    self._run_context = None
+    with self._run_context_lock:
+      self._run_context = None
 
   def to_json(self):
+    if self._run_context is _UNSET:
+      # pass the context through without connecting to the API
+      return self._get_config_data()
     if self._run_context is None:
       return None
     return self._run_context.to_json()
 
+  def _should_stop(self):
+    run_context = self.run_context
+    if run_context is None:
+      return False
+    return run_context.should_stop()
+
+  @contextlib.contextmanager
+  def batch_updates(self):
+    run_context = self.run_context
+    if run_context is None:
+      yield self
+      return
+    with run_context.batch_updates():
+      yield self
+
   @classmethod
   def from_config(cls, config_):
-    data = config_.get_context_data(cls)
-    run_context = None
-    if data is not None:
-      run_context = RunContext.from_json(data)
-    return cls(run_context)
+    # the run context is created from the config on first use
+    return cls(_UNSET, config_)
 
 
 def delegate_to_run_context(method_name):
@@ -529,6 +756,7 @@ for _method_name in [
   "_log_model",
   "_log_checkpoint",
   "_log_image",
+  "_log_artifact",
   "_set_parameters",
 ]:
   delegate_to_run_context(_method_name)
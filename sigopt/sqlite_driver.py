@@ -0,0 +1,363 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import contextlib
+import http
+import os
+import sqlite3
+import threading
+import time
+
+from .compat import json
+from .exception import ApiException
+from .objects import ApiObject
+from .paths import get_root_dir
+from .run_context import merge_update_body
+
+
+DEFAULT_SQLITE_FILENAME = "sigopt.sqlite3"
+DEFAULT_SQLITE_TIMEOUT = 30
+DEFAULT_PAGE_LIMIT = 100
+LOCAL_CLIENT_ID = "1"
+SQLITE_PATH_ENV_KEY = "SIGOPT_SQLITE_PATH"
+
+SCHEMA = [
+  """
+  CREATE TABLE IF NOT EXISTS projects (
+    pk INTEGER PRIMARY KEY AUTOINCREMENT,
+    client TEXT NOT NULL,
+    id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    UNIQUE (client, id)
+  )
+  """,
+  """
+  CREATE TABLE IF NOT EXISTS training_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client TEXT NOT NULL,
+    project TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    body TEXT NOT NULL
+  )
+  """,
+  "CREATE INDEX IF NOT EXISTS training_runs_by_project ON training_runs (client, project, deleted, id)",
+  """
+  CREATE TABLE IF NOT EXISTS checkpoints (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    training_run INTEGER NOT NULL,
+    body TEXT NOT NULL
+  )
+  """,
+  "CREATE INDEX IF NOT EXISTS checkpoints_by_training_run ON checkpoints (training_run, id)",
+]
+
+
+def get_default_sqlite_path():
+  return os.environ.get(SQLITE_PATH_ENV_KEY) or os.path.join(get_root_dir(), DEFAULT_SQLITE_FILENAME)
+
+
+def not_found(message):
+  return ApiException({"message": message}, http.HTTPStatus.NOT_FOUND)
+
+
+class SQLiteDriver(object):
+  """
+    A driver that serves the runs, checkpoints and projects requests of a Connection from a local SQLite database
+    instead of the SigOpt API. The database is in WAL mode, so that many processes can log to it at the same time.
+    Other requests, such as AI Experiments, are not supported. Files are not stored, so runs skip their images and
+    artifacts.
+    """
+
+  supports_files = False
+
+  def __init__(self, path=None, client_token=None, timeout=DEFAULT_SQLITE_TIMEOUT, **kwargs):
+    del client_token, kwargs
+    self.path = path or get_default_sqlite_path()
+    self.timeout = timeout
+    self._local = threading.local()
+    self._routes = [
+      ("GET", ("tokens", None), self._fetch_token),
+      ("GET", ("clients", None), self._fetch_client),
+      ("POST", ("clients", None, "projects"), self._create_project),
+      ("GET", ("clients", None, "projects"), self._list_projects),
+      ("GET", ("clients", None, "projects", None), self._fetch_project),
+      ("PUT", ("clients", None, "projects", None), self._update_project),
+      ("POST", ("clients", None, "projects", None, "training_runs"), self._create_training_run),
+      ("POST", ("clients", None, "projects", None, "training_runs", "batch"), self._create_training_runs),
+      ("GET", ("clients", None, "projects", None, "training_runs"), self._list_training_runs),
+      ("GET", ("training_runs", None), self._fetch_training_run),
+      ("PUT", ("training_runs", None), self._update_training_run),
+      ("MERGE", ("training_runs", None), self._merge_training_run),
+      ("DELETE", ("training_runs", None), self._delete_training_run),
+      ("POST", ("training_runs", None, "checkpoints"), self._create_checkpoint),
+      ("GET", ("training_runs", None, "checkpoints"), self._list_checkpoints),
+      ("GET", ("training_runs", None, "checkpoints", None), self._fetch_checkpoint),
+    ]
+
+  def set_api_url(self, api_url):
+    pass
+
+  def set_client_token(self, client_token):
+    pass
+
+  @property
+  def db(self):
+    # sqlite3 connections can't be shared by threads, so each thread opens its own
+    db = getattr(self._local, "db", None)
+    if db is None:
+      os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+      db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+      db.row_factory = sqlite3.Row
+      db.execute("PRAGMA journal_mode=WAL")
+      db.execute("PRAGMA synchronous=NORMAL")
+      with self._transaction(db):
+        for statement in SCHEMA:
+          db.execute(statement)
+      self._local.db = db
+    return db
+
+  @staticmethod
+  @contextlib.contextmanager
+  def _transaction(db):
+    # writers take the lock up front, so that read-modify-write updates from other processes are not lost
+    db.execute("BEGIN IMMEDIATE")
+    try:
+      yield db
+    except BaseException:
+      db.execute("ROLLBACK")
+      raise
+    db.execute("COMMIT")
+
+  def request(self, method, path, data, headers):
+    method = method.upper()
+    path = [str(component) for component in path]
+    data = ApiObject.as_json(data) or {}
+    for route_method, pattern, handler in self._routes:
+      if route_method != method or len(pattern) != len(path):
+        continue
+      if all(component is None or component == path[i] for i, component in enumerate(pattern)):
+        response = handler(*(path[i] for i, component in enumerate(pattern) if component is None), data)
+        if headers and headers.get("X-Response-Content") == "skip":
+          return None
+        return response
+    raise not_found(f"{method} /{'/'.join(path)} is not supported by the SQLite driver")
+
+  def _paginate(self, table, key, where, args, data, to_json):
+    limit = int(data.get("limit") or DEFAULT_PAGE_LIMIT)
+    before, after = data.get("before"), data.get("after")
+    count = self.db.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", args).fetchone()[0]  # nosec
+    # the cursors are the indexed keys of the rows, newest first unless paging with after
+    if after is not None:
+      query = f"SELECT * FROM {table} WHERE {where} AND {key} > ? ORDER BY {key} ASC LIMIT ?"  # nosec
+      rows = self.db.execute(query, [*args, int(after), limit + 1]).fetchall()
+    else:
+      cursor_where = f" AND {key} < ?" if before is not None else ""
+      query = f"SELECT * FROM {table} WHERE {where}{cursor_where} ORDER BY {key} DESC LIMIT ?"  # nosec
+      rows = self.db.execute(query, [*args, *([int(before)] if before is not None else []), limit + 1]).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = str(rows[-1][key]) if has_more else None
+    previous_cursor = str(rows[0][key]) if rows else None
+    return {
+      "object": "pagination",
+      "count": count,
+      "data": [to_json(row) for row in rows],
+      "paging": {
+        "after": next_cursor if after is not None else previous_cursor,
+        "before": previous_cursor if after is not None else next_cursor,
+      },
+    }
+
+  def _fetch_token(self, token_id, data):
+    return {"object": "token", "client": LOCAL_CLIENT_ID, "token": token_id, "token_type": "client-api"}
+
+  def _check_client(self, client_id):
+    if client_id != LOCAL_CLIENT_ID:
+      raise not_found(f"No client {client_id}")
+
+  def _fetch_client(self, client_id, data):
+    self._check_client(client_id)
+    return {"object": "client", "id": LOCAL_CLIENT_ID, "name": "Local", "created": None}
+
+  @staticmethod
+  def _project_json(row):
+    return json.loads(row["body"])
+
+  def _get_project_row(self, db, client_id, project_id):
+    self._check_client(client_id)
+    row = db.execute("SELECT * FROM projects WHERE client = ? AND id = ?", [client_id, project_id]).fetchone()
+    if row is None:
+      raise not_found(f"No project {project_id}")
+    return row
+
+  def _create_project(self, client_id, data):
+    self._check_client(client_id)
+    now = int(time.time())
+    project = {
+      "object": "project",
+      "client": client_id,
+      "name": data.get("name", data["id"]),
+      "metadata": data.get("metadata"),
+      "created": now,
+      "updated": now,
+      "user": None,
+      "id": data["id"],
+    }
+    try:
+      with self._transaction(self.db) as db:
+        db.execute(
+          "INSERT INTO projects (client, id, body) VALUES (?, ?, ?)",
+          [client_id, project["id"], json.dumps(project)],
+        )
+    except sqlite3.IntegrityError as ie:
+      raise ApiException({"message": f"Project {project['id']} already exists"}, http.HTTPStatus.CONFLICT) from ie
+    return project
+
+  def _list_projects(self, client_id, data):
+    self._check_client(client_id)
+    return self._paginate("projects", "pk", "client = ?", [client_id], data, self._project_json)
+
+  def _fetch_project(self, client_id, project_id, data):
+    return self._project_json(self._get_project_row(self.db, client_id, project_id))
+
+  def _update_project(self, client_id, project_id, data):
+    with self._transaction(self.db) as db:
+      project = self._project_json(self._get_project_row(db, client_id, project_id))
+      project.update({key: value for key, value in data.items() if key not in ("id", "client", "object")})
+      project["updated"] = int(time.time())
+      db.execute(
+        "UPDATE projects SET body = ? WHERE client = ? AND id = ?",
+        [json.dumps(project), client_id, project_id],
+      )
+    return project
+
+  def _training_run_json(self, row):
+    training_run = json.loads(row["body"])
+    training_run["id"] = str(row["id"])
+    training_run["checkpoint_count"] = self.db.execute(
+      "SELECT COUNT(*) FROM checkpoints WHERE training_run = ?",
+      [row["id"]],
+    ).fetchone()[0]
+    return training_run
+
+  def _get_training_run_row(self, db, training_run_id):
+    row = None
+    if training_run_id.isdigit():
+      row = db.execute("SELECT * FROM training_runs WHERE id = ?", [int(training_run_id)]).fetchone()
+    if row is None:
+      raise not_found(f"No training run {training_run_id}")
+    return row
+
+  def _insert_training_run(self, db, client_id, project_id, data):
+    now = int(time.time())
+    training_run = {
+      "object": "training_run",
+      "assignments": {},
+      "values": {},
+      "state": "active",
+      **data,
+      "client": client_id,
+      "project": project_id,
+      "created": now,
+      "updated": now,
+      "deleted": False,
+      "finished": False,
+    }
+    cursor = db.execute(
+      "INSERT INTO training_runs (client, project, body) VALUES (?, ?, ?)",
+      [client_id, project_id, json.dumps(training_run)],
+    )
+    return cursor.lastrowid
+
+  def _create_training_run(self, client_id, project_id, data):
+    with self._transaction(self.db) as db:
+      self._get_project_row(db, client_id, project_id)
+      training_run_id = self._insert_training_run(db, client_id, project_id, data)
+    return self._fetch_training_run(str(training_run_id), {})
+
+  def _create_training_runs(self, client_id, project_id, data):
+    with self._transaction(self.db) as db:
+      self._get_project_row(db, client_id, project_id)
+      training_run_ids = [self._insert_training_run(db, client_id, project_id, run) for run in data.get("runs", [])]
+    training_runs = [self._fetch_training_run(str(training_run_id), {}) for training_run_id in training_run_ids]
+    return {"object": "pagination", "count": len(training_runs), "data": training_runs, "paging": {}}
+
+  def _list_training_runs(self, client_id, project_id, data):
+    self._get_project_row(self.db, client_id, project_id)
+    return self._paginate(
+      "training_runs",
+      "id",
+      "client = ? AND project = ? AND deleted = 0",
+      [client_id, project_id],
+      data,
+      self._training_run_json,
+    )
+
+  def _fetch_training_run(self, training_run_id, data):
+    return self._training_run_json(self._get_training_run_row(self.db, training_run_id))
+
+  def _write_training_run(self, training_run_id, update):
+    with self._transaction(self.db) as db:
+      row = self._get_training_run_row(db, training_run_id)
+      training_run = json.loads(row["body"])
+      update(training_run)
+      now = int(time.time())
+      training_run["updated"] = now
+      if training_run.get("state") in ("completed", "failed") and not training_run.get("finished"):
+        training_run["finished"] = True
+        training_run["completed"] = now
+      db.execute(
+        "UPDATE training_runs SET body = ?, deleted = ? WHERE id = ?",
+        [json.dumps(training_run), int(bool(training_run.get("deleted"))), row["id"]],
+      )
+    return self._fetch_training_run(training_run_id, {})
+
+  def _update_training_run(self, training_run_id, data):
+    return self._write_training_run(training_run_id, lambda training_run: training_run.update(data))
+
+  def _merge_training_run(self, training_run_id, data):
+    return self._write_training_run(training_run_id, lambda training_run: merge_update_body(training_run, data))
+
+  def _delete_training_run(self, training_run_id, data):
+    self._write_training_run(training_run_id, lambda training_run: training_run.update(deleted=True))
+
+  @staticmethod
+  def _checkpoint_json(row):
+    checkpoint = json.loads(row["body"])
+    checkpoint["id"] = str(row["id"])
+    return checkpoint
+
+  def _create_checkpoint(self, training_run_id, data):
+    checkpoint = {
+      "object": "checkpoint",
+      "created": int(time.time()),
+      "metadata": data.get("metadata"),
+      "should_stop": False,
+      "stopping_reasons": {},
+      "training_run": training_run_id,
+      "values": data.get("values", []),
+    }
+    with self._transaction(self.db) as db:
+      row = self._get_training_run_row(db, training_run_id)
+      cursor = db.execute(
+        "INSERT INTO checkpoints (training_run, body) VALUES (?, ?)",
+        [row["id"], json.dumps(checkpoint)],
+      )
+    checkpoint["id"] = str(cursor.lastrowid)
+    return checkpoint
+
+  def _list_checkpoints(self, training_run_id, data):
+    row = self._get_training_run_row(self.db, training_run_id)
+    return self._paginate("checkpoints", "id", "training_run = ?", [row["id"]], data, self._checkpoint_json)
+
+  def _fetch_checkpoint(self, training_run_id, checkpoint_id, data):
+    row = self._get_training_run_row(self.db, training_run_id)
+    checkpoint_row = None
+    if checkpoint_id.isdigit():
+      checkpoint_row = self.db.execute(
+        "SELECT * FROM checkpoints WHERE training_run = ? AND id = ?",
+        [row["id"], int(checkpoint_id)],
+      ).fetchone()
+    if checkpoint_row is None:
+      raise not_found(f"No checkpoint {checkpoint_id}")
+    return self._checkpoint_json(checkpoint_row)
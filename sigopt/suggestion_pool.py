@@ -0,0 +1,143 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import collections
+import http
+import threading
+
+from .exception import ApiException
+
+
+class SuggestionPool(object):
+  """
+    Prefetches the suggestions of a core API experiment in a background thread and hands them out to worker threads,
+    so that the workers don't wait for a suggestion round trip before each evaluation.
+    Up to size suggestions are kept ready, parallel_bandwidth of the experiment minus workers by default. A suggestion
+    that was handed out keeps its slot until its observation is reported with report, or it is released with release,
+    so that no more than size + workers suggestions are open at a time. They are created with
+    experiments(id).suggestions().create(), which serves the queued suggestions of the experiment first.
+    The suggestions that were not handed out are deleted when the pool is closed.
+    """
+
+  def __init__(self, connection, experiment_id, size=None, workers=1, create_params=None):
+    self.connection = connection
+    self.experiment_id = experiment_id
+    if workers < 1:
+      raise ValueError(f"workers must be at least 1, got {workers}")
+    if size is None:
+      size = max((connection.experiments(experiment_id).fetch().parallel_bandwidth or 1) - workers, 1)
+    if size < 1:
+      raise ValueError(f"size must be at least 1, got {size}")
+    self.size = size
+    self.workers = workers
+    self.create_params = create_params or {}
+    self._suggestions = collections.deque()
+    self._handed_out = set()
+    self._condition = threading.Condition()
+    self._error = None
+    self._closed = False
+    self._thread = threading.Thread(target=self._prefetch, daemon=True)
+    self._thread.start()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.close()
+
+  def _create_suggestion(self):
+    return self.connection.experiments(self.experiment_id).suggestions().create(**self.create_params)
+
+  def _delete_suggestion(self, suggestion):
+    try:
+      self.connection.experiments(self.experiment_id).suggestions(suggestion.id).delete()
+    except ApiException as e:
+      if e.status_code != http.HTTPStatus.NOT_FOUND:
+        raise
+
+  def _is_full(self):
+    ready = len(self._suggestions)
+    return ready >= self.size or ready + len(self._handed_out) >= self.size + self.workers
+
+  def _prefetch(self):
+    while True:
+      with self._condition:
+        # after an error the pool waits for get to raise it, so that a failing experiment is not hammered
+        while not self._closed and (self._error is not None or self._is_full()):
+          self._condition.wait()
+        if self._closed:
+          return
+      try:
+        suggestion = self._create_suggestion()
+      except Exception as e:  # pylint: disable=broad-except
+        with self._condition:
+          self._error = e
+          self._condition.notify_all()
+        continue
+      with self._condition:
+        # a suggestion created while the pool was closing is deleted by close with the others
+        self._suggestions.append(suggestion)
+        self._condition.notify_all()
+
+  def get(self, timeout=None):
+    """
+      Returns the next prefetched suggestion, waiting for one if there are none ready.
+      Raises the error of the background thread if it failed to create a suggestion, after which it tries again.
+      """
+    with self._condition:
+      ready = self._condition.wait_for(
+        lambda: self._closed or self._suggestions or self._error is not None,
+        timeout=timeout,
+      )
+      if not ready:
+        raise TimeoutError(f"No suggestion was ready after {timeout} seconds")
+      if self._closed:
+        raise ValueError("The suggestion pool is closed")
+      if self._suggestions:
+        suggestion = self._suggestions.popleft()
+        self._handed_out.add(suggestion.id)
+        self._condition.notify_all()
+        return suggestion
+      error, self._error = self._error, None
+      self._condition.notify_all()
+      raise error
+
+  def release(self, suggestion):
+    """Frees the slot of a suggestion that was handed out, once its observation has been reported."""
+    with self._condition:
+      self._handed_out.discard(suggestion.id)
+      self._condition.notify_all()
+
+  def report(self, suggestion, **observation):
+    """
+      Creates the observation of a suggestion that was handed out, with the same arguments as observations().create(),
+      and frees its slot.
+      """
+    try:
+      observations = self.connection.experiments(self.experiment_id).observations()
+      return observations.create(suggestion=suggestion.id, **observation)
+    finally:
+      self.release(suggestion)
+
+  def close(self):
+    """
+      Stops prefetching and deletes the suggestions that were not handed out.
+      Every unused suggestion is deleted before the first error of a deletion is raised.
+      """
+    with self._condition:
+      if self._closed:
+        return
+      self._closed = True
+      self._condition.notify_all()
+    self._thread.join()
+    with self._condition:
+      unused, self._suggestions = list(self._suggestions), collections.deque()
+    error = None
+    for suggestion in unused:
+      try:
+        self._delete_suggestion(suggestion)
+      except Exception as e:  # pylint: disable=broad-except
+        if error is None:
+          error = e
+    if error is not None:
+      raise error
@@ -1,5 +1,6 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
+from .cv import cv
 from .experiment import experiment
 from .run import run
@@ -1,14 +1,56 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
+import os
+import tempfile
+
 from ..decorators import public
-from .compat import xgboost
+from .compat import Booster, xgboost
+
+
+# booster attribute with the number of rounds the run had trained when the booster was saved
+BOOSTER_CHECKPOINT_ROUNDS_ATTR = "sigopt_num_boosted_rounds"
+
+
+def get_booster_checkpoint_path(model_checkpoint_dir, run_id):
+  return os.path.join(os.fspath(model_checkpoint_dir), f"run-{run_id}.ubj")
+
+
+def save_booster_checkpoint(model, path, num_boosted_rounds):
+  """Saves the booster to a temporary file next to path and renames it, so that path always holds a whole booster."""
+  directory = os.path.dirname(path) or "."
+  os.makedirs(directory, exist_ok=True)
+  fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".ubj")
+  os.close(fd)
+  model.set_attr(**{BOOSTER_CHECKPOINT_ROUNDS_ATTR: str(num_boosted_rounds)})
+  try:
+    model.save_model(tmp_path)
+    with open(tmp_path, "rb+") as tmp_file:
+      os.fsync(tmp_file.fileno())
+    os.replace(tmp_path, path)
+  except BaseException:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+    raise
+  finally:
+    model.set_attr(**{BOOSTER_CHECKPOINT_ROUNDS_ATTR: None})
+
+
+def load_booster_checkpoint(path):
+  """Returns the saved booster and the number of rounds the run had trained when it was saved."""
+  model = Booster(model_file=path)
+  num_boosted_rounds = int(model.attr(BOOSTER_CHECKPOINT_ROUNDS_ATTR))
+  model.set_attr(**{BOOSTER_CHECKPOINT_ROUNDS_ATTR: None})
+  return model, num_boosted_rounds
 
 
 class SigOptCheckpointCallback(xgboost.callback.TrainingCallback):
-  def __init__(self, run, period=1):
+  def __init__(self, run, period=1, start_epoch=0, logged_checkpoints=0):
     self.run = run
     self.period = period
+    # a resumed training counts its epochs from the saved booster, and skips the checkpoints that were already logged
+    self.start_epoch = start_epoch
+    self.logged_checkpoints = logged_checkpoints
     self._latest = None
     super().__init__()
 
@@ -17,6 +59,7 @@ class SigOptCheckpointCallback(xgboost.callback.TrainingCallback):
     if not evals_log:
       return False
 
+    epoch += self.start_epoch
     checkpoint_logs = {}
     for dataset, metric_dict in evals_log.items():
       for metric_label, metric_record in metric_dict.items():
@@ -26,10 +69,13 @@ class SigOptCheckpointCallback(xgboost.callback.TrainingCallback):
           chkpt_value = metric_record[-1]
         checkpoint_logs.update({"-".join((dataset, metric_label)): chkpt_value})
     if (epoch % self.period) == 0 or self.period == 1:
-      self.run.log_checkpoint(checkpoint_logs)
       self._latest = None
-    else:
-      self._latest = checkpoint_logs
+      if epoch // self.period < self.logged_checkpoints:
+        return False
+      self.run.log_checkpoint(checkpoint_logs)
+      # stop training if the run has been pruned based on the checkpoints so far
+      return self.run.should_stop()
+    self._latest = checkpoint_logs
 
     return False
 
@@ -38,3 +84,20 @@ class SigOptCheckpointCallback(xgboost.callback.TrainingCallback):
     if self._latest is not None:
       self.run.log_checkpoint(self._latest)
     return model
+
+
+class BoosterCheckpointCallback(xgboost.callback.TrainingCallback):
+  """Saves the booster every period boosting rounds, so that the training can be resumed if it is interrupted."""
+
+  def __init__(self, path, period, num_boosted_rounds=0):
+    self.path = path
+    self.period = period
+    self.num_boosted_rounds = num_boosted_rounds
+    super().__init__()
+
+  @public
+  def after_iteration(self, model, epoch, evals_log):
+    self.num_boosted_rounds += 1
+    if self.num_boosted_rounds % self.period == 0:
+      save_booster_checkpoint(model, self.path, self.num_boosted_rounds)
+    return False
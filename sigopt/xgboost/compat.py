@@ -16,6 +16,9 @@ except ImportError as ie_xgb:
     " functionality. Try running `pip install 'sigopt[xgboost]'`."
   ) from ie_xgb
 
+# external memory data iterators were added in xgboost 1.5
+DataIter = getattr(xgboost, "DataIter", None)
+
 if parse(xgboost.__version__) < parse(MIN_REQUIRED_XGBOOST_VERSION):
   raise ImportError(
     "sigopt.xgboost.run is compatible with"
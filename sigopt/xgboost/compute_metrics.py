@@ -1,11 +1,17 @@
 # Copyright © 2022 Intel Corporation
 #
 # SPDX-License-Identifier: MIT
-import math
+from inspect import signature
 
 import numpy
 
-from .compat import Booster
+from .compat import Booster, xgboost
+
+
+DENSE_CONFUSION_MATRIX_MIN_SIZE = 1 << 16
+AUC_HISTOGRAM_BINS = 1 << 14
+AUC_HISTOGRAM_MAX_LOGIT = 20.0
+METRICS_SAMPLE_SEED = 0
 
 
 def compute_positives_and_negatives(y_true, y_pred, class_label):
@@ -25,32 +31,133 @@ def compute_accuracy(y_true, y_pred):
   return accuracy
 
 
-def compute_classification_report(y_true, y_pred):
-  classes = numpy.unique(y_true)
+def _get_dense_num_classes(y_true, y_pred):
+  # non-negative integer labels, which is what xgboost produces, index the matrix directly unless they are sparse
+  if not len(y_true):
+    return None
+  if not (numpy.issubdtype(y_true.dtype, numpy.number) and numpy.issubdtype(y_pred.dtype, numpy.number)):
+    return None
+  low = min(y_true.min(), y_pred.min())
+  high = max(y_true.max(), y_pred.max())
+  if not low >= 0 or (high + 1) ** 2 > max(4 * len(y_true), DENSE_CONFUSION_MATRIX_MIN_SIZE):
+    return None
+  if not (numpy.array_equal(numpy.floor(y_true), y_true) and numpy.array_equal(numpy.floor(y_pred), y_pred)):
+    return None
+  return int(high) + 1
+
+
+def compute_confusion_matrix(y_true, y_pred):
+  """
+    Returns the sorted class labels and the confusion matrix, with true labels as rows and predictions as columns.
+    The matrix is counted with a single bincount over the data.
+    """
+  y_true = numpy.asarray(y_true)
+  y_pred = numpy.asarray(y_pred)
+  num_classes = _get_dense_num_classes(y_true, y_pred)
+  if num_classes is not None:
+    true_index = y_true.astype(numpy.int64)
+    pred_index = y_pred.astype(numpy.int64)
+    classes = numpy.arange(num_classes).astype(numpy.result_type(y_true, y_pred))
+  else:
+    classes, inverse = numpy.unique(numpy.concatenate([y_true, y_pred]), return_inverse=True)
+    num_classes = len(classes)
+    true_index, pred_index = inverse[: len(y_true)], inverse[len(y_true) :]
+  counts = numpy.bincount(true_index * num_classes + pred_index, minlength=num_classes * num_classes)
+  matrix = counts.reshape(num_classes, num_classes)
+  present = (matrix.sum(axis=0) + matrix.sum(axis=1)) > 0
+  return classes[present], matrix[numpy.ix_(present, present)]
+
+
+def _safe_divide(numerator, denominator):
+  numerator = numpy.asarray(numerator, dtype=float)
+  denominator = numpy.asarray(denominator, dtype=float)
+  return numpy.divide(numerator, denominator, out=numpy.zeros_like(numerator), where=denominator != 0)
+
+
+def compute_classification_report_from_confusion_matrix(classes, confusion_matrix):
+  tp = numpy.diag(confusion_matrix)
+  support = confusion_matrix.sum(axis=1)
+  predicted = confusion_matrix.sum(axis=0)
+  total = support.sum()
+  precision = _safe_divide(tp, predicted)
+  recall = _safe_divide(tp, support)
+  f1 = _safe_divide(2 * tp, support + predicted)
+  weights = _safe_divide(support, total)
+  accuracy = float(_safe_divide(tp.sum(), total))
   classification_report = {}
+  for i, class_label in enumerate(classes):
+    # only labels of the true data are reported, labels that are only predicted still count towards the averages
+    if support[i]:
+      classification_report[str(class_label)] = {
+        "precision": precision[i],
+        "recall": recall[i],
+        "f1-score": f1[i],
+        "support": support[i],
+      }
+  classification_report["accuracy"] = accuracy
+  classification_report["macro avg"] = {
+    "precision": numpy.mean(precision),
+    "recall": numpy.mean(recall),
+    "f1-score": numpy.mean(f1),
+    "support": total,
+  }
+  classification_report["micro avg"] = {
+    "precision": accuracy,
+    "recall": accuracy,
+    "f1-score": accuracy,
+    "support": total,
+  }
   classification_report["weighted avg"] = {
-    "f1-score": 0,
-    "recall": 0,
-    "precision": 0,
+    "precision": numpy.dot(weights, precision),
+    "recall": numpy.dot(weights, recall),
+    "f1-score": numpy.dot(weights, f1),
+    "support": total,
   }
-  for class_label in classes:
-    tp, _, fp, fn = compute_positives_and_negatives(y_true, y_pred, class_label)
-    precision = tp / (tp + fp) if (tp + fp) != 0 else 0
-    recall = tp / (tp + fn) if (tp + fn) != 0 else 0
-    f1 = tp / (tp + 0.5 * (fp + fn)) if not math.isclose((tp + 0.5 * (fp + fn)), 0, rel_tol=1e-09, abs_tol=0.0) else 0
-    support = numpy.count_nonzero(y_true == class_label)
-    classification_report[str(class_label)] = {
-      "precision": precision,
-      "recall": recall,
-      "f1-score": f1,
-      "support": support,
-    }
-    classification_report["weighted avg"]["precision"] += (support / len(y_pred)) * precision
-    classification_report["weighted avg"]["recall"] += (support / len(y_pred)) * recall
-    classification_report["weighted avg"]["f1-score"] += (support / len(y_pred)) * f1
   return classification_report
 
 
+def compute_classification_report(y_true, y_pred):
+  classes, confusion_matrix = compute_confusion_matrix(y_true, y_pred)
+  return compute_classification_report_from_confusion_matrix(classes, confusion_matrix)
+
+
+def compute_log_loss(y_true, y_prob, eps=1e-15):
+  y_true = numpy.asarray(y_true)
+  y_prob = numpy.clip(numpy.asarray(y_prob, dtype=float), eps, 1 - eps)
+  if y_prob.ndim == 1:
+    return -numpy.mean(y_true * numpy.log(y_prob) + (1 - y_true) * numpy.log(1 - y_prob))
+  return -numpy.mean(numpy.log(y_prob[numpy.arange(len(y_true)), y_true.astype(numpy.int64)]))
+
+
+def _average_ranks(scores):
+  _, inverse, counts = numpy.unique(scores, return_inverse=True, return_counts=True)
+  ends = numpy.cumsum(counts)
+  return (ends - (counts - 1) / 2)[inverse]
+
+
+def _compute_binary_auc(positive, scores):
+  num_positive = numpy.count_nonzero(positive)
+  num_negative = len(positive) - num_positive
+  if not num_positive or not num_negative:
+    return None
+  ranks = _average_ranks(scores)
+  return (ranks[positive].sum() - num_positive * (num_positive + 1) / 2) / (num_positive * num_negative)
+
+
+def compute_auc(y_true, y_prob):
+  """
+    Returns the area under the ROC curve, averaged one-vs-rest over the classes for multiclass probabilities.
+    Returns None when no class has both positive and negative examples.
+    """
+  y_true = numpy.asarray(y_true)
+  y_prob = numpy.asarray(y_prob, dtype=float)
+  if y_prob.ndim == 1:
+    return _compute_binary_auc(y_true == 1, y_prob)
+  aucs = [_compute_binary_auc(y_true == class_index, y_prob[:, class_index]) for class_index in range(y_prob.shape[1])]
+  aucs = [auc for auc in aucs if auc is not None]
+  return numpy.mean(aucs) if aucs else None
+
+
 def compute_mae(y_true, y_pred):
   d = y_true - y_pred
   return numpy.mean(abs(d))
@@ -61,34 +168,230 @@ def compute_mse(y_true, y_pred):
   return numpy.mean(d**2)
 
 
-def compute_classification_metrics(model, D_matrix_pair):
+def _merge_confusion_matrices(classes_a, matrix_a, classes_b, matrix_b):
+  classes = numpy.union1d(classes_a, classes_b)
+  matrix = numpy.zeros((len(classes), len(classes)), dtype=numpy.int64)
+  for chunk_classes, chunk_matrix in ((classes_a, matrix_a), (classes_b, matrix_b)):
+    index = numpy.searchsorted(classes, chunk_classes)
+    matrix[numpy.ix_(index, index)] += chunk_matrix
+  return classes, matrix
+
+
+class RegressionMetricsAccumulator(object):
+  """Keeps the sums needed for the regression metrics while the predictions are scored chunk by chunk."""
+
+  def __init__(self):
+    self.count = 0
+    self.absolute_error = 0.0
+    self.squared_error = 0.0
+
+  def update(self, y_true, y_pred):
+    if not len(y_true):
+      return
+    d = y_true - numpy.round(y_pred)
+    self.count += len(d)
+    self.absolute_error += float(numpy.sum(numpy.abs(d)))
+    self.squared_error += float(numpy.dot(d, d))
+
+  def get_metrics(self):
+    if not self.count:
+      return {}
+    return {
+      "mean absolute error": self.absolute_error / self.count,
+      "mean squared error": self.squared_error / self.count,
+    }
+
+
+def get_auc_histogram_bins(scores):
+  # the bins are spaced evenly in logit, so that confident predictions close to 0 or 1 are still told apart
+  with numpy.errstate(divide="ignore"):
+    logits = numpy.log(scores) - numpy.log1p(-scores)
+  logits = numpy.nan_to_num(logits, nan=0.0)
+  position = (logits + AUC_HISTOGRAM_MAX_LOGIT) * (AUC_HISTOGRAM_BINS / (2 * AUC_HISTOGRAM_MAX_LOGIT))
+  return numpy.clip(position.astype(numpy.int64), 0, AUC_HISTOGRAM_BINS - 1)
+
+
+class ClassificationMetricsAccumulator(object):
+  """
+    Keeps the confusion matrix, and for probabilities the log loss sum and the scores, while the predictions are
+    scored chunk by chunk. AUC is exact when the scores are kept, ie. with exact_auc, which is used for a sample of
+    the predictions, or when there is a single chunk. Otherwise the scores are streamed into histograms and the AUC
+    is estimated from them.
+    """
+
+  def __init__(self, probabilities, exact_auc=False):
+    self.probabilities = probabilities
+    self.exact_auc = exact_auc
+    self.classes = None
+    self.confusion_matrix = None
+    self.count = 0
+    self.log_loss_sum = 0.0
+    self.scores = []
+    self.positive_histogram = None
+    self.negative_histogram = None
+
+  def update(self, y_true, raw_preds):
+    if not len(y_true):
+      return
+    if len(raw_preds.shape) == 2:
+      y_pred = numpy.argmax(raw_preds, axis=1)
+    else:
+      y_pred = numpy.round(raw_preds)
+    classes, confusion_matrix = compute_confusion_matrix(y_true, y_pred)
+    if self.classes is None:
+      self.classes, self.confusion_matrix = classes, confusion_matrix
+    else:
+      self.classes, self.confusion_matrix = _merge_confusion_matrices(
+        self.classes,
+        self.confusion_matrix,
+        classes,
+        confusion_matrix,
+      )
+    self.count += len(y_true)
+    if self.probabilities:
+      self.log_loss_sum += compute_log_loss(y_true, raw_preds) * len(y_true)
+      self._update_scores(y_true, raw_preds)
+
+  def _update_scores(self, y_true, raw_preds):
+    # the first chunk is kept, since it is the only one when the predictions fit in memory
+    if self.exact_auc or (not self.scores and self.positive_histogram is None):
+      self.scores.append((y_true, raw_preds))
+      return
+    for kept_y_true, kept_raw_preds in self.scores:
+      self._update_histograms(kept_y_true, kept_raw_preds)
+    self.scores = []
+    self._update_histograms(y_true, raw_preds)
+
+  def _update_histograms(self, y_true, raw_preds):
+    if len(raw_preds.shape) == 1:
+      scores = raw_preds[:, numpy.newaxis]
+      positive = (y_true == 1)[:, numpy.newaxis]
+    else:
+      scores = raw_preds
+      positive = y_true[:, numpy.newaxis] == numpy.arange(raw_preds.shape[1])
+    num_columns = scores.shape[1]
+    bins = get_auc_histogram_bins(numpy.asarray(scores, dtype=float))
+    bins += numpy.arange(num_columns) * AUC_HISTOGRAM_BINS
+    size = num_columns * AUC_HISTOGRAM_BINS
+    positive_histogram = numpy.bincount(bins.ravel(), weights=positive.ravel(), minlength=size)
+    negative_histogram = numpy.bincount(bins.ravel(), weights=~positive.ravel(), minlength=size)
+    if self.positive_histogram is None:
+      self.positive_histogram = positive_histogram.reshape(num_columns, AUC_HISTOGRAM_BINS)
+      self.negative_histogram = negative_histogram.reshape(num_columns, AUC_HISTOGRAM_BINS)
+    else:
+      self.positive_histogram += positive_histogram.reshape(num_columns, AUC_HISTOGRAM_BINS)
+      self.negative_histogram += negative_histogram.reshape(num_columns, AUC_HISTOGRAM_BINS)
+
+  def get_auc(self):
+    if self.scores:
+      y_true = numpy.concatenate([y_true for y_true, _ in self.scores])
+      raw_preds = numpy.concatenate([raw_preds for _, raw_preds in self.scores])
+      return compute_auc(y_true, raw_preds)
+    aucs = []
+    for positive, negative in zip(self.positive_histogram, self.negative_histogram):
+      num_positive, num_negative = positive.sum(), negative.sum()
+      if num_positive and num_negative:
+        # negatives in lower bins rank below the positives, negatives in the same bin count as ties
+        negative_below = numpy.cumsum(negative) - negative
+        aucs.append(numpy.dot(positive, negative_below + negative / 2) / (num_positive * num_negative))
+    return numpy.mean(aucs) if aucs else None
+
+  def get_metrics(self):
+    if not self.count:
+      return {}
+    report = compute_classification_report_from_confusion_matrix(self.classes, self.confusion_matrix)
+    weighted = report["weighted avg"]
+    metrics = {
+      "accuracy": report["accuracy"],
+      "F1": weighted["f1-score"],
+      "recall": weighted["recall"],
+      "precision": weighted["precision"],
+    }
+    if self.probabilities:
+      metrics["log loss"] = self.log_loss_sum / self.count
+      auc = self.get_auc()
+      if auc is not None:
+        metrics["AUC"] = auc
+    return metrics
+
+
+def get_predict_kwargs(model):
+  # score the model that early stopping selected rather than every boosted round
+  best_iteration = model.attr("best_iteration")
+  if best_iteration is not None and "iteration_range" in signature(model.predict).parameters:
+    return {"iteration_range": (0, int(best_iteration) + 1)}
+  return {}
+
+
+def _iterate_chunks(D_matrix, rows, chunk_size):
+  if rows is None and (chunk_size is None or D_matrix.num_row() <= chunk_size):
+    yield D_matrix
+    return
+  if rows is None:
+    rows = numpy.arange(D_matrix.num_row())
+  chunk_size = chunk_size or len(rows)
+  for start in range(0, len(rows), chunk_size):
+    try:
+      chunk = D_matrix.slice(rows[start : start + chunk_size])
+    except xgboost.core.XGBoostError:
+      # some DMatrix types can't be sliced, ex. QuantileDMatrix, so they are scored whole
+      if start:
+        raise
+      yield D_matrix
+      return
+    yield chunk
+
+
+def iterate_predictions(model, D_matrix, chunk_size=None, sample_size=None):
+  """
+    Yields (labels, predictions) over chunks of at most chunk_size rows, so that only one chunk of predictions is
+    held in memory at a time. With a sample_size the metrics are estimated from a fixed random sample of rows.
+    An external memory DMatrix is read one batch of its DataIter at a time.
+    """
+  predict_kwargs = get_predict_kwargs(model)
+  num_rows = D_matrix.num_row()
+  random_state = numpy.random.default_rng(METRICS_SAMPLE_SEED)
+  sampled = sample_size is not None and sample_size < num_rows
+  data_iter = getattr(D_matrix, "data_iter", None)
+  if data_iter is None:
+    rows = numpy.sort(random_state.choice(num_rows, sample_size, replace=False)) if sampled else None
+    batches = [(D_matrix, rows)]
+  else:
+    from .data_iter import iterate_batches
+
+    # the batches are sampled as they are read, so the sample size is only matched on average
+    batches = (
+      (batch, numpy.flatnonzero(random_state.random(batch.num_row()) * num_rows < sample_size) if sampled else None)
+      for batch in iterate_batches(data_iter, **D_matrix.batch_kwargs)
+    )
+  for batch, rows in batches:
+    for chunk in _iterate_chunks(batch, rows, chunk_size):
+      # an empty chunk, ex. of an empty validation set, has nothing to score
+      if chunk.num_row():
+        yield chunk.get_label(), model.predict(chunk, **predict_kwargs)
+
+
+def compute_classification_metrics(model, D_matrix_pair, probabilities=None, chunk_size=None, sample_size=None):
   assert isinstance(model, Booster)
   D_matrix, D_name = D_matrix_pair
-  preds = model.predict(D_matrix)
-  # Check shape of preds
-  if len(preds.shape) == 2:
-    preds = numpy.argmax(preds, axis=1)
-  else:
-    preds = numpy.round(preds)
-  y_test = D_matrix.get_label()
-  accuracy = compute_accuracy(y_test, preds)
-  rep = compute_classification_report(y_test, preds)
-  other_metrics = rep["weighted avg"]
-  return {
-    f"{D_name}-accuracy": accuracy,
-    f"{D_name}-F1": other_metrics["f1-score"],
-    f"{D_name}-recall": other_metrics["recall"],
-    f"{D_name}-precision": other_metrics["precision"],
-  }
+  accumulator = None
+  for y_test, raw_preds in iterate_predictions(model, D_matrix, chunk_size, sample_size):
+    if accumulator is None:
+      accumulator = ClassificationMetricsAccumulator(
+        len(raw_preds.shape) == 2 if probabilities is None else probabilities,
+        exact_auc=sample_size is not None,
+      )
+    accumulator.update(y_test, raw_preds)
+  if accumulator is None:
+    # an empty validation set has no metrics
+    return {}
+  return {f"{D_name}-{name}": value for name, value in accumulator.get_metrics().items()}
 
 
-def compute_regression_metrics(model, D_matrix_pair):
+def compute_regression_metrics(model, D_matrix_pair, chunk_size=None, sample_size=None):
   assert isinstance(model, Booster)
   D_matrix, D_name = D_matrix_pair
-  preds = model.predict(D_matrix)
-  preds = numpy.round(preds)
-  y_test = D_matrix.get_label()
-  return {
-    f"{D_name}-mean absolute error": compute_mae(y_test, preds),
-    f"{D_name}-mean squared error": compute_mse(y_test, preds),
-  }
+  accumulator = RegressionMetricsAccumulator()
+  for y_test, preds in iterate_predictions(model, D_matrix, chunk_size, sample_size):
+    accumulator.update(y_test, preds)
+  return {f"{D_name}-{name}": value for name, value in accumulator.get_metrics().items()}
@@ -26,6 +26,13 @@ DEFAULT_SEARCH_PARAMS = [
 ]
 
 # optimization metrics
+TRAINING_TIME_METRIC = "Training time"
+TRAINING_CPU_TIME_METRIC = "Training CPU time"
+COST_METRICS = [TRAINING_TIME_METRIC, TRAINING_CPU_TIME_METRIC]
+COST_AWARE_MODES = ["constraint", "objective"]
+# booster params that trade the quality of the model against the cost of training it, added by cost_aware experiments
+COST_TREE_METHODS = ["approx", "hist"]
+COST_MAX_BIN_GRID = [32, 64, 128, 256, 512]
 CLASSIFICATION_METRIC_CHOICES = ["accuracy", "F1", "precision", "recall"]
 REGRESSION_METRIC_CHOICES = ["mean absolute error", "mean squared error"]
 SUPPORTED_METRICS_TO_OPTIMIZE = CLASSIFICATION_METRIC_CHOICES + REGRESSION_METRIC_CHOICES
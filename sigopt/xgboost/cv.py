@@ -0,0 +1,276 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import concurrent.futures
+import copy
+import math
+import time
+
+import numpy
+
+from ..log_capture import NullStreamMonitor
+from ..model_aware_run import ModelAwareRun
+from .compat import DMatrix, xgboost
+from .compute_metrics import compute_classification_metrics, compute_regression_metrics
+from .constants import DEFAULT_EVALS_NAME, TRAINING_TIME_METRIC
+from .experiment import get_available_cpu_count
+from .run import (
+  DEFAULT_CHECKPOINT_PERIOD,
+  MAX_NUM_CHECKPOINTS,
+  PROBABILITY_OBJECTIVES,
+  SUPPORTED_OBJECTIVE_PREFIXES,
+  XGBRunHandler,
+  get_objective,
+)
+
+
+DEFAULT_NFOLD = 3
+CV_TRAIN_EVALS_NAME = "train"
+
+
+def make_folds(dtrain, nfold, stratified=False, shuffle=True, seed=0, folds=None):
+  """
+    Returns the (train_index, test_index) pairs of the folds. folds can be a list of index pairs or a splitter with a
+    split(X, y) method, like the ones in sklearn.model_selection.
+    """
+  num_row = dtrain.num_row()
+  if folds is not None:
+    if hasattr(folds, "split"):
+      folds = folds.split(numpy.zeros((num_row, 1)), dtrain.get_label())
+    return [(numpy.asarray(train_index), numpy.asarray(test_index)) for train_index, test_index in folds]
+  if not 2 <= nfold <= num_row:
+    raise ValueError(f"nfold must be between 2 and the number of rows {num_row}, got {nfold}")
+  index = numpy.random.RandomState(seed).permutation(num_row) if shuffle else numpy.arange(num_row)
+  if stratified:
+    labels = dtrain.get_label()[index]
+    fold_of_row = numpy.empty(num_row, dtype=numpy.int64)
+    offset = 0
+    # the rows of each class are dealt out in turn, so that every fold gets the same share of each class
+    for label in numpy.unique(labels):
+      rows = numpy.flatnonzero(labels == label)
+      fold_of_row[rows] = (numpy.arange(len(rows)) + offset) % nfold
+      offset += len(rows)
+    test_indexes = [index[fold_of_row == k] for k in range(nfold)]
+  else:
+    test_indexes = numpy.array_split(index, nfold)
+  pairs = []
+  for test_index in test_indexes:
+    in_test = numpy.zeros(num_row, dtype=bool)
+    in_test[test_index] = True
+    pairs.append((numpy.flatnonzero(~in_test), numpy.flatnonzero(in_test)))
+  return pairs
+
+
+def aggregate_fold_values(values):
+  return float(numpy.mean(values)), float(numpy.std(values))
+
+
+class CVFoldResult(object):
+  def __init__(self, model, evals_result, metrics):
+    self.model = model
+    self.evals_result = evals_result
+    self.metrics = metrics
+
+  def get_final_evals(self):
+    """Returns the eval metrics of the best iteration when the fold stopped early, otherwise of the last one."""
+    best_iteration = self.model.attr("best_iteration")
+    final_evals = {}
+    for dataset, metric_dict in self.evals_result.items():
+      for metric_label, metric_record in metric_dict.items():
+        iteration = len(metric_record) - 1 if best_iteration is None else int(best_iteration)
+        final_evals[f"{dataset}-{metric_label}"] = metric_record[iteration]
+    return final_evals
+
+
+class XGBCVRunHandler(XGBRunHandler):
+  """Trains the folds of a cross validation in parallel and logs their metrics to a single run."""
+
+  def __init__(self, folds, n_workers, **kwargs):
+    super().__init__(evals=None, evals_result=None, verbose_eval=False, xgb_model=None, **kwargs)
+    self.folds = folds
+    self.n_workers = n_workers
+    self.fold_results = None
+    self.cv_results = None
+
+  def get_fold_params(self, workers):
+    params = self.get_train_params()
+    if workers > 1 and "nthread" not in params:
+      # split the cores between the folds that train at the same time
+      params["nthread"] = max(1, get_available_cpu_count() // workers)
+    return params
+
+  def train_fold(self, params, fold):
+    train_index, test_index = fold
+    # the folds only share the index arrays, their rows are copied out of dtrain while the fold trains
+    dtrain_fold = self.dtrain.slice(train_index)
+    dtest_fold = self.dtrain.slice(test_index)
+    evals_result = {}
+    model = xgboost.train(
+      params,
+      dtrain_fold,
+      num_boost_round=self.num_boost_round,
+      evals=[(dtrain_fold, CV_TRAIN_EVALS_NAME), (dtest_fold, DEFAULT_EVALS_NAME)],
+      evals_result=evals_result,
+      early_stopping_rounds=self.early_stopping_rounds,
+      verbose_eval=False,
+      callbacks=copy.deepcopy(self.callbacks),
+      **self.kwargs,
+    )
+    metrics = {}
+    objective = get_objective(model)
+    if self.run_options_parsed["autolog_metrics"] and any(s in objective for s in SUPPORTED_OBJECTIVE_PREFIXES):
+      scoring_options = {
+        "chunk_size": self.run_options_parsed["metrics_chunk_size"],
+        "sample_size": self.run_options_parsed["metrics_sample_size"],
+      }
+      validation_set = (dtest_fold, DEFAULT_EVALS_NAME)
+      if objective.split(":")[0] == "reg":
+        metrics = compute_regression_metrics(model, validation_set, **scoring_options)
+      else:
+        metrics = compute_classification_metrics(
+          model,
+          validation_set,
+          probabilities=objective in PROBABILITY_OBJECTIVES,
+          **scoring_options,
+        )
+    return CVFoldResult(model, evals_result, metrics)
+
+  def train_xgb(self):
+    workers = max(1, min(self.n_workers, len(self.folds)))
+    params = self.get_fold_params(workers)
+    t_start = time.time()
+    # the output of folds training in parallel is interleaved, so it is not logged
+    with NullStreamMonitor():
+      with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        self.fold_results = list(executor.map(lambda fold: self.train_fold(params, fold), self.folds))
+    self.training_time += time.time() - t_start
+    if self.run_options_parsed["autolog_metrics"]:
+      self.run.log_metric(TRAINING_TIME_METRIC, self.training_time)
+    # the booster params and feature importances are logged from the first fold
+    self.model = self.fold_results[0].model
+    self.cv_results = self.get_cv_results()
+
+  def get_cv_results(self):
+    """Returns the mean and stddev over the folds of each eval metric at each boosting round, like xgboost.cv."""
+    cv_results = {}
+    for dataset, metric_dict in self.fold_results[0].evals_result.items():
+      for metric_label in metric_dict:
+        records = [fold_result.evals_result[dataset][metric_label] for fold_result in self.fold_results]
+        means, stds = [], []
+        for iteration in range(max(len(record) for record in records)):
+          mean, std = aggregate_fold_values([record[iteration] for record in records if iteration < len(record)])
+          means.append(mean)
+          stds.append(std)
+        cv_results[f"{dataset}-{metric_label}-mean"] = means
+        cv_results[f"{dataset}-{metric_label}-std"] = stds
+    return cv_results
+
+  def log_checkpoints(self):
+    if not self.run_options_parsed["autolog_checkpoints"]:
+      return
+    test_records = {
+      metric_label: [fold_result.evals_result[DEFAULT_EVALS_NAME][metric_label] for fold_result in self.fold_results]
+      for metric_label in self.fold_results[0].evals_result[DEFAULT_EVALS_NAME]
+    }
+    num_iterations = max(len(record) for records in test_records.values() for record in records)
+    period = max(DEFAULT_CHECKPOINT_PERIOD, math.ceil((num_iterations + 1) / MAX_NUM_CHECKPOINTS))
+    for iteration in range(num_iterations):
+      if iteration % period and iteration != num_iterations - 1:
+        continue
+      checkpoint_logs = {}
+      for metric_label, records in test_records.items():
+        name = f"{DEFAULT_EVALS_NAME}-{metric_label}"
+        checkpoint_logs[f"{name}-mean"] = self.cv_results[f"{name}-mean"][iteration]
+        for fold_number, record in enumerate(records):
+          # folds that stopped early have no value for the later checkpoints
+          checkpoint_logs[f"{name}-fold{fold_number}"] = record[iteration] if iteration < len(record) else None
+      self.run.log_checkpoint(checkpoint_logs)
+
+  def log_metadata(self):
+    super().log_metadata()
+    self.run.log_metadata("Number of CV Folds", len(self.folds))
+
+  def log_validation_metrics(self):
+    final_evals = [fold_result.get_final_evals() for fold_result in self.fold_results]
+    for name in final_evals[0]:
+      mean, std = aggregate_fold_values([fold_evals[name] for fold_evals in final_evals])
+      self.run.log_metric(name, mean, stddev=std)
+
+    if self.early_stopping_rounds:
+      mean, std = aggregate_fold_values(
+        [int(fold_result.model.attr("best_iteration")) + 1 for fold_result in self.fold_results]
+      )
+      self.run.log_metric("num_boost_round_before_stopping", mean, stddev=std)
+
+    if self.run_options_parsed["autolog_metrics"]:
+      for name in self.fold_results[0].metrics:
+        mean, std = aggregate_fold_values([fold_result.metrics[name] for fold_result in self.fold_results])
+        self.validation_metrics[name] = mean
+        self.run.log_metric(name, mean, stddev=std)
+
+
+class XGBCVRun(ModelAwareRun):
+  """The run of sigopt.xgboost.cv, XGBCVRun.model is the list of fold boosters."""
+
+  def __init__(self, run, models, cv_results):
+    super().__init__(run, models)
+    self.cv_results = cv_results
+
+
+def cv(
+  params,
+  dtrain,
+  num_boost_round=10,
+  nfold=DEFAULT_NFOLD,
+  stratified=False,
+  folds=None,
+  metrics=(),
+  early_stopping_rounds=None,
+  seed=0,
+  shuffle=True,
+  callbacks=None,
+  n_workers=None,
+  run_options=None,
+  **kwargs,
+):
+  """
+    Sigopt integration for XGBoost cross validation mirrors the xgboost.cv interface and logs the folds to a single run.
+    The folds are trained in parallel by up to n_workers threads, all the folds by default, and each fold booster gets
+    an equal share of the available cores through nthread unless it is set in params.
+    The mean of each metric over the folds is logged with its stddev, and the curves of the folds as checkpoints.
+    Returns a XGBCVRun, where XGBCVRun.cv_results has the mean and stddev of the eval metrics at each boosting round.
+    """
+  if not isinstance(dtrain, DMatrix):
+    raise TypeError(f"`dtrain` must be a {'.'.join((DMatrix.__module__, DMatrix.__name__))} object.")
+  if n_workers is not None and n_workers < 1:
+    raise ValueError(f"n_workers must be at least 1, got {n_workers}")
+  if run_options and run_options.get("model_checkpoint_dir") is not None:
+    raise ValueError("The model_checkpoint_dir run option is not supported by sigopt.xgboost.cv.")
+  params = dict(params)
+  if metrics:
+    params["eval_metric"] = list(metrics)
+  fold_indexes = make_folds(dtrain, nfold, stratified=stratified, shuffle=shuffle, seed=seed, folds=folds)
+
+  _run = XGBCVRunHandler(
+    folds=fold_indexes,
+    n_workers=len(fold_indexes) if n_workers is None else n_workers,
+    params=params,
+    dtrain=dtrain,
+    num_boost_round=num_boost_round,
+    early_stopping_rounds=early_stopping_rounds,
+    callbacks=callbacks,
+    run_options=run_options,
+    **kwargs,
+  )
+
+  _run.make_run()
+  with _run.run.batch_updates():
+    _run.train_xgb()
+    _run.log_metadata()
+    _run.log_params()
+    _run.check_learning_task()
+    _run.log_validation_metrics()
+    if _run.run_options_parsed["autolog_feature_importances"]:
+      _run.log_feature_importances()
+  _run.log_checkpoints()
+  return XGBCVRun(_run.run, [fold_result.model for fold_result in _run.fold_results], _run.cv_results)
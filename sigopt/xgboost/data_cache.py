@@ -0,0 +1,95 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import collections
+import threading
+
+from .compat import DMatrix, xgboost
+
+
+DEFAULT_MAX_BIN = 256
+DEFAULT_MAX_CACHED_MATRICES = 4
+# booster params that change how the training data is quantized
+BINNING_PARAMS = {
+  "max_bin": DEFAULT_MAX_BIN,
+}
+QUANTILE_TREE_METHODS = [None, "auto", "hist"]
+
+
+class QuantileDMatrixCache(object):
+  """
+    Builds a QuantileDMatrix from the training DMatrix once for each distinct binning configuration, so that trials
+    with the same binning params reuse the quantized data instead of sketching it again.
+    Falls back to the original DMatrix when the data or params can't be trained from a QuantileDMatrix.
+    Up to max_entries matrices are kept, the least recently used one is dropped to make room for a new one.
+    """
+
+  def __init__(self, dtrain, max_entries=DEFAULT_MAX_CACHED_MATRICES):
+    if max_entries < 1:
+      raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+    self.dtrain = dtrain
+    self.max_entries = max_entries
+    self._cache = collections.OrderedDict()
+    self._key_locks = {}
+    self._lock = threading.Lock()
+    self._supported = self._is_supported(dtrain)
+
+  @staticmethod
+  def _is_supported(dtrain):
+    quantile_dmatrix_cls = getattr(xgboost, "QuantileDMatrix", None)
+    if quantile_dmatrix_cls is None or type(dtrain) is not DMatrix:
+      return False
+    if not hasattr(dtrain, "get_data"):
+      return False
+    # ranking groups are not carried over to the quantized data
+    return len(dtrain.get_uint_info("group_ptr")) == 0
+
+  @staticmethod
+  def get_binning_key(params):
+    if params.get("tree_method") not in QUANTILE_TREE_METHODS or params.get("device", "cpu") != "cpu":
+      return None
+    return tuple(params.get(name, default) for name, default in sorted(BINNING_PARAMS.items()))
+
+  def _build(self, key):
+    dtrain = self.dtrain
+    binning_params = dict(zip(sorted(BINNING_PARAMS), key))
+    weight = dtrain.get_weight()
+    base_margin = dtrain.get_base_margin()
+    feature_types = dtrain.feature_types
+    return xgboost.QuantileDMatrix(
+      dtrain.get_data(),
+      label=dtrain.get_label(),
+      weight=weight if len(weight) else None,
+      base_margin=base_margin if len(base_margin) else None,
+      feature_names=dtrain.feature_names,
+      feature_types=feature_types,
+      enable_categorical=bool(feature_types) and "c" in feature_types,
+      **binning_params,
+    )
+
+  def get(self, params):
+    """Returns the training data to use with the booster params, building the quantized data on first use."""
+    key = self.get_binning_key(params) if self._supported else None
+    if key is None:
+      return self.dtrain
+    with self._lock:
+      key_lock = self._key_locks.setdefault(key, threading.Lock())
+    # only the trials that need the same matrix wait for it to be built, the others are not held up
+    with key_lock:
+      with self._lock:
+        if not self._supported:
+          return self.dtrain
+        if key in self._cache:
+          self._cache.move_to_end(key)
+          return self._cache[key]
+      try:
+        quantized = self._build(key)
+      except (xgboost.core.XGBoostError, TypeError, ValueError):
+        with self._lock:
+          self._supported = False
+        return self.dtrain
+      with self._lock:
+        self._cache[key] = quantized
+        while len(self._cache) > self.max_entries:
+          self._cache.popitem(last=False)
+      return quantized
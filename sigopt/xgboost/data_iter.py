@@ -0,0 +1,122 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy
+
+from .compat import DataIter, DMatrix
+
+
+if DataIter is None:
+  raise ImportError(
+    "External memory training data needs xgboost.DataIter, which is not available in this version of xgboost."
+    " Try running `pip install -U 'sigopt[xgboost]'`."
+  )
+
+# DMatrix arguments that also apply to the in-memory DMatrix of each batch
+BATCH_DMATRIX_KWARGS = ("missing", "enable_categorical")
+
+
+class IterDMatrix(DMatrix):
+  """
+    An external memory DMatrix that keeps its DataIter, so that the validation metrics can be computed by streaming
+    over the batches instead of loading the whole data set.
+    """
+
+  def __init__(self, data_iter, **kwargs):
+    super().__init__(data_iter, **kwargs)
+    self.data_iter = data_iter
+    self.batch_kwargs = {key: kwargs[key] for key in BATCH_DMATRIX_KWARGS if key in kwargs}
+
+
+def iterate_batches(data_iter, **kwargs):
+  """Yields an in-memory DMatrix for each batch of the DataIter."""
+  data_iter.reset()
+  while True:
+    batch = {}
+
+    def input_data(data=None, **batch_kwargs):
+      batch.update(batch_kwargs, data=data)
+
+    if not data_iter.next(input_data):
+      return
+    yield DMatrix(**batch, **kwargs)
+
+
+def get_cache_prefix(data_iter, cache_prefix):
+  """
+    Returns the cache prefix for the pages of a DataIter. Without one xgboost concatenates the batches in memory, so
+    by default the pages are written to a temporary directory, which is removed with the DataIter.
+    """
+  if cache_prefix is not None:
+    return cache_prefix
+  cache_dir = tempfile.mkdtemp(prefix="sigopt-xgboost-")
+  weakref.finalize(data_iter, shutil.rmtree, cache_dir, ignore_errors=True)
+  return os.path.join(cache_dir, "cache")
+
+
+class NumpyShardIter(DataIter):
+  """
+    Streams training data from NumPy shards saved with numpy.save, which are memory mapped so that only the current
+    shard is paged in. shards is a list of (features_path, label_path) pairs, label_path can be None.
+    The pages of the external memory DMatrix are cached under cache_prefix, or in a temporary directory that is
+    removed with the iterator, so keep the iterator while the DMatrix is used, as IterDMatrix does.
+    """
+
+  def __init__(self, shards, cache_prefix=None):
+    self.shards = list(shards)
+    self._index = 0
+    super().__init__(cache_prefix=get_cache_prefix(self, cache_prefix))
+
+  def next(self, input_data):
+    if self._index == len(self.shards):
+      return False
+    features_path, label_path = self.shards[self._index]
+    data = numpy.load(features_path, mmap_mode="r")
+    label = None if label_path is None else numpy.load(label_path, mmap_mode="r")
+    input_data(data=data, label=label)
+    self._index += 1
+    return True
+
+  def reset(self):
+    self._index = 0
+
+
+class ParquetShardIter(DataIter):
+  """
+    Streams training data from Parquet files, one file per batch. Needs pyarrow to be installed.
+    The pages are cached like the pages of NumpyShardIter.
+    """
+
+  def __init__(self, paths, label_column=None, cache_prefix=None):
+    self.paths = list(paths)
+    self.label_column = label_column
+    self._index = 0
+    super().__init__(cache_prefix=get_cache_prefix(self, cache_prefix))
+
+  def next(self, input_data):
+    if self._index == len(self.paths):
+      return False
+    try:
+      import pyarrow.parquet as pq
+    except ImportError as ie:
+      raise ImportError(
+        "pyarrow needs to be installed to read Parquet shards. Try running `pip install pyarrow`."
+      ) from ie
+
+    table = pq.read_table(self.paths[self._index])
+    label = None
+    if self.label_column is not None:
+      label = table.column(self.label_column).to_numpy()
+      table = table.drop([self.label_column])
+    data = numpy.column_stack([column.to_numpy() for column in table.columns])
+    input_data(data=data, label=label, feature_names=table.column_names)
+    self._index += 1
+    return True
+
+  def reset(self):
+    self._index = 0
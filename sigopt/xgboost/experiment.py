@@ -2,9 +2,14 @@
 #
 # SPDX-License-Identifier: MIT
 import copy
+import os
 
 from .. import create_aiexperiment
 from .constants import (
+  COST_AWARE_MODES,
+  COST_MAX_BIN_GRID,
+  COST_METRICS,
+  COST_TREE_METHODS,
   DEFAULT_CLASSIFICATION_METRIC,
   DEFAULT_EARLY_STOPPING_ROUNDS,
   DEFAULT_EVALS_NAME,
@@ -19,9 +24,14 @@ from .constants import (
   SIGOPT_DEFAULTS_SOURCE_PRIORITY,
   SUPPORTED_AUTOBOUND_PARAMS,
   SUPPORTED_METRICS_TO_OPTIMIZE,
+  TRAINING_CPU_TIME_METRIC,
+  TRAINING_TIME_METRIC,
 )
+from .data_cache import QuantileDMatrixCache
 from .run import parse_run_options
 from .run import run as XGBRunWrapper
+from .successive_halving import DEFAULT_REDUCTION_FACTOR, SuccessiveHalving
+from .utils import as_dmatrix
 
 
 XGB_EXPERIMENT_KEYWORD = "_IS_XGB_EXPERIMENT"
@@ -45,10 +55,30 @@ class XGBExperiment:
     num_boost_round,
     early_stopping_rounds,
     run_options,
+    n_workers=1,
+    successive_halving=False,
+    reduction_factor=DEFAULT_REDUCTION_FACTOR,
+    cost_aware=None,
+    cost_metric=TRAINING_TIME_METRIC,
+    cost_threshold=None,
   ):
+    if n_workers < 1:
+      raise ValueError(f"n_workers must be at least 1, got {n_workers}")
+    if cost_aware is not None:
+      if cost_aware not in COST_AWARE_MODES:
+        raise ValueError(f"cost_aware must be one of {COST_AWARE_MODES}, got {cost_aware}")
+      if cost_metric not in COST_METRICS:
+        raise ValueError(f"cost_metric must be one of {COST_METRICS}, got {cost_metric}")
+      if cost_aware == "constraint" and not (isinstance(cost_threshold, (int, float)) and cost_threshold > 0):
+        raise ValueError(f"cost_aware='constraint' needs a positive cost_threshold in seconds, got {cost_threshold}")
+      if cost_aware == "objective" and successive_halving:
+        raise ValueError("successive_halving ranks runs by one metric, so it can't be used with cost_aware='objective'")
+      if cost_metric == TRAINING_CPU_TIME_METRIC and n_workers > 1:
+        raise ValueError(f"{TRAINING_CPU_TIME_METRIC} is measured for the whole process, so it needs n_workers=1")
     self.experiment_config_parsed = copy.deepcopy(experiment_config)
-    self.dtrain = dtrain
-    self.evals = evals
+    # a DataIter is loaded into an external memory DMatrix once, instead of once for every run
+    self.dtrain = as_dmatrix(dtrain)
+    self.evals = [(as_dmatrix(data), name) for data, name in evals] if isinstance(evals, list) else as_dmatrix(evals)
     self.params = params
     self.num_boost_round = num_boost_round
     self.run_options = run_options
@@ -58,6 +88,15 @@ class XGBExperiment:
     else:
       self.early_stopping_rounds = early_stopping_rounds  # if None, deactivate early stopping
       self.early_stopping_round_used_sigopt_default = False
+    self.n_workers = n_workers
+    self.successive_halving = successive_halving
+    self.reduction_factor = reduction_factor
+    self.min_num_boost_round = None
+    self.max_num_boost_round = None
+    self.cost_aware = cost_aware
+    self.cost_metric = cost_metric
+    self.cost_threshold = cost_threshold
+    self.dtrain_cache = QuantileDMatrixCache(self.dtrain)
     self.sigopt_experiment = None
 
   def parse_and_create_metrics(self):
@@ -188,51 +227,157 @@ class XGBExperiment:
         " space or the input arguments."
       )
 
+  def parse_fidelity(self):
+    # boosting rounds are the fidelity of successive halving, so they are taken out of the search space
+    parameters = self.experiment_config_parsed["parameters"]
+    num_boost_round_parameters = [p for p in parameters if p["name"] == "num_boost_round"]
+    if num_boost_round_parameters:
+      bounds = num_boost_round_parameters[0]["bounds"]
+      self.experiment_config_parsed["parameters"] = [p for p in parameters if p["name"] != "num_boost_round"]
+    elif self.num_boost_round:
+      bounds = {
+        "min": max(1, self.num_boost_round // self.reduction_factor**2),
+        "max": self.num_boost_round,
+      }
+    else:
+      bounds = PARAMETER_INFORMATION["num_boost_round"]["bounds"]
+    self.min_num_boost_round = int(bounds["min"])
+    self.max_num_boost_round = int(bounds["max"])
+    if not self.run_options["autolog_metrics"]:
+      raise ValueError("successive_halving ranks runs by their metrics, so the autolog_metrics run option is required")
+    optimized_metrics = [
+      metric["name"] for metric in self.experiment_config_parsed["metrics"] if metric["strategy"] == "optimize"
+    ]
+    if len(optimized_metrics) != 1:
+      raise ValueError(
+        f"successive_halving ranks runs by a single metric, but {len(optimized_metrics)} metrics are optimized:"
+        f" {optimized_metrics}"
+      )
+
+  def add_cost_metric(self):
+    metrics = self.experiment_config_parsed["metrics"]
+    if any(metric["name"] == self.cost_metric for metric in metrics):
+      raise ValueError(f"The cost metric {self.cost_metric} is added by cost_aware, remove it from the metrics.")
+    if self.cost_aware == "objective":
+      if len([metric for metric in metrics if metric["strategy"] == "optimize"]) > 1:
+        raise ValueError("cost_aware='objective' adds a second objective, so only one metric can be optimized.")
+      metrics.append(dict(name=self.cost_metric, strategy="optimize", objective="minimize"))
+    else:
+      metrics.append(
+        dict(name=self.cost_metric, strategy="constraint", objective="minimize", threshold=self.cost_threshold)
+      )
+
+  def add_cost_parameters(self):
+    parameters = self.experiment_config_parsed["parameters"]
+    parameter_names = {parameter["name"] for parameter in parameters} | self.params.keys()
+    max_nthread = max(1, get_available_cpu_count() // self.n_workers)
+    cost_parameters = [
+      dict(name="tree_method", type="categorical", categorical_values=COST_TREE_METHODS),
+      # a grid of bin counts, so that the quantized training data is reused by the runs with the same max_bin
+      dict(name="max_bin", type="int", grid=COST_MAX_BIN_GRID),
+    ]
+    if max_nthread > 1:
+      cost_parameters.append(dict(name="nthread", type="int", bounds={"min": 1, "max": max_nthread}))
+    parameters.extend(parameter for parameter in cost_parameters if parameter["name"] not in parameter_names)
+
   def parse_and_create_aiexperiment(self):
     self.parse_and_create_metrics()
     self.parse_and_create_parameters()
+    if self.successive_halving:
+      self.parse_fidelity()
+    if self.cost_aware is not None:
+      if not self.run_options["autolog_metrics"]:
+        raise ValueError("cost_aware needs the training time metrics, so the autolog_metrics run option is required")
+      self.add_cost_metric()
+      self.add_cost_parameters()
     if "budget" not in self.experiment_config_parsed:
       chosen_budget = DEFAULT_ITERS_PER_DIM * len(self.experiment_config_parsed["parameters"])
       self.experiment_config_parsed["budget"] = min(chosen_budget, MAX_BO_ITERATIONS)
     if "parallel_bandwidth" not in self.experiment_config_parsed:
-      self.experiment_config_parsed["parallel_bandwidth"] = 1
+      self.experiment_config_parsed["parallel_bandwidth"] = self.n_workers
     if "type" not in self.experiment_config_parsed:
       self.experiment_config_parsed["type"] = "offline"
     self.experiment_config_parsed["metadata"] = {XGB_EXPERIMENT_KEYWORD: "True"}
     self.sigopt_experiment = create_aiexperiment(**self.experiment_config_parsed)
 
+  def get_worker_params(self, workers):
+    params = dict(self.params)
+    if workers > 1 and "nthread" not in params:
+      # split the cores between the concurrent boosters instead of letting each one use all of them
+      params["nthread"] = max(1, get_available_cpu_count() // workers)
+    return params
+
+  def run_trial(self, run, params, run_options):
+    if self.num_boost_round:
+      num_boost_round_run = self.num_boost_round
+    elif "num_boost_round" in run.params:
+      num_boost_round_run = run.params["num_boost_round"]
+    else:
+      num_boost_round_run = DEFAULT_NUM_BOOST_ROUND
+
+    with run.batch_updates():
+      XGBRunWrapper(
+        params,
+        self.dtrain_cache.get({**params, **run.params}),
+        num_boost_round=num_boost_round_run,
+        evals=self.evals,
+        early_stopping_rounds=self.early_stopping_rounds,
+        verbose_eval=False,
+        run_options={**run_options, "run": run},
+      )
+      self.log_early_stopping_source(run)
+
+  def log_early_stopping_source(self, run):
+    # mark early stopping rounds as SigOpt Default
+    if self.early_stopping_round_used_sigopt_default:
+      run.set_parameters_sources_meta(
+        SIGOPT_DEFAULTS_SOURCE_NAME,
+        sort=SIGOPT_DEFAULTS_SOURCE_PRIORITY,
+        default_show=True,
+      )
+      run.set_parameters_source(
+        {"early_stopping_rounds": DEFAULT_EARLY_STOPPING_ROUNDS},
+        SIGOPT_DEFAULTS_SOURCE_NAME,
+      )
+
   def run_experiment(self):
-    for run in self.sigopt_experiment.loop():
-      with run:
-        if self.num_boost_round:
-          num_boost_round_run = self.num_boost_round
-        elif "num_boost_round" in run.params:
-          num_boost_round_run = run.params["num_boost_round"]
-        else:
-          num_boost_round_run = DEFAULT_NUM_BOOST_ROUND
-        self.run_options["run"] = run
-
-        XGBRunWrapper(
-          self.params,
-          self.dtrain,
-          num_boost_round=num_boost_round_run,
-          evals=self.evals,
-          early_stopping_rounds=self.early_stopping_rounds,
-          verbose_eval=False,
-          run_options=self.run_options,
-        )
+    workers = min(self.n_workers, self.experiment_config_parsed["parallel_bandwidth"] or 1)
+    params = self.get_worker_params(workers)
+    run_options = self.run_options
+    if workers > 1:
+      # sys.stdout, sys.stderr and the CPU time of the process are shared by the threads, so they can't be attributed
+      # to a single run
+      run_options = {**run_options, "autolog_stdout": False, "autolog_stderr": False, "autolog_cpu_time": False}
+    elif self.cost_aware is not None and self.cost_metric == TRAINING_CPU_TIME_METRIC:
+      run_options = {**run_options, "autolog_cpu_time": True}
+    if self.successive_halving:
+      successive_halving = SuccessiveHalving(
+        self,
+        self.reduction_factor,
+        self.min_num_boost_round,
+        self.max_num_boost_round,
+      )
+      successive_halving.run(workers, params, run_options)
+    elif workers == 1:
+      for run in self.sigopt_experiment.loop():
+        with run:
+          self.run_trial(run, params, run_options)
+    else:
+      # the boosters share dtrain and evals, each worker only gets its own run context and callbacks
+      # like the sequential loop, the first failed trial ends the experiment
+      failures = self.sigopt_experiment.optimize(
+        lambda run: self.run_trial(run, params, run_options),
+        workers=workers,
+        stop_on_failure=True,
+      )
+      if failures:
+        raise failures[0][1]
 
-        # mark early stopping rounds as SigOpt Default
-        if self.early_stopping_round_used_sigopt_default:
-          run.set_parameters_sources_meta(
-            SIGOPT_DEFAULTS_SOURCE_NAME,
-            sort=SIGOPT_DEFAULTS_SOURCE_PRIORITY,
-            default_show=True,
-          )
-          run.set_parameters_source(
-            {"early_stopping_rounds": DEFAULT_EARLY_STOPPING_ROUNDS},
-            SIGOPT_DEFAULTS_SOURCE_NAME,
-          )
+
+def get_available_cpu_count():
+  if hasattr(os, "sched_getaffinity"):
+    return len(os.sched_getaffinity(0))
+  return os.cpu_count() or 1
 
 
 def experiment(
@@ -243,7 +388,24 @@ def experiment(
   num_boost_round=None,
   early_stopping_rounds=_default_early_stopping_rounds,
   run_options=None,
+  n_workers=1,
+  successive_halving=False,
+  reduction_factor=DEFAULT_REDUCTION_FACTOR,
+  cost_aware=None,
+  cost_metric=TRAINING_TIME_METRIC,
+  cost_threshold=None,
 ):
+  """
+    Creates an AIExperiment that tunes the XGBoost params and trains a booster for each of its runs.
+    With n_workers greater than 1 that many boosters are trained at once in threads that share the training data,
+    and each booster gets an equal share of the available cores through nthread unless it is set in params.
+    The stdout and stderr of concurrent boosters are not logged to their runs.
+    With successive_halving=True a run only continues to the next number of boosting rounds, up to the max of
+    num_boost_round, while its metric is in the best 1 / reduction_factor of the runs that reached the same rounds.
+    With cost_aware the cost_metric, "Training time" or "Training CPU time" in seconds, is added to the metrics as a
+    constraint below cost_threshold ("constraint") or as a second objective to minimize ("objective"), and nthread,
+    tree_method and max_bin are added to the search space unless they are already set.
+    """
   run_options_parsed = parse_run_options(run_options)
   xgb_experiment = XGBExperiment(
     experiment_config,
@@ -253,6 +415,12 @@ def experiment(
     num_boost_round,
     early_stopping_rounds,
     run_options_parsed,
+    n_workers=n_workers,
+    successive_halving=successive_halving,
+    reduction_factor=reduction_factor,
+    cost_aware=cost_aware,
+    cost_metric=cost_metric,
+    cost_threshold=cost_threshold,
   )
   xgb_experiment.parse_and_create_aiexperiment()
   xgb_experiment.run_experiment()
@@ -4,36 +4,52 @@
 import copy
 import json
 import math
+import os
 import platform
 import time
 import warnings
 from inspect import signature
 
 from .. import create_run
-from ..log_capture import SystemOutputStreamMonitor
+from ..log_capture import NullStreamMonitor, SystemOutputStreamMonitor
 from ..model_aware_run import ModelAwareRun
 from ..run_context import RunContext
-from .checkpoint_callback import SigOptCheckpointCallback
+from .checkpoint_callback import (
+  BoosterCheckpointCallback,
+  SigOptCheckpointCallback,
+  get_booster_checkpoint_path,
+  load_booster_checkpoint,
+)
 from .compat import Booster, DMatrix, xgboost
 from .compute_metrics import compute_classification_metrics, compute_regression_metrics
 from .constants import (
   DEFAULT_EVALS_NAME,
+  TRAINING_CPU_TIME_METRIC,
+  TRAINING_TIME_METRIC,
   USER_SOURCE_NAME,
   USER_SOURCE_PRIORITY,
   XGBOOST_DEFAULTS_SOURCE_NAME,
   XGBOOST_DEFAULTS_SOURCE_PRIORITY,
 )
-from .utils import get_booster_params
+from .utils import as_dmatrix, as_validation_sets, get_booster_params, is_data_iter
 
 
+DEFAULT_MODEL_CHECKPOINT_PERIOD = 10
 DEFAULT_RUN_OPTIONS = {
   "autolog_checkpoints": True,
+  "autolog_cpu_time": False,
   "autolog_feature_importances": True,
   "autolog_metrics": True,
   "autolog_stdout": True,
   "autolog_stderr": True,
   "autolog_sys_info": True,
   "autolog_xgboost_defaults": True,
+  "keep_model_checkpoint": False,
+  # an in-memory validation set is scored at once, so its metrics are exact, unless a chunk size is set
+  "metrics_chunk_size": None,
+  "metrics_sample_size": None,
+  "model_checkpoint_dir": None,
+  "model_checkpoint_period": DEFAULT_MODEL_CHECKPOINT_PERIOD,
   "name": None,
   "run": None,
 }
@@ -42,6 +58,7 @@ MAX_NUM_CHECKPOINTS = 200
 FEATURE_IMPORTANCES_MAX_NUM_FEATURE = 50
 FEATURE_IMPORTANCES_MAX_KEY_CHARS = 100
 XGB_INTEGRATION_KEYWORD = "_IS_XGB_RUN"
+BOOSTER_CHECKPOINT_KEY = "booster_checkpoint"
 
 PARAMS_LOGGED_AS_METADATA = [
   "eval_metric",
@@ -56,6 +73,11 @@ SUPPORTED_OBJECTIVE_PREFIXES = [
   "multi",
   "reg",
 ]
+# objectives whose predictions are class probabilities, used for log loss and AUC
+PROBABILITY_OBJECTIVES = [
+  "binary:logistic",
+  "multi:softprob",
+]
 DOC_URL = "https://docs.sigopt.com/ai-module-api-references/xgboost/xgboost_run"
 
 
@@ -70,9 +92,22 @@ def parse_run_options(run_options):
     raise ValueError(f"Unsupported keys {run_options.keys() - DEFAULT_RUN_OPTIONS.keys()} in run_options.")
 
   for key, value in run_options.items():
-    if key.startswith("autolog") and not isinstance(value, bool):
+    if (key.startswith("autolog") or key == "keep_model_checkpoint") and not isinstance(value, bool):
       raise TypeError(f"run_options key `{key}` expects a Boolean value, not {type(value)}.")
 
+  for key in ("metrics_chunk_size", "metrics_sample_size", "model_checkpoint_period"):
+    value = run_options.get(key)
+    if value is None:
+      continue
+    if isinstance(value, bool) or not isinstance(value, int):
+      raise TypeError(f"run_options key `{key}` expects an integer value, not {type(value)}.")
+    if value < 1:
+      raise ValueError(f"run_options key `{key}` must be positive, not {value}.")
+
+  model_checkpoint_dir = run_options.get("model_checkpoint_dir")
+  if model_checkpoint_dir is not None and not isinstance(model_checkpoint_dir, (str, os.PathLike)):
+    raise TypeError(f"run_options key `model_checkpoint_dir` expects a path, not {type(model_checkpoint_dir)}.")
+
   if {"run", "name"}.issubset(run_options.keys()):
     if run_options["run"] and run_options["name"]:
       raise ValueError("Cannot specify both `run` and `name` keys inside run_options.")
@@ -97,6 +132,11 @@ def validate_xgboost_kwargs(xgb_kwargs):
       xgb_kwargs.pop(key)
 
 
+def get_objective(model):
+  config_dict = json.loads(model.save_config())
+  return config_dict["learner"]["objective"]["name"]
+
+
 class XGBRun(ModelAwareRun):
   def __init__(self, run, model):
     assert isinstance(model, Booster)
@@ -119,21 +159,63 @@ class XGBRunHandler:
     **kwargs,
   ):
     self.params = params
-    self.dtrain = dtrain
+    self.dtrain = as_dmatrix(dtrain)
     self.num_boost_round = num_boost_round
     self.early_stopping_rounds = early_stopping_rounds
     self.verbose_eval = verbose_eval
     self.callbacks = callbacks
-    self.validation_sets = [(evals, DEFAULT_EVALS_NAME)] if isinstance(evals, DMatrix) else evals
+    self.validation_sets = as_validation_sets(evals, DEFAULT_EVALS_NAME)
     self.evals_result = evals_result
     self.run_options_parsed = parse_run_options(run_options)
     self.run = None
     self.model = xgb_model
     self.is_regression = None
+    self.objective = None
+    self.training_time = 0
+    self.training_cpu_time = 0
+    self.validation_metrics = {}
+    self.resumed_rounds = 0
+    self.logged_checkpoints = 0
     self.kwargs = kwargs
     validate_xgboost_kwargs(self.kwargs)
 
+  def get_booster_checkpoint_path(self):
+    model_checkpoint_dir = self.run_options_parsed["model_checkpoint_dir"]
+    if model_checkpoint_dir is None:
+      return None
+    return get_booster_checkpoint_path(model_checkpoint_dir, self.run.id)
+
+  def resume_training(self):
+    run_object = self.run.connection.training_runs(self.run.id).fetch()
+    booster_checkpoint = (run_object.sys_metadata or {}).get(BOOSTER_CHECKPOINT_KEY)
+    path = booster_checkpoint["path"] if booster_checkpoint else self.get_booster_checkpoint_path()
+    # nothing to resume when the run was interrupted before its first booster checkpoint
+    if path is None or not os.path.exists(path):
+      return
+    self.model, self.resumed_rounds = load_booster_checkpoint(path)
+    self.logged_checkpoints = run_object.checkpoint_count or 0
+
+  def remove_booster_checkpoint(self):
+    # the saved booster is only needed to resume an interrupted training
+    path = self.get_booster_checkpoint_path()
+    if path is not None and not self.run_options_parsed["keep_model_checkpoint"] and os.path.exists(path):
+      os.remove(path)
+
+  def log_booster_checkpoint_path(self):
+    path = self.get_booster_checkpoint_path()
+    if path is not None:
+      self.run.log_sys_metadata(BOOSTER_CHECKPOINT_KEY, {"path": os.path.abspath(path)})
+
   def form_callbacks(self):
+    booster_checkpoint_path = self.get_booster_checkpoint_path()
+    if booster_checkpoint_path is not None:
+      booster_checkpoint_callback = BoosterCheckpointCallback(
+        booster_checkpoint_path,
+        self.run_options_parsed["model_checkpoint_period"],
+        num_boosted_rounds=self.resumed_rounds,
+      )
+      self.callbacks = [*(self.callbacks or []), booster_checkpoint_callback]
+
     # if no validation set, checkpointing not possible
     if not (self.run_options_parsed["autolog_checkpoints"] and self.validation_sets):
       return
@@ -148,7 +230,12 @@ class XGBRunHandler:
     if self.verbose_eval:
       period = 1 if self.verbose_eval is True else self.verbose_eval
     period = max(period, math.ceil((self.num_boost_round + 1) / MAX_NUM_CHECKPOINTS))
-    sigopt_checkpoint_callback = SigOptCheckpointCallback(self.run, period=period)
+    sigopt_checkpoint_callback = SigOptCheckpointCallback(
+      self.run,
+      period=period,
+      start_epoch=self.resumed_rounds,
+      logged_checkpoints=self.logged_checkpoints,
+    )
     self.callbacks.append(sigopt_checkpoint_callback)
 
   def make_run(self):
@@ -214,11 +301,10 @@ class XGBRunHandler:
     self.run.set_parameters_source(xgb_default_params, XGBOOST_DEFAULTS_SOURCE_NAME)
 
   def check_learning_task(self):
-    config = self.model.save_config()
-    config_dict = json.loads(config)
-    objective = config_dict["learner"]["objective"]["name"]
+    objective = get_objective(self.model)
+    self.objective = objective
     # NOTE: do not log metrics if learning task isn't regression or classification
-    if not any(s in config_dict["learner"]["objective"]["name"] for s in SUPPORTED_OBJECTIVE_PREFIXES):
+    if not any(s in objective for s in SUPPORTED_OBJECTIVE_PREFIXES):
       self.run_options_parsed["autolog_metrics"] = False
     if objective.split(":")[0] == "reg":
       self.is_regression = True
@@ -251,20 +337,26 @@ class XGBRunHandler:
     }
     self.run.log_sys_metadata("feature_importances", fp)
 
+  def get_train_params(self):
+    params = copy.deepcopy(self.params)
+    if self.run.params:
+      params.update(self.run.params)
+      if "num_boost_round" in params:
+        self.num_boost_round = params.pop("num_boost_round")
+      if "early_stopping_rounds" in params:
+        self.early_stopping_rounds = params.pop("early_stopping_rounds")
+    return params
+
   def train_xgb(self):
-    stream_monitor = SystemOutputStreamMonitor()
+    if self.run_options_parsed["autolog_stdout"] or self.run_options_parsed["autolog_stderr"]:
+      stream_monitor = SystemOutputStreamMonitor()
+    else:
+      stream_monitor = NullStreamMonitor()
     with stream_monitor:
-      params = copy.deepcopy(self.params)
-      if self.run.params:
-        params.update(self.run.params)
-        if "num_boost_round" in params:
-          self.num_boost_round = params.pop("num_boost_round")
-        if "early_stopping_rounds" in params:
-          self.early_stopping_rounds = params.pop("early_stopping_rounds")
       xgb_args = {
-        "params": params,
+        "params": self.get_train_params(),
         "dtrain": self.dtrain,
-        "num_boost_round": self.num_boost_round,
+        "num_boost_round": self.num_boost_round - self.resumed_rounds,
         "early_stopping_rounds": self.early_stopping_rounds,
         "verbose_eval": self.verbose_eval,
         "xgb_model": self.model,
@@ -277,10 +369,17 @@ class XGBRunHandler:
         xgb_args["evals"] = self.validation_sets
         xgb_args["evals_result"] = self.evals_result
       t_start = time.time()
+      cpu_t_start = time.process_time()
       bst = xgboost.train(**xgb_args)
-      t_train = time.time() - t_start
+      # training can be continued from self.model, so the time of every call is included
+      self.training_time += time.time() - t_start
+      # the CPU time of the whole process, the threads of xgboost are native so they can't be timed on their own
+      self.training_cpu_time += time.process_time() - cpu_t_start
       if self.run_options_parsed["autolog_metrics"]:
-        self.run.log_metric("Training time", t_train)
+        self.run.log_metric(TRAINING_TIME_METRIC, self.training_time)
+        # it only measures this booster when nothing else runs in the process, so it is logged on request
+        if self.run_options_parsed["autolog_cpu_time"]:
+          self.run.log_metric(TRAINING_CPU_TIME_METRIC, self.training_cpu_time)
 
     stream_data = stream_monitor.get_stream_data()
     if stream_data:
@@ -306,11 +405,22 @@ class XGBRunHandler:
         self.run.log_metric("num_boost_round_before_stopping", n_eval_rounds)
 
     if self.run_options_parsed["autolog_metrics"] and self.validation_sets:
+      scoring_options = {
+        "chunk_size": self.run_options_parsed["metrics_chunk_size"],
+        "sample_size": self.run_options_parsed["metrics_sample_size"],
+      }
       for validation_set in self.validation_sets:
         if self.is_regression:
-          self.run.log_metrics(compute_regression_metrics(self.model, (validation_set)))
+          metrics = compute_regression_metrics(self.model, (validation_set), **scoring_options)
         else:
-          self.run.log_metrics(compute_classification_metrics(self.model, (validation_set)))
+          metrics = compute_classification_metrics(
+            self.model,
+            (validation_set),
+            probabilities=self.objective in PROBABILITY_OBJECTIVES,
+            **scoring_options,
+          )
+        self.validation_metrics.update(metrics)
+        self.run.log_metrics(metrics)
 
 
 def run(
@@ -324,17 +434,27 @@ def run(
   callbacks=None,
   xgb_model=None,
   run_options=None,
+  resume=False,
   **kwargs,
 ):
   """
     Sigopt integration for XGBoost mirrors the standard xgboost.train interface for the most part, with the option
     for additional arguments. Unlike the usual train interface, sigopt.xgboost.run() returns a XGBRun object,
     where XGBRun.run and XGBRun.model are the resulting RunContext and XGBoost model, respectively.
+    With the model_checkpoint_dir run option the booster is saved there every model_checkpoint_period rounds, and
+    resume=True continues the training of the run passed as the run option from its last saved booster, e.g. after
+    the machine was preempted. The saved booster is removed once the training succeeds, unless the
+    keep_model_checkpoint run option is set.
+    The CPU time of the process while training is logged as "Training CPU time" with the autolog_cpu_time run option,
+    which is only meaningful when no other work runs in the process at the same time.
     """
   if evals is not None:
-    if not isinstance(evals, (DMatrix, list)):
+    if not (isinstance(evals, (DMatrix, list)) or is_data_iter(evals)):
       dmatrix_module_name = ".".join((DMatrix.__module__, DMatrix.__name__))
-      raise TypeError(f"`evals` must be a {dmatrix_module_name} object or list of ({dmatrix_module_name}, str) tuples.")
+      raise TypeError(
+        f"`evals` must be a {dmatrix_module_name} or xgboost.DataIter object or list of ({dmatrix_module_name}, str)"
+        " tuples."
+      )
 
   _run = XGBRunHandler(
     params=params,
@@ -350,13 +470,22 @@ def run(
     **kwargs,
   )
 
+  if resume and _run.run_options_parsed["run"] is None:
+    raise ValueError("resume=True continues the training of an existing run, pass the run as the `run` run option.")
   _run.make_run()
+  if resume:
+    _run.resume_training()
+  # the location is logged right away, so that it is recorded even if the training is interrupted
+  _run.log_booster_checkpoint_path()
   _run.form_callbacks()
-  _run.train_xgb()
-  _run.log_metadata()
-  _run.log_params()
-  _run.check_learning_task()
-  _run.log_validation_metrics()
-  if _run.run_options_parsed["autolog_feature_importances"]:
-    _run.log_feature_importances()
+  # the bookkeeping of the run is sent in one update once the metrics have been computed
+  with _run.run.batch_updates():
+    _run.train_xgb()
+    _run.log_metadata()
+    _run.log_params()
+    _run.check_learning_task()
+    _run.log_validation_metrics()
+    if _run.run_options_parsed["autolog_feature_importances"]:
+      _run.log_feature_importances()
+  _run.remove_booster_checkpoint()
   return XGBRun(_run.run, _run.model)
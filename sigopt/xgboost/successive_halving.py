@@ -0,0 +1,164 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import concurrent.futures
+import math
+import threading
+
+from .checkpoint_callback import SigOptCheckpointCallback
+from .run import XGBRunHandler
+
+
+DEFAULT_REDUCTION_FACTOR = 3
+
+
+def get_rung_schedule(min_num_boost_round, max_num_boost_round, reduction_factor):
+  """Returns the total boosting rounds of each rung, growing by reduction_factor up to max_num_boost_round."""
+  if reduction_factor <= 1:
+    raise ValueError(f"reduction_factor must be greater than 1, got {reduction_factor}")
+  if not 1 <= min_num_boost_round <= max_num_boost_round:
+    raise ValueError(
+      f"Invalid boosting rounds for successive halving, min: {min_num_boost_round}, max: {max_num_boost_round}"
+    )
+  rungs = []
+  num_boost_round = min_num_boost_round
+  while num_boost_round < max_num_boost_round:
+    rungs.append(num_boost_round)
+    num_boost_round = int(math.ceil(num_boost_round * reduction_factor))
+  rungs.append(max_num_boost_round)
+  return rungs
+
+
+class SuccessiveHalvingTrial(object):
+  """Trains the booster of one run rung by rung, continuing from the booster of the previous rung."""
+
+  def __init__(self, run, params, dtrain, evals, early_stopping_rounds, run_options, max_num_boost_round):
+    self.run = run
+    self.num_boost_round = 0
+    self.handler = XGBRunHandler(
+      params=params,
+      dtrain=dtrain,
+      num_boost_round=max_num_boost_round,
+      evals=evals,
+      early_stopping_rounds=early_stopping_rounds,
+      evals_result=None,
+      verbose_eval=False,
+      xgb_model=None,
+      callbacks=None,
+      run_options={**run_options, "run": run},
+    )
+    self.handler.make_run()
+    self.handler.form_callbacks()
+
+  def train(self, num_boost_round, metric_name):
+    self.handler.num_boost_round = num_boost_round - self.num_boost_round
+    # xgboost counts the epochs of each rung from 0, so the checkpoints continue from the rounds of the previous rungs
+    for callback in self.handler.callbacks or []:
+      if isinstance(callback, SigOptCheckpointCallback):
+        callback.start_epoch = self.num_boost_round
+    with self.run.batch_updates():
+      self.handler.train_xgb()
+      self.num_boost_round = num_boost_round
+      self.handler.check_learning_task()
+      self.handler.log_validation_metrics()
+    return self.handler.validation_metrics.get(metric_name)
+
+  def finish(self, stopping_reason=None):
+    self.handler.num_boost_round = self.num_boost_round
+    with self.run.batch_updates():
+      self.handler.log_metadata()
+      self.handler.log_params()
+      if self.handler.run_options_parsed["autolog_feature_importances"]:
+        self.handler.log_feature_importances()
+      if stopping_reason is not None:
+        self.run.stop(stopping_reason)
+
+  def remove_booster_checkpoint(self):
+    self.handler.remove_booster_checkpoint()
+
+
+class SuccessiveHalving(object):
+  """
+    Runs an XGBExperiment with asynchronous successive halving, with boosting rounds as the fidelity.
+    Each run is trained up to the rounds of the first rung, and continues to the next rung only if its metric is in
+    the best 1 / reduction_factor of the metrics that runs have reached at that rung so far, otherwise it is stopped
+    with its metrics so far. The first run to reach a rung always continues.
+    Runs are not held open while they wait for others, so no more than `workers` runs are open at a time, and a new
+    run is created whenever a worker is free.
+    """
+
+  def __init__(self, xgb_experiment, reduction_factor, min_num_boost_round, max_num_boost_round):
+    self.xgb_experiment = xgb_experiment
+    self.reduction_factor = reduction_factor
+    self.rungs = get_rung_schedule(min_num_boost_round, max_num_boost_round, reduction_factor)
+    (self.metric,) = [
+      metric for metric in xgb_experiment.experiment_config_parsed["metrics"] if metric["strategy"] == "optimize"
+    ]
+    self.rung_values = [[] for _ in self.rungs]
+    self._lock = threading.Lock()
+
+  def _sort_key(self, value):
+    if value is None or math.isnan(value):
+      return (1, 0)
+    return (0, -value if self.metric["objective"] == "maximize" else value)
+
+  def promote(self, rung_index, value):
+    """Records the metric of a run at a rung and returns whether the run continues to the next rung."""
+    with self._lock:
+      values = self.rung_values[rung_index]
+      values.append(value)
+      if value is None or math.isnan(value):
+        return False
+      num_promoted = max(1, len(values) // self.reduction_factor)
+      best = sorted((self._sort_key(other) for other in values))[:num_promoted]
+      return self._sort_key(value) <= best[-1]
+
+  def run_trial(self, run, params, run_options):
+    xgb_experiment = self.xgb_experiment
+    trial = SuccessiveHalvingTrial(
+      run,
+      params,
+      xgb_experiment.dtrain_cache.get({**params, **run.params}),
+      xgb_experiment.evals,
+      xgb_experiment.early_stopping_rounds,
+      run_options,
+      self.rungs[-1],
+    )
+    stopping_reason = None
+    for rung_index, num_boost_round in enumerate(self.rungs[:-1]):
+      value = trial.train(num_boost_round, self.metric["name"])
+      if not self.promote(rung_index, value):
+        stopping_reason = f"successive halving stopped the run after {num_boost_round} boosting rounds"
+        break
+    else:
+      trial.train(self.rungs[-1], self.metric["name"])
+    with run.batch_updates():
+      trial.finish(stopping_reason)
+      xgb_experiment.log_early_stopping_source(run)
+    trial.remove_booster_checkpoint()
+
+  def run(self, workers, params, run_options):
+    sigopt_experiment = self.xgb_experiment.sigopt_experiment
+    run_lock = threading.Lock()
+    stop_event = threading.Event()
+
+    def next_run():
+      # the budget check is shared, so that the workers can't overshoot the budget together
+      with run_lock:
+        if stop_event.is_set():
+          return None
+        return sigopt_experiment.create_run_within_budget()
+
+    def work():
+      try:
+        for run in iter(next_run, None):
+          with run:
+            self.run_trial(run, params, run_options)
+      except BaseException:
+        stop_event.set()
+        raise
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+      futures = [executor.submit(work) for _ in range(workers)]
+    for future in futures:
+      future.result()
@@ -3,7 +3,7 @@
 # SPDX-License-Identifier: MIT
 import json
 
-from .compat import Booster
+from .compat import Booster, DataIter, DMatrix
 
 
 def get_booster_params(booster):
@@ -37,3 +37,25 @@ def get_booster_params(booster):
     params[k] = parse_json_parameter_value(v)
 
   return params
+
+
+def is_data_iter(data):
+  return DataIter is not None and isinstance(data, DataIter)
+
+
+def as_dmatrix(data):
+  """Returns an external memory DMatrix for a DataIter, other training data is returned as is."""
+  if is_data_iter(data):
+    from .data_iter import IterDMatrix
+
+    return IterDMatrix(data)
+  return data
+
+
+def as_validation_sets(evals, default_name):
+  """Returns evals as a list of (DMatrix, name) pairs, with a DataIter converted to an external memory DMatrix."""
+  if evals is None:
+    return None
+  if isinstance(evals, DMatrix) or is_data_iter(evals):
+    evals = [(evals, default_name)]
+  return [(as_dmatrix(data), name) for data, name in evals]
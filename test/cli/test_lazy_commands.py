@@ -0,0 +1,65 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import subprocess  # nosec
+import sys
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from sigopt.cli import cli
+from sigopt.cli.lazy_group import LazyGroup
+
+
+def get_imported_modules(args):
+  result = subprocess.run(  # nosec
+    [sys.executable, "-X", "importtime", "-m", "sigopt.cli", *args],
+    capture_output=True,
+    check=True,
+    text=True,
+  )
+  return {line.rsplit("|", 1)[1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+
+
+class TestLazyCommands(object):
+  def test_version_does_not_import_other_commands(self):
+    imported = get_imported_modules(["version"])
+    assert "sigopt.cli.commands.base" in imported
+    for module in [
+      "sigopt.cli.commands.local.optimize",
+      "sigopt.cli.commands.init",
+      "sigopt.cli.commands.experiment.create",
+      "sigopt.aiexperiment_context",
+      "sigopt.cli.scheduler",
+      "sigopt.factory",
+      "requests",
+      "yaml",
+    ]:
+      assert module not in imported
+
+  def test_help_lists_lazy_commands(self):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["--help"])
+    assert result.exit_code == 0
+    for command in ["archive", "config", "create", "init", "optimize", "run", "start-worker", "unarchive", "version"]:
+      assert command in result.output
+    result = runner.invoke(cli, ["create", "--help"])
+    assert result.exit_code == 0
+    assert "experiment" in result.output
+    assert "project" in result.output
+
+  def test_help_does_not_import_commands(self):
+    imported = get_imported_modules(["--help"])
+    imported_commands = [module for module in imported if module.startswith("sigopt.cli.commands.")]
+    assert imported_commands == ["sigopt.cli.commands.base"]
+
+  def test_unknown_command(self):
+    result = CliRunner().invoke(cli, ["not-a-command"])
+    assert result.exit_code == 2
+
+  def test_module_must_register_command(self):
+    group = LazyGroup(lazy_subcommands={"missing": ("sigopt.version", "A missing command.")})
+    with click.Context(group) as ctx:
+      with pytest.raises(RuntimeError, match="sigopt.version"):
+        group.get_command(ctx, "missing")
@@ -0,0 +1,33 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import mock
+from click.testing import CliRunner
+
+from sigopt.cli import cli
+
+
+class TestLocalServerCli(object):
+  def test_local_server_command(self, tmp_path, caplog):
+    db_path = str(tmp_path / "local.sqlite3")
+    with mock.patch("sigopt.local_server.LocalServer.serve_forever", side_effect=KeyboardInterrupt):
+      result = CliRunner().invoke(cli, ["local-server", "--port", "0", "--db", db_path])
+    assert result.exit_code == 0
+    # the instructions are printed by the print logger, which writes to sys.stdout rather than the runner output
+    output = caplog.text
+    assert db_path in output
+    assert "export SIGOPT_API_URL='http://127.0.0.1:" in output
+
+  def test_local_server_upstream_sync(self, tmp_path):
+    db_path = str(tmp_path / "local.sqlite3")
+    with mock.patch("sigopt.local_server.LocalServer.serve_forever", side_effect=KeyboardInterrupt), mock.patch(
+      "sigopt.cli.commands.local_server.Connection"
+    ) as connection, mock.patch("sigopt.cli.commands.local_server.UpstreamSync") as upstream_sync:
+      result = CliRunner().invoke(
+        cli,
+        ["local-server", "--port", "0", "--db", db_path, "--upstream-url", "https://api.example.com"],
+      )
+    assert result.exit_code == 0
+    assert connection.call_args[1]["api_url"] == "https://api.example.com"
+    upstream_sync.return_value.start.assert_called_once_with(60)
+    upstream_sync.return_value.flush.assert_called_once_with()
@@ -27,7 +27,7 @@ class TestRunCli(object):
     with mock.patch(
       "sigopt.cli.commands.local.optimize.create_aiexperiment_from_validated_data"
     ) as create_aiexperiment:
-      experiment = AIExperimentContext(mock.Mock(project="test-project"), mock.Mock())
+      experiment = AIExperimentContext(mock.Mock(project="test-project", parallel_bandwidth=1), mock.Mock())
       experiment.create_run = mock.Mock(return_value=run_context)
       experiment.refresh = mock.Mock()
       experiment.is_finished = mock.Mock(side_effect=[False, True])
@@ -0,0 +1,22 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import os
+
+import mock
+from click.testing import CliRunner
+
+from sigopt.cli import cli
+
+
+class TestProxyCli(object):
+  def test_proxy_command(self, tmp_path, caplog):
+    socket_path = str(tmp_path / "proxy.sock")
+    with mock.patch("sigopt.proxy.ProxyServer.serve_forever", side_effect=KeyboardInterrupt), mock.patch.dict(
+      os.environ,
+      {"SIGOPT_API_TOKEN": "token"},
+    ):
+      result = CliRunner().invoke(cli, ["proxy", "--socket", socket_path, "--max-connections", "4"])
+    assert result.exit_code == 0
+    assert f"SIGOPT_PROXY_SOCKET='{socket_path}'" in caplog.text
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,57 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import sys
+import time
+
+import mock
+import pytest
+
+from sigopt.cli.utils import run_user_program
+
+
+class TestPrunedSubprocess(object):
+  @pytest.fixture
+  def config(self):
+    config = mock.Mock(log_collection_enabled=False)
+    config.get_environment_context.return_value = {}
+    return config
+
+  @pytest.fixture(autouse=True)
+  def stop_check_interval(self):
+    with mock.patch("sigopt.cli.utils.DEFAULT_STOP_CHECK_INTERVAL", 0.05):
+      yield
+
+  def test_pruned_program_is_terminated(self, config):
+    run_context = mock.Mock(id="1")
+    pruner = mock.Mock(metric="accuracy")
+    pruner.check_run.side_effect = [None, "median stopping"]
+    pruner.fetch_curve.return_value = [0.1, 0.2]
+    start = time.time()
+    exit_code = run_user_program(
+      config,
+      run_context,
+      [sys.executable, "-c", "import time; time.sleep(30)"],
+      None,
+      pruner=pruner,
+    )
+    assert time.time() - start < 10
+    assert exit_code != 0
+    pruner.check_run.assert_called_with("1")
+    run_context.stop.assert_called_once_with("median stopping")
+    run_context.log_metric.assert_called_once_with("accuracy", 0.2)
+
+  def test_program_finishes_without_pruning(self, config):
+    run_context = mock.Mock(id="1")
+    pruner = mock.Mock(metric="accuracy")
+    pruner.check_run.return_value = None
+    exit_code = run_user_program(
+      config,
+      run_context,
+      [sys.executable, "-c", "import time; time.sleep(0.2)"],
+      None,
+      pruner=pruner,
+    )
+    assert exit_code == 0
+    run_context.stop.assert_not_called()
+    run_context.log_metric.assert_not_called()
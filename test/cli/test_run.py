@@ -3,12 +3,15 @@
 # SPDX-License-Identifier: MIT
 import os
 import shutil
+import sys
 
 import mock
 import pytest
 from click.testing import CliRunner
 
 from sigopt.cli import cli
+from sigopt.cli.utils import run_subprocess
+from sigopt.config import Config
 from sigopt.run_context import RunContext
 
 
@@ -106,3 +109,25 @@ class TestRunCli(object):
     with open("print_hello.py") as fp:
       content = fp.read()
     run_context._log_source_code.assert_called_once_with({"content": content})
+
+
+class TestSubprocessContext(object):
+  def test_context_is_passed_in_a_file(self, tmp_path):
+    config = Config()
+    run_context = mock.Mock()
+    run_context.to_json.return_value = {"run": {"id": "1"}}
+    program = (
+      "import json, os;"
+      "assert 'SIGOPT_CONTEXT' not in os.environ;"
+      "path = os.environ['SIGOPT_CONTEXT_FILE'];"
+      "print(path);"
+      "print(json.load(open(path))['global_run_context']['run']['id'])"
+    )
+    with mock.patch.dict(os.environ, {"SIGOPT_CONTEXT": "e30="}):
+      env = {"SIGOPT_HOME": str(tmp_path)}
+      with mock.patch("sys.stdout") as stdout:
+        exit_code = run_subprocess(config, run_context, [sys.executable, "-c", program], env=env)
+    assert exit_code == 0
+    context_path, run_id = "".join(call[0][0] for call in stdout.write.call_args_list).split()
+    assert run_id == "1"
+    assert not os.path.exists(context_path)
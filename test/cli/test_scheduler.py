@@ -0,0 +1,193 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import os
+import shutil
+import threading
+
+import mock
+import pytest
+from click.testing import CliRunner
+
+from sigopt.aiexperiment_context import AIExperimentContext
+from sigopt.cli import cli
+from sigopt.cli.scheduler import (
+  LocalResourceScheduler,
+  ResourceRequest,
+  parse_cpu_list,
+  parse_cpu_quantity,
+  parse_memory_quantity,
+)
+from sigopt.objects import AIExperiment
+
+
+class TestResourceParsing(object):
+  def test_cpu_quantity(self):
+    assert parse_cpu_quantity(2) == 2
+    assert parse_cpu_quantity(1.5) == 2
+    assert parse_cpu_quantity("500m") == 1
+    assert parse_cpu_quantity("3") == 3
+    for value in [0, -1, "abc", True]:
+      with pytest.raises(ValueError):
+        parse_cpu_quantity(value)
+
+  def test_memory_quantity(self):
+    assert parse_memory_quantity(1024) == 1024
+    assert parse_memory_quantity("4Gi") == 4 * 2**30
+    assert parse_memory_quantity("512Mi") == 512 * 2**20
+    assert parse_memory_quantity("2G") == 2 * 10**9
+    assert parse_memory_quantity("1.5gb") == 1.5 * 10**9
+    for value in [0, "4 bananas", "Gi"]:
+      with pytest.raises(ValueError):
+        parse_memory_quantity(value)
+
+  def test_cpu_list(self):
+    assert parse_cpu_list("0-3,8-9,12\n") == {0, 1, 2, 3, 8, 9, 12}
+
+  def test_resource_request(self):
+    assert ResourceRequest.from_run_options({}) is None
+    assert ResourceRequest.from_run_options({"gpus": 1}) is None
+    request = ResourceRequest.from_run_options({"cpu": 2, "memory": "1Gi", "numa_node": 1})
+    assert (request.cpus, request.memory, request.numa_node) == (2, 2**30, 1)
+    request = ResourceRequest.from_run_options({"requests": {"cpu": "1500m"}, "limits": {"cpu": 4}})
+    assert (request.cpus, request.memory, request.numa_node) == (2, None, None)
+    with pytest.raises(ValueError):
+      ResourceRequest.from_run_options({"numa_node": "first"})
+
+
+class TestLocalResourceScheduler(object):
+  @pytest.fixture
+  def scheduler(self):
+    return LocalResourceScheduler(memory=8 * 2**30, numa_nodes={0: {0, 1, 2, 3}, 1: {4, 5, 6, 7}})
+
+  def test_packs_runs_onto_numa_nodes(self, scheduler):
+    with scheduler.allocate(ResourceRequest(cpus=2)) as first:
+      assert first.cpus == [0, 1]
+      with scheduler.allocate(ResourceRequest(cpus=2)) as second:
+        assert second.cpus == [2, 3]
+        with scheduler.allocate(ResourceRequest(cpus=3)) as third:
+          assert third.cpus == [4, 5, 6]
+    assert scheduler.free_cpus == {0: {0, 1, 2, 3}, 1: {4, 5, 6, 7}}
+
+  def test_requested_numa_node(self, scheduler):
+    with scheduler.allocate(ResourceRequest(cpus=1, numa_node=1)) as allocation:
+      assert allocation.cpus == [4]
+    with scheduler.allocate(ResourceRequest(memory=2**30, numa_node=1)) as allocation:
+      assert allocation.cpus == [4, 5, 6, 7]
+      assert allocation.memory == 2**30
+
+  def test_impossible_requests(self, scheduler):
+    for request in [
+      ResourceRequest(cpus=9),
+      ResourceRequest(cpus=5, numa_node=0),
+      ResourceRequest(numa_node=2),
+      ResourceRequest(memory=16 * 2**30),
+    ]:
+      with pytest.raises(ValueError):
+        with scheduler.allocate(request):
+          pass
+
+  def test_waits_for_capacity(self, scheduler):
+    request = ResourceRequest(cpus=1, memory=6 * 2**30)
+    acquired = threading.Event()
+
+    def acquire():
+      with scheduler.allocate(request):
+        acquired.set()
+
+    with scheduler.allocate(request):
+      thread = threading.Thread(target=acquire)
+      thread.start()
+      assert not acquired.wait(0.1)
+    thread.join(timeout=5)
+    assert acquired.is_set()
+    assert scheduler.free_memory == 8 * 2**30
+
+
+class TestSchedulerCli(object):
+  @pytest.fixture
+  def experiment(self):
+    experiment = AIExperimentContext(
+      AIExperiment({"id": "1", "project": "test-project", "parallel_bandwidth": 4}),
+      mock.Mock(),
+    )
+    lock = threading.Lock()
+    created_runs = []
+
+    def refresh():
+      with lock:
+        experiment._aiexperiment = AIExperiment(
+          {
+            "id": "1",
+            "project": "test-project",
+            "parallel_bandwidth": 4,
+            "progress": {"remaining_budget": 4 - len(created_runs), "active_run_count": 0},
+          }
+        )
+
+    def create_run(name=None):
+      with lock:
+        run_context = mock.MagicMock(id=str(len(created_runs)))
+        created_runs.append(run_context)
+        return run_context
+
+    experiment.refresh = mock.Mock(side_effect=refresh)
+    experiment.create_run = mock.Mock(side_effect=create_run)
+    experiment.created_runs = created_runs
+    return experiment
+
+  @pytest.fixture
+  def runner(self, experiment):
+    runner = CliRunner()
+    root = os.path.abspath("test/cli/test_files")
+    with mock.patch("sigopt.cli.commands.local.start_worker.SigOptFactory") as factory:
+      factory.from_default_project.return_value.get_aiexperiment.return_value = experiment
+      with runner.isolated_filesystem():
+        shutil.copy(os.path.join(root, "print_hello.py"), ".")
+        yield runner
+
+  def write_run_file(self, resources):
+    with open("run.yml", "w") as run_fp:
+      run_fp.write("resources:\n")
+      for key, value in resources.items():
+        run_fp.write(f"  {key}: {value}\n")
+
+  def test_runs_are_limited_by_resources(self, runner, experiment):
+    self.write_run_file({"cpu": 2, "memory": "1Mi"})
+    active = []
+    max_active = []
+    free_memory = []
+    lock = threading.Lock()
+
+    def run_user_program(config, run_context, command, source_code_content, cpus, pruner, output_prefix):
+      with lock:
+        active.append(cpus)
+        max_active.append(len(active))
+        free_memory.append(scheduler.free_memory)
+      assert len(cpus) == 2
+      with lock:
+        active.remove(cpus)
+
+    scheduler = LocalResourceScheduler(memory=2**30, numa_nodes={0: {0, 1, 2}})
+    with mock.patch("sigopt.cli.scheduler.LocalResourceScheduler", return_value=scheduler), mock.patch(
+      "sigopt.cli.utils.run_user_program",
+      side_effect=run_user_program,
+    ):
+      result = runner.invoke(cli, ["start-worker", "--workers=3", "1234", "python", "print_hello.py"])
+    assert result.exit_code == 0, result.output
+    assert len(experiment.created_runs) == 4
+    assert max(max_active) == 1
+    assert free_memory == [2**30 - 2**20] * 4
+    assert scheduler.free_memory == 2**30
+
+  def test_impossible_resources(self, runner):
+    self.write_run_file({"cpu": 10000})
+    result = runner.invoke(cli, ["start-worker", "1234", "python", "print_hello.py"])
+    assert result.exit_code == 1
+    assert "CPUs" in result.output
+
+  def test_cpu_affinity_conflict(self, runner):
+    self.write_run_file({"cpu": 1})
+    result = runner.invoke(cli, ["start-worker", "--cpu-affinity", "1234", "python", "print_hello.py"])
+    assert result.exit_code == 1
+    assert "--cpu-affinity" in result.output
@@ -25,7 +25,7 @@ class TestRunCli(object):
   @pytest.fixture(autouse=True)
   def patch_run_factory(self, run_context):
     with mock.patch("sigopt.cli.commands.local.start_worker.SigOptFactory") as factory:
-      experiment = AIExperimentContext(mock.Mock(project="test-project"), mock.Mock())
+      experiment = AIExperimentContext(mock.Mock(project="test-project", parallel_bandwidth=1), mock.Mock())
       experiment.create_run = mock.Mock(return_value=run_context)
       experiment.refresh = mock.Mock()
       experiment.is_finished = mock.Mock(side_effect=[False, True])
@@ -0,0 +1,129 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+import click
+import mock
+import pytest
+from click.testing import CliRunner
+
+from sigopt.aiexperiment_context import AIExperimentContext
+from sigopt.cli import cli
+from sigopt.cli.utils import get_cli_worker_count, get_cpu_partitions, run_subprocess_command
+from sigopt.objects import AIExperiment
+
+
+class TestWorkerCount(object):
+  def test_explicit_workers(self):
+    assert get_cli_worker_count(mock.Mock(parallel_bandwidth=1), 4) == 4
+
+  def test_default_workers(self):
+    with mock.patch("os.cpu_count", return_value=8):
+      assert get_cli_worker_count(mock.Mock(parallel_bandwidth=3), None) == 3
+      assert get_cli_worker_count(mock.Mock(parallel_bandwidth=16), None) == 8
+      assert get_cli_worker_count(mock.Mock(parallel_bandwidth=None), None) == 1
+
+  def test_cpu_partitions(self):
+    with mock.patch("os.sched_getaffinity", return_value={0, 1, 2, 3, 4}, create=True):
+      assert get_cpu_partitions(2) == [[0, 1, 2], [3, 4]]
+      assert get_cpu_partitions(5) == [[0], [1], [2], [3], [4]]
+      with pytest.raises(click.ClickException):
+        get_cpu_partitions(6)
+
+  def test_cpu_affinity_is_set_on_the_child(self):
+    procs = []
+    popen = subprocess.Popen
+
+    def record_popen(*args, **kwargs):
+      proc = popen(*args, **kwargs)
+      procs.append(proc)
+      return proc
+
+    with mock.patch("subprocess.Popen", side_effect=record_popen), mock.patch(
+      "os.sched_setaffinity", create=True
+    ) as sched_setaffinity:
+      return_code = run_subprocess_command(
+        mock.Mock(log_collection_enabled=False, get_environment_context=mock.Mock(return_value={})),
+        mock.Mock(),
+        [sys.executable, "-c", "pass"],
+        cpus=[2, 3],
+      )
+    assert return_code == 0
+    sched_setaffinity.assert_called_once_with(procs[0].pid, [2, 3])
+
+
+class TestMultipleWorkers(object):
+  @pytest.fixture
+  def experiment(self):
+    experiment = AIExperimentContext(
+      AIExperiment({"id": "1", "project": "test-project", "parallel_bandwidth": 2}),
+      mock.Mock(),
+    )
+    lock = threading.Lock()
+    created_runs = []
+
+    def refresh():
+      # the runs end as soon as they are created in this test, so none of them are active
+      with lock:
+        experiment._aiexperiment = AIExperiment(
+          {
+            "id": "1",
+            "project": "test-project",
+            "parallel_bandwidth": 2,
+            "progress": {"remaining_budget": 4 - len(created_runs), "active_run_count": 0},
+          }
+        )
+
+    def create_run(name=None):
+      with lock:
+        run_context = mock.MagicMock(id=str(len(created_runs)))
+        run_context.to_json.return_value = {"run": {}}
+        created_runs.append(run_context)
+        return run_context
+
+    experiment.refresh = mock.Mock(side_effect=refresh)
+    experiment.create_run = mock.Mock(side_effect=create_run)
+    experiment.created_runs = created_runs
+    return experiment
+
+  @pytest.fixture(autouse=True)
+  def patch_run_factory(self, experiment):
+    with mock.patch("sigopt.cli.commands.local.start_worker.SigOptFactory") as factory:
+      instance = mock.Mock()
+      instance.get_aiexperiment.return_value = experiment
+      factory.from_default_project = mock.Mock(return_value=instance)
+      yield
+
+  @pytest.fixture
+  def runner(self):
+    runner = CliRunner()
+    root = os.path.abspath("test/cli/test_files")
+    with runner.isolated_filesystem():
+      shutil.copy(os.path.join(root, "print_hello.py"), ".")
+      yield runner
+
+  def test_start_worker_with_workers(self, runner, experiment):
+    with mock.patch("sigopt.cli.utils.run_user_program") as run_user_program:
+      result = runner.invoke(cli, ["start-worker", "--workers=2", "1234", "python", "print_hello.py"])
+    assert result.exit_code == 0, result.output
+    assert len(experiment.created_runs) == 4
+    assert run_user_program.call_count == 4
+    for run_context in experiment.created_runs:
+      run_context.__exit__.assert_called_once()
+
+  def test_start_worker_runs_programs(self, runner, experiment):
+    result = runner.invoke(cli, ["start-worker", "--workers=2", "1234", "python", "print_hello.py"])
+    assert result.exit_code == 0, result.output
+    assert sorted(result.output.splitlines()) == [f"[run {i}] hello" for i in range(4)]
+
+  def test_failing_worker_stops_other_workers(self, runner, experiment):
+    with mock.patch("sigopt.cli.utils.run_user_program", side_effect=click.ClickException("bad command")):
+      result = runner.invoke(cli, ["start-worker", "--workers=2", "1234", "python", "print_hello.py"])
+    assert result.exit_code == 1
+    assert "bad command" in result.output
+    assert 1 <= len(experiment.created_runs) <= 2
@@ -0,0 +1,105 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import base64
+import json
+import os
+import subprocess  # nosec
+import sys
+import threading
+
+import pytest
+
+import sigopt
+from sigopt.compat import lazy_import
+
+
+DEFERRED_MODULES = [
+  "backoff",
+  "click",
+  "git",
+  "requests",
+  "sigopt.factory",
+  "sigopt.request_driver",
+  "sigopt.validate",
+  "urllib3",
+  "yaml",
+]
+
+
+def run_python(code, env=None):
+  return subprocess.run(  # nosec
+    [sys.executable, "-X", "importtime", "-c", code],
+    env={**os.environ, **(env or {})},
+    capture_output=True,
+    check=True,
+    text=True,
+  )
+
+
+def get_imported_modules(importtime_output):
+  modules = set()
+  for line in importtime_output.splitlines():
+    if line.startswith("import time:") and "|" in line:
+      modules.add(line.rsplit("|", 1)[1].strip())
+  return modules
+
+
+class TestImportTime(object):
+  def test_import_defers_heavy_modules(self):
+    imported = get_imported_modules(run_python("import sigopt").stderr)
+    assert "sigopt" in imported
+    for module in DEFERRED_MODULES:
+      assert module not in imported
+
+  def test_logging_does_not_load_the_factory(self):
+    imported = get_imported_modules(run_python("import sigopt; sigopt.log_metric('accuracy', 1)").stderr)
+    assert "sigopt.factory" not in imported
+    assert "requests" not in imported
+
+  def test_global_run_context_is_read_on_use(self, tmp_path):
+    context = {"global_run_context": {"run": {"id": "123", "assignments": {}}}}
+    result = run_python(
+      "import sigopt; print(sigopt.get_run_id())",
+      env={
+        "SIGOPT_API_TOKEN": "test-token",
+        "SIGOPT_CONTEXT": base64.b64encode(json.dumps(context).encode()).decode(),
+        "SIGOPT_HOME": str(tmp_path),
+      },
+    )
+    assert result.stdout.strip() == "123"
+
+  def test_lazy_attributes(self):
+    from sigopt.factory import SigOptFactory
+
+    assert sigopt.SigOptFactory is SigOptFactory
+    assert isinstance(sigopt._global_factory, SigOptFactory)
+    assert sigopt.create_run.__self__ is sigopt._global_factory
+    assert "create_run" in dir(sigopt)
+    with pytest.raises(AttributeError):
+      sigopt.not_an_attribute  # pylint: disable=pointless-statement
+
+
+class TestLazyImport(object):
+  def test_concurrent_first_access(self, tmp_path, monkeypatch):
+    executions = tmp_path / "executions"
+    (tmp_path / "slow_lazy_module.py").write_text(
+      f"import time\nwith open({str(executions)!r}, 'a') as fp:\n  fp.write('x')\ntime.sleep(0.1)\nVALUE = 1\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "slow_lazy_module", raising=False)
+    module = lazy_import("slow_lazy_module")
+    assert not executions.exists()
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(module.VALUE)) for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    assert values == [1] * 8
+    assert executions.read_text() == "x"
+    assert lazy_import("slow_lazy_module") is module
+
+  def test_missing_module(self):
+    with pytest.raises(ImportError):
+      lazy_import("not_a_sigopt_module")
@@ -9,6 +9,7 @@ import pytest
 from sigopt.config import config
 from sigopt.interface import Connection
 from sigopt.request_driver import DEFAULT_HTTP_TIMEOUT
+from sigopt.sqlite_driver import SQLiteDriver
 from sigopt.resource import ApiResource
 
 
@@ -81,3 +82,25 @@ class TestInterface(object):
     conn = Connection("client_token")
     conn.set_timeout(30)
     assert conn.impl.driver.timeout == 30
+
+  def test_driver_from_environment(self, tmp_path):
+    path = str(tmp_path / "sigopt.sqlite3")
+    with mock.patch.dict(os.environ, {"SIGOPT_DRIVER": "sqlite", "SIGOPT_SQLITE_PATH": path}):
+      conn = Connection()
+    assert isinstance(conn.impl.driver, SQLiteDriver)
+    assert conn.impl.driver.path == path
+
+  def test_driver_entry_point(self):
+    driver = mock.Mock()
+    entry_point = mock.Mock()
+    entry_point.name = "custom"
+    entry_point.load.return_value = mock.Mock(return_value=driver)
+    with mock.patch("sigopt.interface.get_driver_entry_points", return_value={"custom": entry_point}):
+      conn = Connection("client_token", driver="custom")
+    assert conn.impl.driver is driver
+    entry_point.load.return_value.assert_called_once_with("client_token")
+
+  def test_unknown_driver(self):
+    with mock.patch("sigopt.interface.get_driver_entry_points", return_value={}):
+      with pytest.raises(ValueError):
+        Connection(driver="unknown")
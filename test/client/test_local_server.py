@@ -0,0 +1,171 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import threading
+
+import pytest
+from mock import Mock
+
+from sigopt.exception import ApiException
+from sigopt.interface import Connection
+from sigopt.local_server import UpstreamSync, create_local_server
+from sigopt.objects import Pagination, TrainingRun
+from sigopt.run_context import RunContext
+from sigopt.sqlite_driver import LOCAL_CLIENT_ID
+
+
+class TestLocalServer(object):
+  @pytest.fixture
+  def server(self, tmp_path):
+    server = create_local_server(path=str(tmp_path / "sigopt.sqlite3"), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+  @pytest.fixture
+  def connection(self, server):
+    return Connection(client_token="any-token", driver="http", api_url=server.api_url)
+
+  @pytest.fixture
+  def project(self, connection):
+    return connection.clients(LOCAL_CLIENT_ID).projects().create(id="test-project", name="Test")
+
+  def create_run(self, connection, name="run"):
+    return connection.clients(LOCAL_CLIENT_ID).projects("test-project").training_runs().create(name=name)
+
+  def test_run_context(self, connection, project):
+    run = RunContext(connection, self.create_run(connection))
+    with run:
+      run.params.max_depth = 3
+      with run.batch_updates():
+        run.log_metadata("dataset", "iris")
+        run.log_metric("accuracy", 0.9, stddev=0.1)
+      run.log_checkpoint({"loss": 0.5})
+    training_run = connection.training_runs(run.id).fetch()
+    assert training_run.state == "completed"
+    assert training_run.assignments["max_depth"] == 3
+    assert training_run.metadata["dataset"] == "iris"
+    assert training_run.values["accuracy"].value_stddev == 0.1
+    assert training_run.checkpoint_count == 1
+    checkpoints = list(connection.training_runs(run.id).checkpoints().fetch().iterate_pages())
+    assert [checkpoint.values[0].value for checkpoint in checkpoints] == [0.5]
+
+  def test_list_runs(self, connection, project):
+    created = [self.create_run(connection, name=f"run-{i}").id for i in range(5)]
+    runs = connection.clients(LOCAL_CLIENT_ID).projects("test-project").training_runs().fetch(limit=2)
+    assert sorted(training_run.id for training_run in runs.iterate_pages()) == sorted(created)
+    connection.training_runs(created[0]).delete()
+    runs = connection.clients(LOCAL_CLIENT_ID).projects("test-project").training_runs().fetch()
+    assert created[0] not in [training_run.id for training_run in runs.iterate_pages()]
+
+  def test_errors(self, connection, project):
+    with pytest.raises(ApiException) as not_found:
+      connection.training_runs("123").fetch()
+    assert not_found.value.status_code == 404
+    with pytest.raises(ApiException) as conflict:
+      connection.clients(LOCAL_CLIENT_ID).projects().create(id="test-project")
+    assert conflict.value.status_code == 409
+    with pytest.raises(ApiException) as unsupported:
+      connection.experiments().fetch()
+    assert unsupported.value.status_code == 404
+
+
+class TestUpstreamSync(object):
+  @pytest.fixture
+  def server(self, tmp_path):
+    server = create_local_server(path=str(tmp_path / "sigopt.sqlite3"), port=0)
+    server.driver.request("POST", ["clients", LOCAL_CLIENT_ID, "projects"], {"id": "test-project"}, None)
+    yield server
+    server.server_close()
+
+  @pytest.fixture
+  def upstream(self):
+    upstream = Mock()
+    upstream.tokens.return_value.fetch.return_value.client = "upstream-client"
+    upstream_ids = iter(range(100, 200))
+    create_batch = upstream.clients.return_value.projects.return_value.training_runs.return_value.create_batch
+    create_batch.side_effect = lambda runs: Pagination(
+      TrainingRun,
+      {"data": [{"id": str(next(upstream_ids))} for _ in runs]},
+      retrieve_params={},
+    )
+    return upstream
+
+  def create_runs(self, server, count, state="completed"):
+    driver = server.driver
+    run_ids = []
+    for i in range(count):
+      training_run = driver.request(
+        "POST",
+        ["clients", LOCAL_CLIENT_ID, "projects", "test-project", "training_runs"],
+        {"name": f"run-{i}"},
+        None,
+      )
+      driver.request("MERGE", ["training_runs", training_run["id"]], {"state": state}, None)
+      run_ids.append(training_run["id"])
+    return run_ids
+
+  def get_create_batch(self, upstream):
+    return upstream.clients.return_value.projects.return_value.training_runs.return_value.create_batch
+
+  def test_sync_finished_runs_once(self, server, upstream):
+    self.create_runs(server, 3)
+    self.create_runs(server, 1, state="active")
+    sync = UpstreamSync(server.driver, upstream, batch_size=2)
+    assert sync.sync_once() == 2
+    assert sync.sync_once() == 1
+    assert sync.sync_once() == 0
+    create_batch = self.get_create_batch(upstream)
+    assert create_batch.call_count == 2
+    runs = create_batch.call_args_list[0][1]["runs"]
+    assert [run["name"] for run in runs] == ["run-0", "run-1"]
+    assert all(run["state"] == "completed" for run in runs)
+    assert all("id" not in run and "project" not in run and "client" not in run for run in runs)
+    upstream.clients.assert_called_with("upstream-client")
+    upstream.clients.return_value.projects.assert_called_with("test-project")
+    synced = server.driver.db.execute("SELECT upstream_id FROM upstream_runs ORDER BY training_run").fetchall()
+    assert [row[0] for row in synced] == ["100", "101", "102"]
+
+  def test_create_missing_project(self, server, upstream):
+    self.create_runs(server, 1)
+    create_batch = self.get_create_batch(upstream)
+    create_batch.side_effect = [
+      ApiException({"message": "not found"}, 404),
+      Pagination(TrainingRun, {"data": [{"id": "100"}]}, retrieve_params={}),
+    ]
+    sync = UpstreamSync(server.driver, upstream)
+    assert sync.sync_once() == 1
+    upstream.clients.return_value.projects.return_value.create.assert_called_once_with(
+      id="test-project",
+      name="test-project",
+    )
+    assert create_batch.call_count == 2
+
+  def test_upload_response_is_a_single_page(self, server, upstream):
+    self.create_runs(server, 1)
+    bound_endpoint = Mock()
+    self.get_create_batch(upstream).side_effect = lambda runs: Pagination(
+      TrainingRun,
+      {"data": [{"id": "100"}], "paging": {"before": "100"}},
+      bound_endpoint=bound_endpoint,
+      retrieve_params={},
+    )
+    sync = UpstreamSync(server.driver, upstream)
+    assert sync.sync_once() == 1
+    bound_endpoint.assert_not_called()
+    synced = server.driver.db.execute("SELECT upstream_id FROM upstream_runs").fetchall()
+    assert [row[0] for row in synced] == ["100"]
+
+  def test_failed_upload_is_retried(self, server, upstream):
+    self.create_runs(server, 1)
+    create_batch = self.get_create_batch(upstream)
+    batch_side_effect = create_batch.side_effect
+    create_batch.side_effect = ApiException({"message": "unavailable"}, 503)
+    sync = UpstreamSync(server.driver, upstream)
+    sync.flush()
+    create_batch.side_effect = batch_side_effect
+    assert sync.sync_once() == 1
+    assert sync.sync_once() == 0
@@ -0,0 +1,133 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import itertools
+import threading
+import time
+
+import mock
+import pytest
+
+import sigopt
+from sigopt.exception import ApiException
+from sigopt.objects import Observation, Pagination
+from sigopt.observation_reporter import ObservationReporter
+
+
+class TestObservationReporter(object):
+  @pytest.fixture
+  def connection(self):
+    connection = mock.Mock()
+    ids = itertools.count(1)
+    observations = connection.experiments.return_value.observations.return_value
+
+    def create_batch(observations):
+      data = [{"id": str(next(ids)), "suggestion": observation.get("suggestion")} for observation in observations]
+      return Pagination(Observation, {"data": data}, retrieve_params={})
+
+    def create(**observation):
+      if observation.get("failed") is None and observation.get("values") is None:
+        raise ApiException({"message": "Missing values"}, 400)
+      return Observation({"id": str(next(ids)), "suggestion": observation.get("suggestion")})
+
+    observations.create_batch.side_effect = create_batch
+    observations.create.side_effect = create
+    return connection
+
+  def get_observations(self, connection):
+    return connection.experiments.return_value.observations.return_value
+
+  def test_flushes_on_batch_size(self, connection):
+    with ObservationReporter(connection, "1", max_batch_size=3, max_delay=60) as reporter:
+      futures = [reporter.report(suggestion=str(i), values=[{"value": i}]) for i in range(7)]
+      assert [future.result(timeout=5).suggestion for future in futures[:6]] == [str(i) for i in range(6)]
+      assert not futures[6].done()
+    assert futures[6].result().suggestion == "6"
+    batches = [kwargs["observations"] for _, kwargs in self.get_observations(connection).create_batch.call_args_list]
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert batches[0][1] == {"suggestion": "1", "values": [{"value": 1}]}
+    connection.experiments.assert_called_with("1")
+
+  def test_flushes_on_delay(self, connection):
+    reporter = ObservationReporter(connection, "1", max_batch_size=100, max_delay=0.05)
+    start = time.monotonic()
+    future = reporter.report(suggestion="1", values=[{"value": 1}])
+    assert future.result(timeout=5).suggestion == "1"
+    assert time.monotonic() - start >= 0.05
+    reporter.close()
+
+  def test_flush(self, connection):
+    reporter = ObservationReporter(connection, "1", max_batch_size=100, max_delay=60)
+    reporter.flush()
+    futures = [reporter.report(suggestion=str(i), values=[{"value": i}]) for i in range(2)]
+    reporter.flush()
+    assert all(future.done() for future in futures)
+    assert self.get_observations(connection).create_batch.call_count == 1
+    reporter.close()
+    with pytest.raises(ValueError):
+      reporter.report(suggestion="3", values=[{"value": 3}])
+
+  def test_many_threads(self, connection):
+    futures = []
+    with ObservationReporter(connection, "1", max_batch_size=10, max_delay=0.01) as reporter:
+      threads = [
+        threading.Thread(target=lambda i=i: futures.append(reporter.report(suggestion=str(i), failed=True)))
+        for i in range(50)
+      ]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+    assert sorted(int(future.result().suggestion) for future in futures) == list(range(50))
+    assert len({future.result().id for future in futures}) == 50
+
+  def test_rejected_batch_is_sent_one_at_a_time(self, connection):
+    observations = self.get_observations(connection)
+    observations.create_batch.side_effect = ApiException({"message": "Missing values"}, 400)
+    with ObservationReporter(connection, "1", max_batch_size=3, max_delay=60) as reporter:
+      valid = reporter.report(suggestion="1", values=[{"value": 1}])
+      invalid = reporter.report(suggestion="2")
+      failed = reporter.report(suggestion="3", failed=True)
+      assert valid.result(timeout=5).suggestion == "1"
+      assert failed.result(timeout=5).suggestion == "3"
+      assert isinstance(invalid.exception(timeout=5), ApiException)
+    assert observations.create.call_count == 3
+
+  def test_server_errors_fail_the_batch(self, connection):
+    observations = self.get_observations(connection)
+    observations.create_batch.side_effect = ApiException({"message": "unavailable"}, 503)
+    with ObservationReporter(connection, "1", max_batch_size=2, max_delay=60) as reporter:
+      futures = [reporter.report(suggestion=str(i), failed=True) for i in range(2)]
+      for future in futures:
+        assert future.exception(timeout=5).status_code == 503
+    observations.create.assert_not_called()
+
+  def test_partial_batch_resolves_the_created_observations(self, connection):
+    observations = self.get_observations(connection)
+    observations.create_batch.side_effect = lambda observations: Pagination(
+      Observation,
+      {
+        "data": [
+          {"id": "11", "suggestion": "3"},
+          {"id": "12", "assignments": {"x": 1}},
+        ]
+      },
+      retrieve_params={},
+    )
+    with ObservationReporter(connection, "1", max_batch_size=3, max_delay=60) as reporter:
+      by_assignments = reporter.report(assignments={"x": 1}, values=[{"value": 1}])
+      missing = reporter.report(suggestion="2", values=[{"value": 2}])
+      by_suggestion = reporter.report(suggestion="3", values=[{"value": 3}])
+      assert by_assignments.result(timeout=5).id == "12"
+      assert by_suggestion.result(timeout=5).id == "11"
+      assert isinstance(missing.exception(timeout=5), ValueError)
+    observations.create.assert_not_called()
+
+  def test_invalid_arguments(self, connection):
+    with pytest.raises(ValueError):
+      ObservationReporter(connection, "1", max_batch_size=0)
+    with pytest.raises(ValueError):
+      ObservationReporter(connection, "1", max_delay=-1)
+
+  def test_lazy_export(self):
+    assert sigopt.ObservationReporter is ObservationReporter
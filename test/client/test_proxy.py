@@ -0,0 +1,279 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import threading
+import time
+
+import pytest
+
+from sigopt.exception import ApiException, ConnectionException
+from sigopt.interface import Connection
+from sigopt.proxy import RequestCoalescer, create_proxy_server
+from sigopt.ratelimit import RequestRateLimit
+from sigopt.run_context import RunContext
+from sigopt.sqlite_driver import LOCAL_CLIENT_ID, SQLiteDriver
+
+
+class BlockingDriver(object):
+  """Records the requests it gets and holds the first one until it is released."""
+
+  def __init__(self):
+    self.requests = []
+    self.started = threading.Event()
+    self.release = threading.Event()
+
+  def request(self, method, path, data, headers):
+    self.requests.append((method, path, data))
+    if len(self.requests) == 1:
+      self.started.set()
+      self.release.wait(5)
+    return {"method": method, "count": len(self.requests)}
+
+
+class TestProxy(object):
+  @pytest.fixture
+  def socket_path(self, tmp_path):
+    return str(tmp_path / "proxy.sock")
+
+  @pytest.fixture
+  def server(self, tmp_path, socket_path):
+    server = create_proxy_server(socket_path, driver=SQLiteDriver(path=str(tmp_path / "sigopt.sqlite3")))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+  @pytest.fixture
+  def connection(self, server, socket_path):
+    connection = Connection(driver="proxy", socket_path=socket_path)
+    yield connection
+    connection.impl.driver.close()
+
+  def test_run_context(self, connection):
+    connection.clients(LOCAL_CLIENT_ID).projects().create(id="test-project")
+    training_run = connection.clients(LOCAL_CLIENT_ID).projects("test-project").training_runs().create(name="run")
+    run = RunContext(connection, training_run)
+    with run:
+      run.params.max_depth = 3
+      run.log_metric("accuracy", 0.9)
+      run.log_checkpoint({"loss": 0.5})
+    training_run = connection.training_runs(run.id).fetch()
+    assert training_run.state == "completed"
+    assert training_run.assignments["max_depth"] == 3
+    assert training_run.values["accuracy"].value == 0.9
+    assert training_run.checkpoint_count == 1
+
+  def test_api_errors(self, connection):
+    with pytest.raises(ApiException) as not_found:
+      connection.training_runs("1").fetch()
+    assert not_found.value.status_code == 404
+
+  def test_threads_share_the_proxy(self, connection):
+    connection.clients(LOCAL_CLIENT_ID).projects().create(id="test-project")
+    training_runs = connection.clients(LOCAL_CLIENT_ID).projects("test-project").training_runs()
+    threads = [threading.Thread(target=lambda i=i: training_runs.create(name=f"run-{i}")) for i in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    assert len(list(training_runs.fetch().iterate_pages())) == 8
+
+  def test_existing_proxy(self, server, socket_path):
+    with pytest.raises(ValueError):
+      create_proxy_server(socket_path, driver=server.coalescer.driver)
+
+  def test_no_proxy(self, tmp_path):
+    connection = Connection(driver="proxy", socket_path=str(tmp_path / "missing.sock"))
+    with pytest.raises(ConnectionException):
+      connection.training_runs("1").fetch()
+
+
+class TestRequestCoalescer(object):
+  def run_in_threads(self, driver, requests):
+    coalescer = RequestCoalescer(driver)
+    results = [None] * len(requests)
+
+    def send(i):
+      results[i] = coalescer.request(*requests[i])
+
+    first = threading.Thread(target=send, args=(0,))
+    first.start()
+    assert driver.started.wait(5)
+    others = [threading.Thread(target=send, args=(i,)) for i in range(1, len(requests))]
+    for thread in others:
+      thread.start()
+    # the other requests are queued behind the blocked one before it is released
+    time.sleep(0.1)
+    driver.release.set()
+    for thread in [first, *others]:
+      thread.join()
+    return results
+
+  def test_identical_gets_share_a_request(self):
+    driver = BlockingDriver()
+    results = self.run_in_threads(driver, [("GET", ["training_runs", "1"], {}, {})] * 4)
+    assert len(driver.requests) == 1
+    assert results == [{"method": "GET", "count": 1}] * 4
+
+  def test_different_gets_are_not_shared(self):
+    driver = BlockingDriver()
+    self.run_in_threads(driver, [("GET", ["training_runs", str(i)], {}, {}) for i in range(3)])
+    assert len(driver.requests) == 3
+
+  def test_merges_are_combined(self):
+    driver = BlockingDriver()
+    results = self.run_in_threads(
+      driver,
+      [
+        ("MERGE", ["training_runs", "1"], {"values": {"a": {"value": 1}}}, {}),
+        ("MERGE", ["training_runs", "1"], {"values": {"b": {"value": 2}}}, {}),
+        ("MERGE", ["training_runs", "1"], {"values": {"b": {"value": 3}}, "state": "completed"}, {}),
+        ("MERGE", ["training_runs", "2"], {"state": "failed"}, {}),
+      ],
+    )
+    merges_of_run_1 = [data for _, path, data in driver.requests if path == ["training_runs", "1"]]
+    assert merges_of_run_1 == [
+      {"values": {"a": {"value": 1}}},
+      {"values": {"b": {"value": 3}}, "state": "completed"},
+    ]
+    assert len(driver.requests) == 3
+    assert results[1] == results[2]
+
+  def test_rejected_merges_are_sent_one_at_a_time(self):
+    class RejectingDriver(BlockingDriver):
+      def request(self, method, path, data, headers):
+        response = super().request(method, path, data, headers)
+        if "invalid" in data.get("values", {}):
+          raise ApiException({"message": "invalid value"}, 400)
+        return response
+
+    driver = RejectingDriver()
+    coalescer = RequestCoalescer(driver)
+    results = [None] * 3
+
+    def send(i, data):
+      try:
+        results[i] = coalescer.request("MERGE", ["training_runs", "1"], data, {})
+      except ApiException as e:
+        results[i] = e
+
+    first = threading.Thread(target=send, args=(0, {"values": {"a": {"value": 1}}}))
+    first.start()
+    assert driver.started.wait(5)
+    others = [
+      threading.Thread(target=send, args=(1, {"values": {"invalid": {"value": "x"}}})),
+      threading.Thread(target=send, args=(2, {"values": {"b": {"value": 2}}})),
+    ]
+    for thread in others:
+      thread.start()
+    time.sleep(0.1)
+    driver.release.set()
+    for thread in [first, *others]:
+      thread.join()
+    assert [data for _, _, data in driver.requests] == [
+      {"values": {"a": {"value": 1}}},
+      {"values": {"invalid": {"value": "x"}, "b": {"value": 2}}},
+      {"values": {"invalid": {"value": "x"}}},
+      {"values": {"b": {"value": 2}}},
+    ]
+    assert results[0] == {"method": "MERGE", "count": 1}
+    assert results[1].status_code == 400
+    assert results[2] == {"method": "MERGE", "count": 4}
+
+  def test_merge_returns_when_its_own_update_is_sent(self):
+    class SlowSecondDriver(BlockingDriver):
+      def __init__(self):
+        super().__init__()
+        self.second_started = threading.Event()
+        self.release_second = threading.Event()
+
+      def request(self, method, path, data, headers):
+        response = super().request(method, path, data, headers)
+        if len(self.requests) == 2:
+          self.second_started.set()
+          self.release_second.wait(5)
+        return response
+
+    driver = SlowSecondDriver()
+    coalescer = RequestCoalescer(driver)
+    first_done = threading.Event()
+
+    def send_first():
+      coalescer.request("MERGE", ["training_runs", "1"], {"state": "active"}, {})
+      first_done.set()
+
+    first = threading.Thread(target=send_first)
+    first.start()
+    assert driver.started.wait(5)
+    second = threading.Thread(
+      target=coalescer.request,
+      args=("MERGE", ["training_runs", "1"], {"state": "completed"}, {}),
+    )
+    second.start()
+    time.sleep(0.1)
+    driver.release.set()
+    # the queued update is sent by its own caller, so the first caller does not wait for it
+    assert driver.second_started.wait(5)
+    assert first_done.wait(5)
+    driver.release_second.set()
+    for thread in [first, second]:
+      thread.join()
+    assert not coalescer.pending_merges
+
+  def test_get_after_a_write_is_not_shared_with_an_earlier_get(self):
+    driver = BlockingDriver()
+    coalescer = RequestCoalescer(driver)
+    first = threading.Thread(target=coalescer.request, args=("GET", ["training_runs", "1"], {}, {}))
+    first.start()
+    assert driver.started.wait(5)
+    # the GET in flight was sent before the update, so the GET that follows the update has to be sent again
+    coalescer.request("MERGE", ["training_runs", "1"], {"state": "completed"}, {})
+    coalescer.request("GET", ["training_runs", "1"], {}, {})
+    driver.release.set()
+    first.join()
+    assert [(method, path) for method, path, _ in driver.requests] == [
+      ("GET", ["training_runs", "1"]),
+      ("MERGE", ["training_runs", "1"]),
+      ("GET", ["training_runs", "1"]),
+    ]
+    assert not coalescer.in_flight_gets
+
+  def test_writes_only_invalidate_related_gets(self):
+    driver = BlockingDriver()
+    driver.release.set()
+    coalescer = RequestCoalescer(driver)
+    key = (("training_runs", "1"), "{}", "{}")
+    coalescer.in_flight_gets[key] = None
+    coalescer.request("MERGE", ["training_runs", "2"], {"state": "completed"}, {})
+    coalescer.request("POST", ["training_runs", "12", "checkpoints"], {}, {})
+    assert key in coalescer.in_flight_gets
+    coalescer.request("POST", ["training_runs", "1", "checkpoints"], {}, {})
+    assert key not in coalescer.in_flight_gets
+
+  def test_errors_are_not_shared_with_later_requests(self):
+    class FailingDriver(BlockingDriver):
+      def request(self, method, path, data, headers):
+        super().request(method, path, data, headers)
+        raise ApiException({"message": "unavailable"}, 503)
+
+    driver = FailingDriver()
+    coalescer = RequestCoalescer(driver)
+    driver.release.set()
+    for _ in range(2):
+      with pytest.raises(ApiException):
+        coalescer.request("GET", ["training_runs", "1"], {}, {})
+    assert len(driver.requests) == 2
+
+
+class TestRequestRateLimit(object):
+  def test_spaces_out_requests_after_the_burst(self):
+    rate_limit = RequestRateLimit(100, burst=2)
+    start = time.monotonic()
+    for _ in range(2):
+      rate_limit.acquire()
+    assert time.monotonic() - start < 0.01
+    for _ in range(3):
+      rate_limit.acquire()
+    assert time.monotonic() - start >= 0.025
@@ -0,0 +1,121 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import sqlite3
+import threading
+
+import pytest
+
+from sigopt.exception import ApiException
+from sigopt.interface import Connection
+from sigopt.run_context import RunContext
+from sigopt.sqlite_driver import LOCAL_CLIENT_ID
+
+
+class TestSQLiteDriver(object):
+  @pytest.fixture
+  def path(self, tmp_path):
+    return str(tmp_path / "sigopt.sqlite3")
+
+  @pytest.fixture
+  def connection(self, path):
+    return Connection(driver="sqlite", path=path)
+
+  @pytest.fixture
+  def project(self, connection):
+    return connection.clients(LOCAL_CLIENT_ID).projects().create(id="test-project", name="Test")
+
+  def create_run(self, connection, name="run"):
+    return connection.clients(LOCAL_CLIENT_ID).projects("test-project").training_runs().create(name=name)
+
+  def test_wal_mode(self, connection, project, path):
+    assert connection.tokens("self").fetch().client == LOCAL_CLIENT_ID
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+  def test_projects(self, connection, project):
+    assert project.id == "test-project"
+    assert connection.clients(LOCAL_CLIENT_ID).projects("test-project").fetch().name == "Test"
+    connection.clients(LOCAL_CLIENT_ID).projects("test-project").update(name="Renamed")
+    assert connection.clients(LOCAL_CLIENT_ID).projects("test-project").fetch().name == "Renamed"
+    with pytest.raises(ApiException) as conflict:
+      connection.clients(LOCAL_CLIENT_ID).projects().create(id="test-project")
+    assert conflict.value.status_code == 409
+    with pytest.raises(ApiException) as not_found:
+      connection.clients(LOCAL_CLIENT_ID).projects("other").fetch()
+    assert not_found.value.status_code == 404
+
+  def test_run_context(self, connection, project):
+    run = RunContext(connection, self.create_run(connection))
+    with run:
+      run.log_metric("accuracy", 0.9, stddev=0.1)
+      run.params.max_depth = 3
+      with run.batch_updates():
+        run.log_metadata("dataset", "iris")
+        run.log_metric("loss", 0.2)
+      run.log_checkpoint({"loss": 0.5})
+      run.log_checkpoint({"loss": 0.2})
+    training_run = connection.training_runs(run.id).fetch()
+    assert training_run.state == "completed"
+    assert training_run.finished
+    assert training_run.values["accuracy"].value_stddev == 0.1
+    assert training_run.values["loss"].value == 0.2
+    assert training_run.assignments["max_depth"] == 3
+    assert training_run.metadata["dataset"] == "iris"
+    assert training_run.checkpoint_count == 2
+    checkpoints = list(connection.training_runs(run.id).checkpoints().fetch().iterate_pages())
+    assert [checkpoint.values[0].value for checkpoint in checkpoints] == [0.2, 0.5]
+
+  def test_pagination(self, connection, project):
+    run_ids = [self.create_run(connection, name=str(i)).id for i in range(5)]
+    training_runs = connection.clients(LOCAL_CLIENT_ID).projects("test-project").training_runs()
+    page = training_runs.fetch(limit=2)
+    assert page.count == 5
+    assert [run.id for run in page.iterate_pages()] == run_ids[::-1]
+    assert [run.id for run in training_runs.fetch(limit=2, after=0).iterate_pages()] == run_ids
+    connection.training_runs(run_ids[0]).delete()
+    assert training_runs.fetch().count == 4
+    connection.training_runs(run_ids[0]).update(deleted=False)
+    assert training_runs.fetch().count == 5
+
+  def test_batch(self, connection, project):
+    runs = connection.clients(LOCAL_CLIENT_ID).projects("test-project").training_runs().create_batch(
+      runs=[{"name": "a"}, {"name": "b"}]
+    )
+    assert [run.name for run in runs.iterate_pages()] == ["a", "b"]
+
+  def test_concurrent_writers(self, path, connection, project):
+    run_id = self.create_run(connection).id
+
+    def log_checkpoints(writer_number):
+      # each writer has its own driver, like separate processes sharing the database
+      writer = Connection(driver="sqlite", path=path)
+      run = RunContext(writer, writer.training_runs(run_id).fetch())
+      for i in range(20):
+        run.log_checkpoint({"step": i})
+        run.log_metric(f"metric-{writer_number}", i)
+
+    threads = [threading.Thread(target=log_checkpoints, args=(writer_number,)) for writer_number in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    training_run = connection.training_runs(run_id).fetch()
+    assert training_run.checkpoint_count == 80
+    assert len(training_run.values) == 4
+
+  def test_files_are_skipped(self, connection, project, caplog):
+    run = RunContext(connection, self.create_run(connection))
+    with run:
+      run.log_artifact(b"weights", name="model")
+      run.log_artifact(b"more weights", name="model")
+      run.log_metric("accuracy", 0.9)
+    warnings = [record for record in caplog.records if "not logged" in record.getMessage()]
+    assert len(warnings) == 1
+    training_run = connection.training_runs(run.id).fetch()
+    assert training_run.values["accuracy"].value == 0.9
+    assert not training_run.files
+
+  def test_unsupported_request(self, connection):
+    with pytest.raises(ApiException) as unsupported:
+      connection.aiexperiments("1").fetch()
+    assert unsupported.value.status_code == 404
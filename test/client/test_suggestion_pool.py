@@ -0,0 +1,131 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import itertools
+import threading
+import time
+
+import mock
+import pytest
+
+import sigopt
+from sigopt.exception import ApiException
+from sigopt.objects import Suggestion
+from sigopt.suggestion_pool import SuggestionPool
+
+
+def wait_until(predicate, timeout=5):
+  deadline = time.monotonic() + timeout
+  while not predicate():
+    assert time.monotonic() < deadline
+    time.sleep(0.01)
+
+
+class TestSuggestionPool(object):
+  @pytest.fixture
+  def connection(self):
+    connection = mock.Mock()
+    connection.experiments.return_value.fetch.return_value.parallel_bandwidth = 3
+    ids = itertools.count(1)
+    suggestions = connection.experiments.return_value.suggestions.return_value
+    suggestions.create.side_effect = lambda **kwargs: Suggestion({"id": str(next(ids))})
+    return connection
+
+  def get_suggestions(self, connection):
+    return connection.experiments.return_value.suggestions.return_value
+
+  def get_deleted_ids(self, connection):
+    suggestions = connection.experiments.return_value.suggestions
+    return sorted(args[0] for args, _ in suggestions.call_args_list if args)
+
+  def test_handed_out_suggestions_keep_their_slot(self, connection):
+    create = self.get_suggestions(connection).create
+    with SuggestionPool(connection, "1") as pool:
+      assert (pool.size, pool.workers) == (2, 1)
+      wait_until(lambda: create.call_count == 2)
+      first = pool.get()
+      assert first.id == "1"
+      wait_until(lambda: create.call_count == 3)
+      second = pool.get()
+      time.sleep(0.05)
+      # two suggestions are handed out and one is ready, which is parallel_bandwidth
+      assert create.call_count == 3
+      observation = pool.report(first, values=[{"name": "accuracy", "value": 1}])
+      wait_until(lambda: create.call_count == 4)
+      pool.release(second)
+      time.sleep(0.05)
+      # size suggestions are ready, so freeing a slot does not prefetch more
+      assert create.call_count == 4
+    connection.experiments.assert_called_with("1")
+    observations = connection.experiments.return_value.observations.return_value
+    observations.create.assert_called_once_with(suggestion="1", values=[{"name": "accuracy", "value": 1}])
+    assert observation is observations.create.return_value
+
+  def test_default_size(self, connection):
+    with SuggestionPool(connection, "1", workers=2) as pool:
+      assert pool.size == 1
+    with SuggestionPool(connection, "1", workers=4) as pool:
+      assert pool.size == 1
+
+  def test_close_deletes_unused_suggestions(self, connection):
+    pool = SuggestionPool(connection, "1", size=2, create_params={"metadata": {"worker": "a"}})
+    assert pool.get(timeout=5).id == "1"
+    wait_until(lambda: self.get_suggestions(connection).create.call_count == 3)
+    pool.close()
+    assert self.get_deleted_ids(connection) == ["2", "3"]
+    assert self.get_suggestions(connection).delete.call_count == 2
+    self.get_suggestions(connection).create.assert_called_with(metadata={"worker": "a"})
+    with pytest.raises(ValueError):
+      pool.get()
+
+  def test_worker_threads(self, connection):
+    results = []
+    with SuggestionPool(connection, "1", workers=10) as pool:
+
+      def work():
+        suggestion = pool.get(timeout=5)
+        results.append(suggestion.id)
+        pool.report(suggestion, failed=True)
+
+      threads = [threading.Thread(target=work) for _ in range(10)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+    assert sorted(results, key=int) == [str(i) for i in range(1, 11)]
+    assert not set(results) & set(self.get_deleted_ids(connection))
+
+  def test_errors_are_raised_by_get(self, connection):
+    create = self.get_suggestions(connection).create
+    create.side_effect = [ApiException({"message": "bad"}, 400), Suggestion({"id": "1"}), Suggestion({"id": "2"})]
+    with SuggestionPool(connection, "1", size=1) as pool:
+      with pytest.raises(ApiException):
+        pool.get(timeout=5)
+      assert pool.get(timeout=5).id == "1"
+
+  def test_timeout(self, connection):
+    release = threading.Event()
+    self.get_suggestions(connection).create.side_effect = lambda **kwargs: release.wait(5) and Suggestion({"id": "1"})
+    pool = SuggestionPool(connection, "1", size=1)
+    with pytest.raises(TimeoutError):
+      pool.get(timeout=0.05)
+    release.set()
+    pool.close()
+
+  def test_close_deletes_every_unused_suggestion_before_raising(self, connection):
+    suggestions = connection.experiments.return_value.suggestions
+    suggestions.return_value.delete.side_effect = [ApiException({"message": "unavailable"}, 503), None, None]
+    pool = SuggestionPool(connection, "1", size=3)
+    wait_until(lambda: self.get_suggestions(connection).create.call_count == 3)
+    with pytest.raises(ApiException):
+      pool.close()
+    assert self.get_deleted_ids(connection) == ["1", "2", "3"]
+
+  def test_invalid_size(self, connection):
+    with pytest.raises(ValueError):
+      SuggestionPool(connection, "1", size=0)
+    with pytest.raises(ValueError):
+      SuggestionPool(connection, "1", workers=0)
+
+  def test_lazy_export(self):
+    assert sigopt.SuggestionPool is SuggestionPool
@@ -0,0 +1,178 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import threading
+import time
+
+import mock
+import pytest
+
+from sigopt.aiexperiment_context import PREFETCHED_RUN_STOPPING_REASON, AIExperimentContext
+from sigopt.objects import AIExperiment, TrainingRun
+from sigopt.pruning import STOPPING_REASON_KEY
+from sigopt.run_context import RunContext
+
+
+def record_process_trial(run_context):
+  if run_context.run.assignments["x"] == 2:
+    raise ValueError("failed trial")
+
+
+class TestAIExperimentContextLoop(object):
+  def make_experiment(self, progress_values, parallel_bandwidth=2):
+    # each refresh returns the next (remaining_budget, active_run_count) pair
+    connection = mock.Mock()
+    connection.aiexperiments().fetch.side_effect = [
+      AIExperiment(
+        {
+          "id": "1",
+          "parallel_bandwidth": parallel_bandwidth,
+          "progress": {"remaining_budget": remaining_budget, "active_run_count": active_run_count},
+        }
+      )
+      for remaining_budget, active_run_count in progress_values
+    ]
+    experiment = AIExperimentContext(AIExperiment({"id": "1"}), connection)
+    experiment.create_run = mock.Mock(side_effect=lambda name=None: mock.Mock(id=str(experiment.create_run.call_count)))
+    return experiment, connection
+
+  def test_loop(self):
+    experiment, _ = self.make_experiment([(2, 0), (1, 0), (0, 0)])
+    runs = list(experiment.loop())
+    assert [run.id for run in runs] == ["1", "2"]
+
+  def test_prefetching_loop(self):
+    experiment, connection = self.make_experiment([(3, 0), (3, 1), (2, 1), (1, 1), (0, 0)])
+    runs = list(experiment.loop(prefetch=True))
+    assert [run.id for run in runs] == ["1", "2", "3"]
+    connection.training_runs().update.assert_not_called()
+
+  def test_prefetching_loop_waits_for_budget(self):
+    # the last run of the budget is still active when the next run would be prefetched
+    experiment, _ = self.make_experiment([(2, 0), (2, 1), (1, 1), (0, 0)])
+    runs = list(experiment.loop(prefetch=True))
+    assert [run.id for run in runs] == ["1", "2"]
+    assert experiment.create_run.call_count == 2
+
+  def test_prefetching_loop_respects_parallel_bandwidth(self):
+    experiment, _ = self.make_experiment([(3, 0), (3, 1), (2, 0), (2, 1), (1, 0), (1, 1), (0, 0)], parallel_bandwidth=1)
+    runs = list(experiment.loop(prefetch=True))
+    assert [run.id for run in runs] == ["1", "2", "3"]
+
+  def test_prefetching_loop_cancels_unused_run(self):
+    experiment, connection = self.make_experiment([(3, 0), (3, 1)])
+    experiment.create_run.side_effect = lambda name=None: RunContext(
+      connection,
+      TrainingRun({"id": str(experiment.create_run.call_count), "assignments": {}}),
+    )
+    loop = experiment.loop(prefetch=True)
+    first_run = next(loop)
+    assert first_run.id == "1"
+    loop.close()
+    connection.impl.request.assert_called_once_with(
+      "MERGE",
+      ["training_runs", "2"],
+      {"state": "failed", "sys_metadata": {STOPPING_REASON_KEY: PREFETCHED_RUN_STOPPING_REASON}},
+      {"X-Response-Content": "skip"},
+    )
+    connection.training_runs.assert_called_with("2")
+    connection.training_runs().update.assert_called_once_with(deleted=True)
+    connection.training_runs().delete.assert_not_called()
+    # the run is ended before it is archived
+    call_names = [name for name, _, _ in connection.mock_calls]
+    assert call_names.index("impl.request") < call_names.index("training_runs().update")
+
+
+class TestAIExperimentContextOptimize(object):
+  def make_experiment(self, budget, parallel_bandwidth):
+    experiment = AIExperimentContext(AIExperiment({"id": "1", "parallel_bandwidth": parallel_bandwidth}), mock.Mock())
+    lock = threading.Lock()
+    created_runs = []
+
+    def refresh():
+      # the created runs never end in this test, so they stay active
+      with lock:
+        experiment._aiexperiment = AIExperiment(
+          {
+            "id": "1",
+            "parallel_bandwidth": parallel_bandwidth,
+            "progress": {"remaining_budget": budget, "active_run_count": len(created_runs)},
+          }
+        )
+
+    def create_run(name=None):
+      with lock:
+        run_context = mock.MagicMock(id=str(len(created_runs) + 1))
+        run_context.run.assignments = {"x": len(created_runs) + 1}
+        run_context.to_json.return_value = {"run": {"id": run_context.id, "assignments": run_context.run.assignments}}
+        run_context.__enter__.return_value = run_context
+        created_runs.append(run_context)
+        return run_context
+
+    experiment.refresh = mock.Mock(side_effect=refresh)
+    experiment.create_run = mock.Mock(side_effect=create_run)
+    return experiment, created_runs
+
+  def test_optimize_threads(self):
+    experiment, created_runs = self.make_experiment(budget=6, parallel_bandwidth=3)
+    barrier = threading.Barrier(3, timeout=5)
+    seen_threads = set()
+
+    def fn(run_context):
+      seen_threads.add(threading.get_ident())
+      if run_context.run.assignments["x"] <= 3:
+        barrier.wait()
+      if run_context.run.assignments["x"] == 5:
+        raise ValueError("failed trial")
+
+    failures = experiment.optimize(fn, workers=8)
+    assert len(created_runs) == 6
+    assert len(seen_threads) == 3
+    assert [(run_id, str(e)) for run_id, e in failures] == [(created_runs[4].id, "failed trial")]
+    for run_context in created_runs:
+      run_context.__exit__.assert_called_once()
+    assert isinstance(created_runs[4].__exit__.call_args[0][1], ValueError)
+
+  def test_optimize_stops_on_failure(self):
+    experiment, created_runs = self.make_experiment(budget=6, parallel_bandwidth=2)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fn(run_context):
+      barrier.wait()
+      if run_context.run.assignments["x"] == 1:
+        raise ValueError("failed trial")
+      # the other trial is still in progress when the first one fails, and it finishes
+      time.sleep(0.1)
+
+    failures = experiment.optimize(fn, workers=2, stop_on_failure=True)
+    assert len(created_runs) == 2
+    assert [(run_id, str(e)) for run_id, e in failures] == [("1", "failed trial")]
+    for run_context in created_runs:
+      run_context.__exit__.assert_called_once()
+
+  def test_optimize_does_not_exceed_budget(self):
+    experiment, created_runs = self.make_experiment(budget=4, parallel_bandwidth=4)
+    refresh = experiment.refresh.side_effect
+
+    def slow_refresh():
+      refresh()
+      # widen the window between the budget check and the creation of the run
+      time.sleep(0.01)
+
+    experiment.refresh.side_effect = slow_refresh
+    experiment.optimize(lambda run_context: None)
+    assert len(created_runs) == 4
+
+  def test_optimize_processes(self, monkeypatch):
+    monkeypatch.setenv("SIGOPT_API_TOKEN", "test-token")
+    experiment, created_runs = self.make_experiment(budget=3, parallel_bandwidth=2)
+    failures = experiment.optimize(record_process_trial, executor="process")
+    assert len(created_runs) == 3
+    assert [(run_id, str(e)) for run_id, e in failures] == [(created_runs[1].id, "failed trial")]
+
+  def test_optimize_bad_arguments(self):
+    experiment, _ = self.make_experiment(budget=1, parallel_bandwidth=1)
+    with pytest.raises(ValueError):
+      experiment.optimize(lambda run_context: None, executor="cluster")
+    with pytest.raises(ValueError):
+      experiment.optimize(lambda run_context: None, workers=0)
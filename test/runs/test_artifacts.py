@@ -0,0 +1,213 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import io
+
+import mock
+import pytest
+import requests
+
+from sigopt.artifacts import ArtifactIndex, ArtifactSource, get_artifact_hashes
+from sigopt.interface import Connection
+from sigopt.run_context import RunContext
+
+
+class TestArtifactSource(object):
+  def test_file_source_is_memory_mapped(self, tmp_path):
+    path = tmp_path / "weights.bin"
+    path.write_bytes(b"0123456789")
+    with ArtifactSource(str(path)) as source:
+      assert source.size == 10
+      assert source.filename == str(path)
+      assert source.read_range(3, 4) == b"3456"
+      assert b"".join(source.iter_chunks(chunk_size=3)) == b"0123456789"
+
+  def test_buffer_source(self):
+    with ArtifactSource(io.BytesIO(b"abcdef")) as source:
+      assert source.size == 6
+      assert source.read_range(4, 10) == b"ef"
+    with ArtifactSource(b"abcdef") as source:
+      assert source.size == 6
+      assert source.get_upload_body() == b"abcdef"
+
+  def test_empty_file(self, tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b"")
+    with ArtifactSource(str(path)) as source:
+      assert source.size == 0
+      assert list(source.iter_chunks()) == []
+
+
+class TestLogArtifact(object):
+  @pytest.fixture(autouse=True)
+  def sigopt_home(self, tmp_path, monkeypatch):
+    monkeypatch.setenv("SIGOPT_HOME", str(tmp_path / "home"))
+
+  @pytest.fixture
+  def run_context(self):
+    mock_driver = mock.Mock(api_url="https://test.sigopt.ninja")
+    return RunContext(
+      connection=Connection(driver=mock.Mock(return_value=mock_driver)),
+      run=mock.Mock(id="0", assignments={}, files=[]),
+    )
+
+  @pytest.fixture
+  def patch_requests(self):
+    with mock.patch("sigopt.artifacts.requests") as patch_requests:
+      patch_requests.request.return_value.headers = {"ETag": "etag"}
+      yield patch_requests
+
+  def upload_info(self, num_parts):
+    return {
+      "id": "1",
+      "upload": {
+        "parts": [
+          {"part_number": n, "method": "PUT", "url": f"https://test.sigopt.ninja/part/{n}", "headers": {}}
+          for n in range(1, num_parts + 1)
+        ],
+        "complete": {"method": "POST", "url": "https://test.sigopt.ninja/complete", "headers": {}},
+      },
+    }
+
+  def test_single_part_upload(self, run_context, patch_requests):
+    run_context.connection.impl.driver.request.return_value = {
+      "id": "1",
+      "upload": {"method": "PUT", "url": "https://test.sigopt.ninja/upload", "headers": {}},
+    }
+    run_context.log_artifact(b"test data", name="data")
+    run_context.connection.impl.driver.request.assert_called_once_with(
+      "POST",
+      ["training_runs", "0", "files"],
+      {
+        "content_length": 9,
+        "content_md5": "63M6AMDJ0zbmVpGjerVCkw==",
+        "content_type": "application/octet-stream",
+        "name": "data",
+        "filename": None,
+      },
+      None,
+    )
+    patch_requests.request.assert_called_once_with(
+      "PUT",
+      "https://test.sigopt.ninja/upload",
+      headers={},
+      data=b"test data",
+      timeout=mock.ANY,
+    )
+
+  def test_multipart_upload(self, run_context, patch_requests, tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_bytes(b"0123456789")
+    run_context.connection.impl.driver.request.return_value = self.upload_info(num_parts=3)
+    run_context.log_artifact(str(path), part_size=4)
+    file_request_params = run_context.connection.impl.driver.request.call_args[0][2]
+    assert file_request_params["part_size"] == 4
+    assert file_request_params["filename"] == "model.bin"
+    part_data = sorted(
+      kwargs["data"]
+      for args, kwargs in patch_requests.request.call_args_list
+      if args[1].startswith("https://test.sigopt.ninja/part")
+    )
+    assert part_data == [b"0123", b"4567", b"89"]
+    patch_requests.request.assert_called_with(
+      "POST",
+      "https://test.sigopt.ninja/complete",
+      headers={},
+      json={"parts": [{"part_number": n, "etag": "etag"} for n in (1, 2, 3)]},
+      timeout=mock.ANY,
+    )
+
+  def test_multipart_upload_resumes(self, run_context, patch_requests):
+    data = b"0123456789"
+    _, sha256 = get_artifact_hashes(ArtifactSource(data))
+    index = ArtifactIndex("https://test.sigopt.ninja")
+    index.put(
+      sha256,
+      {
+        "state": "in_progress",
+        "file_id": "1",
+        "part_size": 4,
+        "upload": self.upload_info(num_parts=3)["upload"],
+        "completed_parts": {"1": "etag", "2": "etag"},
+      },
+    )
+    run_context.log_artifact(data, part_size=4)
+    run_context.connection.impl.driver.request.assert_not_called()
+    part_urls = [c[0][1] for c in patch_requests.request.call_args_list]
+    assert part_urls == ["https://test.sigopt.ninja/part/3", "https://test.sigopt.ninja/complete"]
+    assert index.get(sha256)["state"] == "complete"
+
+  def test_identical_content_is_linked(self, run_context, patch_requests):
+    run_context.connection.impl.driver.request.return_value = {
+      "id": "1",
+      "upload": {"method": "PUT", "url": "https://test.sigopt.ninja/upload", "headers": {}},
+    }
+    run_context.log_artifact(b"checkpoint")
+    assert patch_requests.request.call_count == 1
+    run_context.connection.impl.driver.request.reset_mock()
+    run_context.connection.impl.driver.request.return_value = {"id": "0", "files": []}
+    run_context.log_artifact(io.BytesIO(b"checkpoint"))
+    assert patch_requests.request.call_count == 1
+    assert run_context.connection.impl.driver.request.call_args_list == [
+      mock.call("GET", ["training_runs", "0"], None, None),
+      mock.call("MERGE", ["training_runs", "0"], {"files": ["1"]}, {"X-Response-Content": "skip"}),
+    ]
+
+  def test_linking_appends_to_the_current_files_of_the_run(self, run_context, patch_requests):
+    run_context.connection.impl.driver.request.return_value = {
+      "id": "1",
+      "upload": {"method": "PUT", "url": "https://test.sigopt.ninja/upload", "headers": {}},
+    }
+    run_context.log_artifact(b"checkpoint")
+    # the image was uploaded after the run was fetched, so it is only known to the server
+    run_context.connection.impl.driver.request.reset_mock()
+    run_context.connection.impl.driver.request.return_value = {"id": "0", "files": ["2"]}
+    run_context.log_artifact(b"checkpoint")
+    run_context.connection.impl.driver.request.assert_called_with(
+      "MERGE",
+      ["training_runs", "0"],
+      {"files": ["2", "1"]},
+      {"X-Response-Content": "skip"},
+    )
+
+  def test_linking_a_file_of_the_run_is_skipped(self, run_context, patch_requests):
+    run_context.connection.impl.driver.request.return_value = {
+      "id": "1",
+      "upload": {"method": "PUT", "url": "https://test.sigopt.ninja/upload", "headers": {}},
+    }
+    run_context.log_artifact(b"checkpoint")
+    run_context.connection.impl.driver.request.reset_mock()
+    run_context.connection.impl.driver.request.return_value = {"id": "0", "files": ["1"]}
+    run_context.log_artifact(b"checkpoint")
+    run_context.connection.impl.driver.request.assert_called_once_with("GET", ["training_runs", "0"], None, None)
+
+  def test_artifact_is_uploaded_in_a_single_part_by_default(self, run_context, patch_requests, tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_bytes(b"0123456789")
+    run_context.connection.impl.driver.request.return_value = {
+      "id": "1",
+      "upload": {"method": "PUT", "url": "https://test.sigopt.ninja/upload", "headers": {}},
+    }
+    run_context.log_artifact(str(path))
+    assert "part_size" not in run_context.connection.impl.driver.request.call_args[0][2]
+    patch_requests.request.assert_called_once_with(
+      "PUT",
+      "https://test.sigopt.ninja/upload",
+      headers={},
+      data=mock.ANY,
+      timeout=mock.ANY,
+    )
+
+  @pytest.mark.parametrize("status_code,is_resumable", [(503, True), (403, False)])
+  def test_failed_upload_resume_entry(self, run_context, patch_requests, status_code, is_resumable):
+    patch_requests.exceptions = requests.exceptions
+    patch_requests.request.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError(
+      response=mock.Mock(status_code=status_code)
+    )
+    run_context.connection.impl.driver.request.return_value = self.upload_info(num_parts=3)
+    data = b"0123456789"
+    _, sha256 = get_artifact_hashes(ArtifactSource(data))
+    with mock.patch("sigopt.artifacts.PART_UPLOAD_MAX_TRIES", 1), pytest.raises(requests.exceptions.HTTPError):
+      run_context.log_artifact(data, part_size=4)
+    entry = ArtifactIndex("https://test.sigopt.ninja").get(sha256)
+    assert (entry is not None and entry["state"] == "in_progress") == is_resumable
@@ -24,3 +24,23 @@ class TestConfig(object):
 
     assert config.get_context_data(FakeConfigContext("a")) == "b"
     assert config.get_context_data(FakeConfigContext("none")) is None
+
+  def test_load_json_config_file(self, tmp_path):
+    context_file = tmp_path / "context.json"
+    context_file.write_text('{"a": "c", "file": "d"}')
+    with mock.patch.dict(os.environ, {"SIGOPT_CONTEXT": fake_context, "SIGOPT_CONTEXT_FILE": str(context_file)}):
+      config = Config()
+
+    assert config.get_context_data(FakeConfigContext("a")) == "b"
+    assert config.get_context_data(FakeConfigContext("file")) == "d"
+
+  def test_environment_context_file(self, tmp_path):
+    config = Config()
+    config.set_context_entry(mock.Mock(CONFIG_CONTEXT_KEY="run", to_json=lambda: {"id": "1"}))
+    with open(tmp_path / "context.json", "w") as context_file:
+      env = config.get_environment_context(context_file=context_file)
+
+    assert env == {"SIGOPT_CONTEXT_FILE": context_file.name}
+    with mock.patch.dict(os.environ, env):
+      child_config = Config()
+    assert child_config.get_environment_context_data(FakeConfigContext("run")) == {"id": "1"}
@@ -4,12 +4,14 @@
 from __future__ import print_function
 
 import io
+import threading
+import time
 
 import mock
 import pytest
 
 from sigopt.interface import Connection
-from sigopt.run_context import RunContext, allow_state_update
+from sigopt.run_context import GlobalRunContext, RunContext, allow_state_update
 
 
 @pytest.mark.parametrize(
@@ -245,3 +247,57 @@ class TestLiveRunContext(object):
         data=image_data,
         timeout=mock.ANY,
       )
+
+  def test_batch_updates(self, run_context):
+    with run_context.batch_updates():
+      run_context.params.p1 = 1
+      run_context.params.p2 = 2
+      run_context.log_metadata("m", "v")
+      with run_context.batch_updates():
+        run_context.log_metric("accuracy", 0.5)
+      run_context.params.pop("p2")
+      run_context.log_checkpoint({"accuracy": 0.5})
+      run_context.connection.impl.driver.request.assert_called_once_with(
+        "POST",
+        ["training_runs", "0", "checkpoints"],
+        {"values": [{"name": "accuracy", "value": 0.5}]},
+        {"X-Response-Content": "skip"},
+      )
+      run_context.connection.impl.driver.request.reset_mock()
+    self.assert_run_update_request_called(
+      run_context,
+      {
+        "assignments": {"p1": 1, "p2": None},
+        "metadata": {"m": "v"},
+        "values": {"accuracy": {"value": 0.5}},
+      },
+    )
+
+  def test_batch_updates_sent_on_error(self, run_context):
+    with pytest.raises(ValueError):
+      with run_context.batch_updates():
+        run_context.log_metadata("m", "v")
+        raise ValueError()
+    self.assert_run_update_request_called(run_context, {"metadata": {"m": "v"}})
+
+
+class TestGlobalRunContext(object):
+  def test_run_context_is_created_once(self):
+    config_ = mock.Mock()
+    config_.get_environment_context_data.return_value = {"run": {"id": "1"}}
+    global_run_context = GlobalRunContext.from_config(config_)
+
+    def from_json(data):
+      time.sleep(0.05)
+      return mock.Mock(id=data["run"]["id"])
+
+    run_contexts = []
+    with mock.patch.object(RunContext, "from_json", side_effect=from_json) as mock_from_json:
+      threads = [threading.Thread(target=lambda: run_contexts.append(global_run_context.run_context)) for _ in range(4)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+    mock_from_json.assert_called_once()
+    assert len({id(run_context) for run_context in run_contexts}) == 1
+    assert global_run_context.id == "1"
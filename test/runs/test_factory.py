@@ -75,3 +75,31 @@ class TestSigOptFactory(object):
         mock.call({"state": "failed"}),
       ]
     )
+
+
+class TestInheritedProject(object):
+  @pytest.fixture
+  def api_connection(self):
+    conn = mock.Mock()
+    with mock.patch("sigopt.factory.get_connection", return_value=conn):
+      yield conn
+
+  @pytest.fixture
+  def inherited_config(self):
+    with mock.patch("sigopt.factory.config") as config:
+      config.get_environment_context_data.return_value = {"client": "1", "project": "test-project"}
+      yield config
+
+  def test_reuses_project_resolved_by_parent(self, api_connection, inherited_config):
+    factory = SigOptFactory("test-project")
+    with mock.patch("sigopt.factory._ensure_project_exists") as ensure_project_exists:
+      assert factory.ensure_project_exists() == ("1", "test-project")
+    ensure_project_exists.assert_not_called()
+    api_connection.tokens.assert_not_called()
+    assert inherited_config.set_context_entry.call_args[0][0].to_json() == {"client": "1", "project": "test-project"}
+
+  def test_ignores_other_project(self, api_connection, inherited_config):
+    factory = SigOptFactory("other-project")
+    with mock.patch("sigopt.factory._ensure_project_exists", return_value="2") as ensure_project_exists:
+      assert factory.ensure_project_exists() == ("2", "other-project")
+    ensure_project_exists.assert_called_once()
@@ -0,0 +1,74 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import mock
+import pytest
+
+from sigopt.exception import ApiException
+from sigopt.factory import SigOptFactory
+from sigopt.lookup_cache import LookupCache, get_lookup_cache
+
+
+class TestLookupCache(object):
+  @pytest.fixture(autouse=True)
+  def sigopt_home(self, tmp_path, monkeypatch):
+    monkeypatch.setenv("SIGOPT_HOME", str(tmp_path))
+    monkeypatch.delenv("SIGOPT_LOOKUP_CACHE_TTL", raising=False)
+
+  def make_connection(self, token="token"):
+    connection = mock.Mock()
+    connection.impl.driver.api_url = "https://test.sigopt.ninja"
+    connection.impl.driver.auth.username = token
+    connection.tokens().fetch.return_value = mock.Mock(client="1")
+    connection.clients().projects().training_runs().create.return_value = mock.Mock(assignments={})
+    connection.tokens.reset_mock()
+    connection.clients.reset_mock()
+    return connection
+
+  def test_cache_entries(self):
+    cache = LookupCache("https://test.sigopt.ninja", "token", ttl=60)
+    assert cache.get_client_id() is None
+    cache.set_client_id("1")
+    assert cache.get_client_id() == "1"
+    assert not cache.has_project("1", "test-project")
+    cache.add_project("1", "test-project")
+    assert cache.has_project("1", "test-project")
+    cache.set_client_id("2")
+    assert not cache.has_project("1", "test-project")
+    cache.invalidate()
+    assert cache.get_client_id() is None
+
+  def test_expired_entries(self):
+    cache = LookupCache("https://test.sigopt.ninja", "token", ttl=-1)
+    cache.set_client_id("1")
+    cache.add_project("1", "test-project")
+    assert cache.get_client_id() is None
+    assert not cache.has_project("1", "test-project")
+
+  def test_cache_is_keyed_by_token(self):
+    get_lookup_cache(self.make_connection("token")).set_client_id("1")
+    assert get_lookup_cache(self.make_connection("token")).get_client_id() == "1"
+    assert get_lookup_cache(self.make_connection("other-token")).get_client_id() is None
+
+  def test_cache_disabled(self, monkeypatch):
+    monkeypatch.setenv("SIGOPT_LOOKUP_CACHE_TTL", "0")
+    assert get_lookup_cache(self.make_connection()) is None
+    assert get_lookup_cache(mock.Mock()) is None
+
+  def test_create_run_skips_lookups_when_cached(self):
+    SigOptFactory("test-project", connection=self.make_connection()).create_run()
+    connection = self.make_connection()
+    SigOptFactory("test-project", connection=connection).create_run()
+    connection.tokens.assert_not_called()
+    connection.clients().projects().fetch.assert_not_called()
+    connection.clients().projects().training_runs().create.assert_called_once()
+
+  def test_stale_cache_is_invalidated(self):
+    SigOptFactory("test-project", connection=self.make_connection()).create_run()
+    connection = self.make_connection()
+    create = connection.clients().projects().training_runs().create
+    create.side_effect = [ApiException({"message": "not found"}, 404), mock.Mock(assignments={})]
+    SigOptFactory("test-project", connection=connection).create_run()
+    assert create.call_count == 2
+    connection.tokens("self").fetch.assert_called_once()
+    connection.clients().projects().fetch.assert_called_once()
@@ -0,0 +1,142 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import mock
+import pytest
+
+from sigopt.aiexperiment_context import AIExperimentContext
+from sigopt.objects import Checkpoint, Metric, TrainingRun
+from sigopt.pruning import MedianStoppingRule, Pruner, SuccessiveHalvingRule
+from sigopt.run_context import RunContext
+
+
+COMPLETED_CURVES = [
+  [0.5, 0.6, 0.7, 0.8],
+  [0.4, 0.5, 0.6, 0.7],
+  [0.3, 0.4, 0.5, 0.6],
+]
+
+
+class TestPruningRules(object):
+  def test_median_stopping(self):
+    rule = MedianStoppingRule("accuracy", min_checkpoints=2)
+    assert rule.check([0.1], COMPLETED_CURVES) is None
+    assert rule.check([0.5, 0.6], COMPLETED_CURVES) is None
+    assert "median stopping" in rule.check([0.3, 0.3], COMPLETED_CURVES)
+    assert rule.check([0.3, 0.3], COMPLETED_CURVES[:2]) is None
+
+  def test_median_stopping_minimize(self):
+    rule = MedianStoppingRule("loss", objective="minimize")
+    assert rule.check([0.1], COMPLETED_CURVES) is None
+    assert rule.check([0.9], COMPLETED_CURVES) is not None
+
+  def test_successive_halving(self):
+    rule = SuccessiveHalvingRule("accuracy", reduction_factor=2)
+    assert [step for step in range(1, 10) if rule.is_rung(step)] == [1, 2, 4, 8]
+    assert rule.check([0.5], COMPLETED_CURVES) is None
+    assert rule.check([0.45], COMPLETED_CURVES) is None
+    assert "successive halving" in rule.check([0.35], COMPLETED_CURVES)
+    assert rule.check([0.45, 0.45, 0.45], COMPLETED_CURVES) is None
+
+  def test_invalid_rules(self):
+    with pytest.raises(ValueError):
+      MedianStoppingRule("accuracy", objective="best")
+    with pytest.raises(ValueError):
+      SuccessiveHalvingRule("accuracy", reduction_factor=1)
+
+
+class TestPruner(object):
+  @pytest.fixture
+  def connection(self):
+    connection = mock.Mock()
+    curves = {str(i): curve for i, curve in enumerate(COMPLETED_CURVES)}
+    curves["pending"] = [0.1, 0.1]
+
+    def training_runs(run_id):
+      checkpoints = [
+        Checkpoint(
+          {
+            "id": str(step + 1),
+            "created": step,
+            "values": [{"name": "accuracy", "value": value}, {"name": "loss", "value": 1}],
+          }
+        )
+        for step, value in reversed(list(enumerate(curves[run_id])))
+      ]
+      resource = mock.Mock()
+      resource.checkpoints().fetch().iterate_pages.return_value = checkpoints
+      return resource
+
+    connection.training_runs.side_effect = training_runs
+    return connection
+
+  @pytest.fixture
+  def aiexperiment(self):
+    runs = [TrainingRun({"id": str(i), "state": "completed"}) for i in range(len(COMPLETED_CURVES))]
+    runs.append(TrainingRun({"id": "pending", "state": "active"}))
+    aiexperiment = mock.Mock()
+    aiexperiment.get_runs.return_value = runs
+    return aiexperiment
+
+  def test_completed_curves_are_cached(self, connection, aiexperiment):
+    pruner = Pruner(connection, aiexperiment, MedianStoppingRule("accuracy"), refresh_interval=3600)
+    assert pruner.fetch_curve("0") == COMPLETED_CURVES[0]
+    connection.training_runs.reset_mock()
+    assert sorted(pruner.get_completed_curves()) == sorted(COMPLETED_CURVES)
+    assert sorted(pruner.get_completed_curves()) == sorted(COMPLETED_CURVES)
+    aiexperiment.get_runs.assert_called_once()
+    assert connection.training_runs.call_count == len(COMPLETED_CURVES)
+
+  def test_checkpoints_created_in_the_same_second_are_ordered_by_id(self, aiexperiment):
+    connection = mock.Mock()
+    connection.training_runs().checkpoints().fetch().iterate_pages.return_value = [
+      Checkpoint({"id": str(checkpoint_id), "created": 100, "values": [{"name": "accuracy", "value": value}]})
+      for checkpoint_id, value in [(10, 0.3), (9, 0.2), (11, 0.4), (2, 0.1)]
+    ]
+    pruner = Pruner(connection, aiexperiment, MedianStoppingRule("accuracy"))
+    assert pruner.fetch_curve("0") == [0.1, 0.2, 0.3, 0.4]
+
+  def test_check_run(self, connection, aiexperiment):
+    pruner = Pruner(connection, aiexperiment, MedianStoppingRule("accuracy"))
+    assert pruner.check_run("pending") is not None
+    assert pruner.check_run("0") is None
+
+  def test_run_context_should_stop(self, connection, aiexperiment):
+    pruner = Pruner(connection, aiexperiment, MedianStoppingRule("accuracy", min_checkpoints=2))
+    run_context = RunContext(mock.Mock(), mock.Mock(id="1", assignments={}))
+    assert not run_context.should_stop()
+    run_context.set_pruner(pruner)
+    run_context.log_checkpoint({"accuracy": 0.3})
+    assert not run_context.should_stop()
+    run_context.log_checkpoint({"accuracy": 0.3})
+    assert run_context.should_stop()
+    assert "median stopping" in run_context.stopping_reason
+    run_context.connection.impl.request.assert_called_with(
+      "MERGE",
+      ["training_runs", "1"],
+      {"sys_metadata": {"stopping_reason": run_context.stopping_reason}},
+      {"X-Response-Content": "skip"},
+    )
+
+
+class TestEnablePruning(object):
+  @pytest.fixture
+  def aiexperiment(self):
+    metrics = [
+      Metric({"name": "runtime", "strategy": "constraint", "objective": "minimize"}),
+      Metric({"name": "loss", "strategy": "optimize", "objective": "minimize"}),
+    ]
+    connection = mock.Mock()
+    connection.aiexperiments().training_runs().create.return_value = mock.Mock(id="1", assignments={})
+    return AIExperimentContext(mock.Mock(id="1", metrics=metrics), connection)
+
+  def test_defaults_to_optimized_metric(self, aiexperiment):
+    pruner = aiexperiment.enable_pruning(rule="successive_halving", reduction_factor=2)
+    assert isinstance(pruner.rule, SuccessiveHalvingRule)
+    assert pruner.metric == "loss"
+    assert pruner.rule.objective == "minimize"
+    assert aiexperiment.create_run()._pruner is pruner
+
+  def test_invalid_rule(self, aiexperiment):
+    with pytest.raises(ValueError):
+      aiexperiment.enable_pruning(rule="hyperband")
@@ -0,0 +1,125 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import os
+
+import numpy
+import pytest
+import xgboost
+from mock import Mock
+
+from sigopt.run_context import RunContext
+from sigopt.xgboost import run
+from sigopt.xgboost.checkpoint_callback import (
+  BOOSTER_CHECKPOINT_ROUNDS_ATTR,
+  load_booster_checkpoint,
+  save_booster_checkpoint,
+)
+
+
+class Preempted(Exception):
+  pass
+
+
+class PreemptAt(xgboost.callback.TrainingCallback):
+  def __init__(self, epoch):
+    self.epoch = epoch
+    super().__init__()
+
+  def before_iteration(self, model, epoch, evals_log):
+    if epoch == self.epoch:
+      raise Preempted()
+    return False
+
+
+def make_run(run_object=None):
+  run_context = RunContext(Mock(), Mock(id="1", assignments={}))
+  run_context.connection.training_runs.return_value.fetch.return_value = run_object
+  run_context.log_checkpoint = Mock()
+  return run_context
+
+
+class TestBoosterCheckpoint(object):
+  @pytest.fixture
+  def dtrain(self):
+    random_state = numpy.random.RandomState(0)
+    X = random_state.rand(200, 4)
+    return xgboost.DMatrix(X, label=(X[:, 0] > 0.5).astype(int))
+
+  def test_save_and_load(self, dtrain, tmp_path):
+    model = xgboost.train({}, dtrain, 4)
+    path = str(tmp_path / "model.ubj")
+    save_booster_checkpoint(model, path, 4)
+    save_booster_checkpoint(model, path, 4)
+    assert os.listdir(tmp_path) == ["model.ubj"]
+    assert model.attr(BOOSTER_CHECKPOINT_ROUNDS_ATTR) is None
+    loaded, num_boosted_rounds = load_booster_checkpoint(path)
+    assert num_boosted_rounds == 4
+    assert loaded.num_boosted_rounds() == 4
+    assert numpy.array_equal(loaded.predict(dtrain), model.predict(dtrain))
+
+  def test_run_option_validation(self, dtrain):
+    with pytest.raises(TypeError):
+      run({}, dtrain, run_options={"model_checkpoint_dir": 1})
+    with pytest.raises(ValueError):
+      run({}, dtrain, run_options={"model_checkpoint_period": 0})
+    with pytest.raises(TypeError):
+      run({}, dtrain, run_options={"keep_model_checkpoint": "yes"})
+
+  def test_resume_needs_a_run(self, dtrain, tmp_path):
+    with pytest.raises(ValueError, match="existing run"):
+      run({}, dtrain, run_options={"model_checkpoint_dir": str(tmp_path)}, resume=True)
+
+  def test_keep_model_checkpoint(self, dtrain, tmp_path):
+    run_options = {"model_checkpoint_dir": str(tmp_path), "model_checkpoint_period": 2}
+    run({}, dtrain, num_boost_round=4, run_options={**run_options, "run": make_run(), "keep_model_checkpoint": True})
+    loaded, num_boosted_rounds = load_booster_checkpoint(os.path.join(str(tmp_path), "run-1.ubj"))
+    assert num_boosted_rounds == loaded.num_boosted_rounds() == 4
+
+  def test_resume_after_preemption(self, dtrain, tmp_path):
+    params = {"objective": "binary:logistic"}
+    run_options = {"model_checkpoint_dir": str(tmp_path), "model_checkpoint_period": 3}
+    preempted_run = make_run()
+    preempted_run.log_sys_metadata = Mock()
+    with pytest.raises(Preempted):
+      run(
+        params,
+        dtrain,
+        num_boost_round=6,
+        evals=[(dtrain, "test")],
+        verbose_eval=1,
+        callbacks=[PreemptAt(4)],
+        run_options={**run_options, "run": preempted_run},
+      )
+    path = os.path.join(str(tmp_path), "run-1.ubj")
+    preempted_run.log_sys_metadata.assert_called_once_with("booster_checkpoint", {"path": path})
+    assert preempted_run.log_checkpoint.call_count == 4
+
+    resumed_run = make_run(Mock(sys_metadata={"booster_checkpoint": {"path": path}}, checkpoint_count=4))
+    xgb_run = run(
+      params,
+      dtrain,
+      num_boost_round=6,
+      evals=[(dtrain, "test")],
+      verbose_eval=1,
+      run_options={**run_options, "run": resumed_run, "autolog_feature_importances": False},
+      resume=True,
+    )
+    assert xgb_run.model.num_boosted_rounds() == 6
+    # the checkpoints of the rounds that were logged before the preemption are not logged again
+    assert resumed_run.log_checkpoint.call_count == 2
+    expected = xgboost.train(params, dtrain, 6)
+    assert numpy.allclose(xgb_run.model.predict(dtrain), expected.predict(dtrain))
+    # the saved booster is removed once the training has succeeded
+    assert not os.path.exists(path)
+
+  def test_resume_without_checkpoint(self, dtrain, tmp_path):
+    run_context = make_run(Mock(sys_metadata=None, checkpoint_count=0))
+    xgb_run = run(
+      {},
+      dtrain,
+      num_boost_round=3,
+      run_options={"model_checkpoint_dir": str(tmp_path), "run": run_context},
+      resume=True,
+    )
+    assert xgb_run.model.num_boosted_rounds() == 3
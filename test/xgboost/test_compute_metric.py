@@ -2,14 +2,33 @@
 #
 # SPDX-License-Identifier: MIT
 import numpy
-from sklearn.metrics import accuracy_score, classification_report, mean_absolute_error, mean_squared_error
+import pytest
+import xgboost
+from sklearn.metrics import (
+  accuracy_score,
+  classification_report,
+  confusion_matrix,
+  log_loss,
+  mean_absolute_error,
+  mean_squared_error,
+  precision_recall_fscore_support,
+  roc_auc_score,
+)
 
 from sigopt.xgboost.compute_metrics import (
+  ClassificationMetricsAccumulator,
+  RegressionMetricsAccumulator,
   compute_accuracy,
+  compute_auc,
+  compute_classification_metrics,
   compute_classification_report,
+  compute_confusion_matrix,
+  compute_log_loss,
   compute_mae,
   compute_mse,
   compute_positives_and_negatives,
+  compute_regression_metrics,
+  get_predict_kwargs,
 )
 
 
@@ -118,3 +137,127 @@ class TestComputeMetrics(object):
 
     assert numpy.isclose(compute_mae(y_true, y_pred), mean_absolute_error(y_true, y_pred))
     assert numpy.isclose(compute_mse(y_true, y_pred), mean_squared_error(y_true, y_pred))
+
+  def test_confusion_matrix(self):
+    y_true = numpy.array([2, 2, 0, 0, 5, 5, 5])
+    y_pred = numpy.array([2, 0, 0, 0, 5, 2, 7])
+    classes, matrix = compute_confusion_matrix(y_true, y_pred)
+    assert classes.tolist() == [0, 2, 5, 7]
+    assert numpy.array_equal(matrix, confusion_matrix(y_true, y_pred))
+    classes, matrix = compute_confusion_matrix(y_true.astype(float) - 3, y_pred.astype(float) - 3)
+    assert classes.tolist() == [-3, -1, 2, 4]
+    assert numpy.array_equal(matrix, confusion_matrix(y_true, y_pred))
+
+  def test_classification_averages_against_sklearn(self):
+    n_samples = 200
+    y_true = numpy.random.randint(5, size=n_samples).astype(float)
+    y_pred = numpy.random.randint(6, size=n_samples).astype(float)
+    report_compute = compute_classification_report(y_true, y_pred)
+    report_sklearn = classification_report(y_true, y_pred, output_dict=True, zero_division=0)
+    assert numpy.isclose(report_compute["accuracy"], report_sklearn["accuracy"])
+    for key in ("precision", "recall", "f1-score"):
+      assert numpy.isclose(report_compute["macro avg"][key], report_sklearn["macro avg"][key])
+      assert numpy.isclose(report_compute["weighted avg"][key], report_sklearn["weighted avg"][key])
+    micro = precision_recall_fscore_support(y_true, y_pred, average="micro")
+    assert numpy.allclose(
+      [report_compute["micro avg"][key] for key in ("precision", "recall", "f1-score")],
+      micro[:3],
+    )
+    assert "1.0" in report_compute
+
+  def test_probability_metrics_against_sklearn(self):
+    n_samples = 100
+    y_true = numpy.random.randint(2, size=n_samples)
+    y_prob = numpy.random.rand(n_samples)
+    y_prob[:10] = 0.5
+    assert numpy.isclose(compute_auc(y_true, y_prob), roc_auc_score(y_true, y_prob))
+    assert numpy.isclose(compute_log_loss(y_true, y_prob), log_loss(y_true, y_prob))
+
+    y_true = numpy.random.randint(3, size=n_samples)
+    y_prob = numpy.random.dirichlet(numpy.ones(3), size=n_samples)
+    assert numpy.isclose(compute_auc(y_true, y_prob), roc_auc_score(y_true, y_prob, multi_class="ovr"))
+    assert numpy.isclose(compute_log_loss(y_true, y_prob), log_loss(y_true, y_prob))
+    assert compute_auc(numpy.zeros(n_samples), numpy.random.rand(n_samples)) is None
+
+
+class TestChunkedMetrics(object):
+  @pytest.fixture
+  def data(self):
+    random_state = numpy.random.RandomState(0)
+    X = random_state.rand(1000, 4)
+    y = (X[:, 0] + 0.3 * random_state.rand(1000) > 0.6).astype(int)
+    return xgboost.DMatrix(X, label=y)
+
+  def test_chunked_classification_matches_full(self, data):
+    model = xgboost.train({"objective": "binary:logistic"}, data, 5)
+    full = compute_classification_metrics(model, (data, "test"))
+    chunked = compute_classification_metrics(model, (data, "test"), probabilities=True, chunk_size=128)
+    for name, value in full.items():
+      assert numpy.isclose(chunked[name], value)
+    probs = model.predict(data)
+    assert numpy.isclose(chunked["test-log loss"], log_loss(data.get_label(), probs))
+    assert numpy.isclose(chunked["test-AUC"], roc_auc_score(data.get_label(), probs), atol=1e-3)
+
+  def test_chunked_multiclass_matches_full(self, data):
+    data.set_label(numpy.arange(data.num_row()) % 3)
+    model = xgboost.train({"objective": "multi:softprob", "num_class": 3}, data, 3)
+    full = compute_classification_metrics(model, (data, "test"))
+    chunked = compute_classification_metrics(model, (data, "test"), chunk_size=100)
+    assert full.keys() == chunked.keys()
+    for name, value in full.items():
+      # the chunked AUC is estimated from histograms, the AUC of a single chunk is exact
+      assert numpy.isclose(chunked[name], value, atol=1e-3 if name == "test-AUC" else 0)
+    probs = model.predict(data)
+    assert numpy.isclose(full["test-AUC"], roc_auc_score(data.get_label(), probs, multi_class="ovr"))
+
+  def test_auc_is_exact_unless_streamed(self):
+    random_state = numpy.random.RandomState(0)
+    y_true = random_state.randint(2, size=2000)
+    # scores close to 0, which a histogram that is linear in the score puts into a single bin
+    y_prob = 1 / (1 + numpy.exp(15 - y_true - random_state.normal(scale=2, size=2000)))
+    expected = roc_auc_score(y_true, y_prob)
+    single = ClassificationMetricsAccumulator(probabilities=True)
+    single.update(y_true, y_prob)
+    assert numpy.isclose(single.get_auc(), expected, rtol=1e-12)
+    sampled = ClassificationMetricsAccumulator(probabilities=True, exact_auc=True)
+    streamed = ClassificationMetricsAccumulator(probabilities=True)
+    for start in range(0, 2000, 300):
+      sampled.update(y_true[start : start + 300], y_prob[start : start + 300])
+      streamed.update(y_true[start : start + 300], y_prob[start : start + 300])
+    assert numpy.isclose(sampled.get_auc(), expected, rtol=1e-12)
+    assert not streamed.scores
+    assert numpy.isclose(streamed.get_auc(), expected, atol=1e-3)
+
+  def test_chunked_regression_matches_full(self, data):
+    model = xgboost.train({"objective": "reg:squarederror"}, data, 5)
+    full = compute_regression_metrics(model, (data, "test"))
+    chunked = compute_regression_metrics(model, (data, "test"), chunk_size=77)
+    for name, value in full.items():
+      assert numpy.isclose(chunked[name], value)
+    sampled = compute_regression_metrics(model, (data, "test"), sample_size=100)
+    assert sampled.keys() == full.keys()
+
+  def test_in_memory_data_is_scored_whole_by_default(self, data):
+    model = xgboost.train({"objective": "binary:logistic"}, data, 5)
+    metrics = compute_classification_metrics(model, (data, "test"), probabilities=True)
+    assert numpy.isclose(metrics["test-AUC"], roc_auc_score(data.get_label(), model.predict(data)), rtol=1e-12)
+
+  def test_empty_validation_set(self, data):
+    empty = data.slice([])
+    model = xgboost.train({"objective": "binary:logistic"}, data, 2)
+    assert compute_classification_metrics(model, (empty, "test")) == {}
+    assert compute_classification_metrics(model, (empty, "test"), chunk_size=10) == {}
+    model = xgboost.train({"objective": "reg:squarederror"}, data, 2)
+    assert compute_regression_metrics(model, (empty, "test")) == {}
+
+  def test_empty_accumulators(self):
+    assert ClassificationMetricsAccumulator(probabilities=True).get_metrics() == {}
+    assert RegressionMetricsAccumulator().get_metrics() == {}
+
+  def test_scores_best_iteration(self, data):
+    model = xgboost.train({"objective": "binary:logistic"}, data, 10)
+    model.set_attr(best_iteration="2")
+    assert get_predict_kwargs(model) == {"iteration_range": (0, 3)}
+    metrics = compute_classification_metrics(model, (data, "test"), probabilities=True)
+    probs = model.predict(data, iteration_range=(0, 3))
+    assert numpy.isclose(metrics["test-log loss"], log_loss(data.get_label(), probs))
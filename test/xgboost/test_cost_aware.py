@@ -0,0 +1,121 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import sys
+
+import numpy
+import pytest
+import xgboost
+from mock import MagicMock, Mock, patch
+
+from sigopt.run_context import RunContext
+from sigopt.xgboost import run
+from sigopt.xgboost.constants import COST_MAX_BIN_GRID, TRAINING_CPU_TIME_METRIC, TRAINING_TIME_METRIC
+from sigopt.xgboost.experiment import XGBExperiment
+from sigopt.xgboost.run import parse_run_options
+
+
+EXPERIMENT_CONFIG = dict(
+  parameters=[dict(name="eta", type="double", bounds={"min": 0.01, "max": 1})],
+  metrics=[dict(name="accuracy", strategy="optimize", objective="maximize")],
+)
+
+
+def make_experiment(params=None, run_options=None, **kwargs):
+  return XGBExperiment(
+    EXPERIMENT_CONFIG,
+    Mock(),
+    Mock(),
+    {"objective": "binary:logistic", **(params or {})},
+    10,
+    None,
+    parse_run_options(run_options),
+    **kwargs,
+  )
+
+
+def parse_experiment_config(xgb_experiment):
+  experiment_module = sys.modules["sigopt.xgboost.experiment"]
+  with patch.object(experiment_module, "get_available_cpu_count", return_value=8), patch.object(
+    experiment_module, "create_aiexperiment"
+  ) as create_aiexperiment:
+    xgb_experiment.parse_and_create_aiexperiment()
+  return create_aiexperiment.call_args[1]
+
+
+class TestCostAware(object):
+  def test_constraint(self):
+    config = parse_experiment_config(make_experiment(cost_aware="constraint", cost_threshold=30))
+    assert config["metrics"] == [
+      dict(name="TestSet-accuracy", strategy="optimize", objective="maximize"),
+      dict(name=TRAINING_TIME_METRIC, strategy="constraint", objective="minimize", threshold=30),
+    ]
+    parameters = {parameter["name"]: parameter for parameter in config["parameters"]}
+    assert parameters.keys() == {"eta", "tree_method", "max_bin", "nthread"}
+    assert parameters["max_bin"]["grid"] == COST_MAX_BIN_GRID
+    assert parameters["nthread"]["bounds"] == {"min": 1, "max": 8}
+
+  def test_objective(self):
+    xgb_experiment = make_experiment(
+      params={"max_bin": 64},
+      n_workers=4,
+      cost_aware="objective",
+    )
+    config = parse_experiment_config(xgb_experiment)
+    assert config["metrics"][1] == dict(name=TRAINING_TIME_METRIC, strategy="optimize", objective="minimize")
+    parameters = {parameter["name"]: parameter for parameter in config["parameters"]}
+    assert parameters.keys() == {"eta", "tree_method", "nthread"}
+    assert parameters["nthread"]["bounds"] == {"min": 1, "max": 2}
+
+  @pytest.mark.parametrize(
+    "kwargs",
+    [
+      dict(cost_aware="fastest"),
+      dict(cost_aware="objective", cost_metric="Wall time"),
+      dict(cost_aware="constraint"),
+      dict(cost_aware="constraint", cost_threshold=-1),
+      dict(cost_aware="objective", successive_halving=True),
+      dict(cost_aware="objective", cost_metric=TRAINING_CPU_TIME_METRIC, n_workers=2),
+    ],
+  )
+  def test_invalid_options(self, kwargs):
+    with pytest.raises(ValueError):
+      make_experiment(**kwargs)
+
+  def test_needs_autolog_metrics(self):
+    xgb_experiment = make_experiment(run_options={"autolog_metrics": False}, cost_aware="objective")
+    with pytest.raises(ValueError):
+      parse_experiment_config(xgb_experiment)
+
+  @pytest.mark.parametrize("autolog_cpu_time", [False, True])
+  def test_cpu_time_is_logged_on_request(self, autolog_cpu_time):
+    X = numpy.random.RandomState(0).rand(50, 2)
+    run_context = RunContext(Mock(), Mock(id="1", assignments={}))
+    run_context.log_metric = Mock()
+    run(
+      {},
+      xgboost.DMatrix(X, label=X[:, 0]),
+      num_boost_round=2,
+      run_options={"run": run_context, "autolog_cpu_time": autolog_cpu_time, "autolog_feature_importances": False},
+    )
+    logged_metrics = {args[0] for args, _ in run_context.log_metric.call_args_list}
+    assert TRAINING_TIME_METRIC in logged_metrics
+    assert (TRAINING_CPU_TIME_METRIC in logged_metrics) == autolog_cpu_time
+
+  @pytest.mark.parametrize(
+    "kwargs,autolog_cpu_time",
+    [
+      (dict(cost_aware="objective", cost_metric=TRAINING_CPU_TIME_METRIC), True),
+      (dict(cost_aware="objective"), False),
+      (dict(), False),
+    ],
+  )
+  def test_experiment_logs_cpu_time_for_its_cost_metric(self, kwargs, autolog_cpu_time):
+    xgb_experiment = make_experiment(**kwargs)
+    xgb_experiment.experiment_config_parsed["parallel_bandwidth"] = 1
+    xgb_experiment.sigopt_experiment = Mock()
+    xgb_experiment.sigopt_experiment.loop.return_value = [MagicMock(params={})]
+    experiment_module = sys.modules["sigopt.xgboost.experiment"]
+    with patch.object(experiment_module, "XGBRunWrapper") as xgb_run:
+      xgb_experiment.run_experiment()
+    assert xgb_run.call_args[1]["run_options"]["autolog_cpu_time"] == autolog_cpu_time
@@ -0,0 +1,106 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import sys
+
+import numpy
+import pytest
+import xgboost
+from mock import Mock, patch
+
+from sigopt.run_context import RunContext
+from sigopt.xgboost import cv
+from sigopt.xgboost.cv import make_folds
+from sigopt.xgboost.utils import get_booster_params
+
+
+def make_run():
+  run = RunContext(Mock(), Mock(assignments={}))
+  run.log_metric = Mock()
+  run.log_checkpoint = Mock()
+  return run
+
+
+class TestCV(object):
+  @pytest.fixture
+  def dtrain(self):
+    random_state = numpy.random.RandomState(0)
+    X = random_state.rand(300, 4)
+    return xgboost.DMatrix(X, label=(X[:, 0] + 0.2 * random_state.rand(300) > 0.6).astype(int))
+
+  @pytest.mark.parametrize("stratified", [False, True])
+  def test_make_folds(self, dtrain, stratified):
+    folds = make_folds(dtrain, 4, stratified=stratified)
+    assert len(folds) == 4
+    test_indexes = numpy.concatenate([test_index for _, test_index in folds])
+    assert sorted(test_indexes.tolist()) == list(range(300))
+    for train_index, test_index in folds:
+      assert not numpy.intersect1d(train_index, test_index).size
+      assert len(train_index) + len(test_index) == 300
+    if stratified:
+      labels = dtrain.get_label()
+      positives = [labels[test_index].sum() for _, test_index in folds]
+      assert max(positives) - min(positives) <= 1
+
+  def test_make_folds_from_splitter(self, dtrain):
+    model_selection = pytest.importorskip("sklearn.model_selection")
+    folds = make_folds(dtrain, None, folds=model_selection.KFold(n_splits=5))
+    assert [len(test_index) for _, test_index in folds] == [60] * 5
+
+  def test_invalid_nfold(self, dtrain):
+    with pytest.raises(ValueError):
+      make_folds(dtrain, 1)
+
+  def test_cv_matches_xgboost(self, dtrain):
+    params = {"objective": "binary:logistic", "max_depth": 2}
+    run = make_run()
+    cv_run = cv(params, dtrain, num_boost_round=6, nfold=3, metrics=["logloss"], run_options={"run": run})
+    expected = xgboost.cv(
+      {**params, "eval_metric": ["logloss"]},
+      dtrain,
+      num_boost_round=6,
+      folds=make_folds(dtrain, 3),
+      as_pandas=False,
+    )
+    assert len(cv_run.model) == 3
+    for name in ("train-logloss-mean", "train-logloss-std"):
+      assert numpy.allclose(cv_run.cv_results[name], expected[name])
+    assert numpy.allclose(cv_run.cv_results["TestSet-logloss-mean"], expected["test-logloss-mean"])
+
+    logged = {call[0][0]: call for call in run.log_metric.call_args_list}
+    (_, mean), kwargs = logged["TestSet-logloss"]
+    assert numpy.isclose(mean, expected["test-logloss-mean"][-1])
+    assert numpy.isclose(kwargs["stddev"], expected["test-logloss-std"][-1])
+    assert "stddev" in logged["TestSet-accuracy"][1]
+
+    checkpoints = [call[0][0] for call in run.log_checkpoint.call_args_list]
+    assert len(checkpoints) == 2
+    assert set(checkpoints[-1]) == {
+      "TestSet-logloss-mean",
+      "TestSet-logloss-fold0",
+      "TestSet-logloss-fold1",
+      "TestSet-logloss-fold2",
+    }
+
+  def test_cv_early_stopping(self, dtrain):
+    run = make_run()
+    cv_run = cv(
+      {"objective": "binary:logistic", "eta": 1},
+      dtrain,
+      num_boost_round=50,
+      early_stopping_rounds=2,
+      n_workers=2,
+      run_options={"run": run, "autolog_checkpoints": False},
+    )
+    best_iterations = [int(model.attr("best_iteration")) for model in cv_run.model]
+    assert len(cv_run.cv_results["TestSet-logloss-mean"]) == max(best_iterations) + 3
+    logged = {call[0][0]: call for call in run.log_metric.call_args_list}
+    (_, mean), kwargs = logged["num_boost_round_before_stopping"]
+    assert mean == numpy.mean(best_iterations) + 1
+    assert "stddev" in kwargs
+    run.log_checkpoint.assert_not_called()
+
+  def test_cv_splits_cores(self, dtrain):
+    with patch.object(sys.modules["sigopt.xgboost.cv"], "get_available_cpu_count", return_value=8):
+      cv_run = cv({"objective": "binary:logistic"}, dtrain, num_boost_round=2, nfold=4, run_options={"run": make_run()})
+    assert [get_booster_params(model)["nthread"] for model in cv_run.model] == [2] * 4
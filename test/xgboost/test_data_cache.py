@@ -0,0 +1,86 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import threading
+import time
+
+import numpy
+import pytest
+import xgboost
+from mock import Mock, patch
+
+from sigopt.xgboost.data_cache import QuantileDMatrixCache
+
+
+class TestQuantileDMatrixCache(object):
+  @pytest.fixture
+  def dtrain(self):
+    random_state = numpy.random.RandomState(0)
+    X = random_state.rand(300, 4)
+    X[X < 0.1] = numpy.nan
+    return xgboost.DMatrix(X, label=(numpy.nan_to_num(X[:, 0]) > 0.5).astype(int))
+
+  def test_cached_by_binning_params(self, dtrain):
+    cache = QuantileDMatrixCache(dtrain)
+    quantized = cache.get({"max_bin": 32, "eta": 0.1})
+    assert isinstance(quantized, xgboost.QuantileDMatrix)
+    assert cache.get({"max_bin": 32, "eta": 0.3}) is quantized
+    assert cache.get({"max_bin": 64}) is not quantized
+    assert cache.get({}) is cache.get({"max_bin": 256})
+    assert quantized.num_row() == dtrain.num_row()
+    assert numpy.array_equal(quantized.get_label(), dtrain.get_label())
+
+  def test_same_model_as_dmatrix(self, dtrain):
+    cache = QuantileDMatrixCache(dtrain)
+    params = {"objective": "binary:logistic", "max_bin": 32}
+    expected = xgboost.train(params, dtrain, 5).predict(dtrain)
+    assert numpy.allclose(xgboost.train(params, cache.get(params), 5).predict(dtrain), expected)
+
+  def test_unsupported(self, dtrain):
+    cache = QuantileDMatrixCache(dtrain)
+    assert cache.get({"tree_method": "exact"}) is dtrain
+    assert cache.get({"device": "cuda"}) is dtrain
+    dtrain.set_group([100, 200])
+    assert QuantileDMatrixCache(dtrain).get({}) is dtrain
+    mock_dtrain = Mock()
+    assert QuantileDMatrixCache(mock_dtrain).get({}) is mock_dtrain
+
+  def test_least_recently_used_is_dropped(self, dtrain):
+    cache = QuantileDMatrixCache(dtrain, max_entries=2)
+    quantized_32 = cache.get({"max_bin": 32})
+    quantized_64 = cache.get({"max_bin": 64})
+    assert cache.get({"max_bin": 32}) is quantized_32
+    cache.get({"max_bin": 128})
+    assert cache.get({"max_bin": 32}) is quantized_32
+    assert cache.get({"max_bin": 64}) is not quantized_64
+    with pytest.raises(ValueError):
+      QuantileDMatrixCache(dtrain, max_entries=0)
+
+  def test_builds_of_different_keys_do_not_wait(self, dtrain):
+    cache = QuantileDMatrixCache(dtrain)
+    build = cache._build
+    slow_build_started = threading.Event()
+    release_slow_build = threading.Event()
+    builds = []
+
+    def blocking_build(key):
+      builds.append(key)
+      if key == (32,):
+        slow_build_started.set()
+        release_slow_build.wait(5)
+      return build(key)
+
+    results = []
+    with patch.object(cache, "_build", side_effect=blocking_build):
+      threads = [threading.Thread(target=lambda: results.append(cache.get({"max_bin": 32}))) for _ in range(2)]
+      for thread in threads:
+        thread.start()
+      assert slow_build_started.wait(5)
+      start = time.monotonic()
+      assert isinstance(cache.get({"max_bin": 64}), xgboost.QuantileDMatrix)
+      assert time.monotonic() - start < 5
+      release_slow_build.set()
+      for thread in threads:
+        thread.join()
+    assert results[0] is results[1]
+    assert sorted(builds) == [(32,), (64,)]
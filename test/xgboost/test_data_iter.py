@@ -0,0 +1,105 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import gc
+import os
+
+import numpy
+import pytest
+import xgboost
+from mock import Mock
+
+from sigopt.run_context import RunContext
+from sigopt.xgboost import run
+from sigopt.xgboost.compute_metrics import compute_classification_metrics
+from sigopt.xgboost.data_iter import IterDMatrix, NumpyShardIter, ParquetShardIter, iterate_batches
+
+
+def write_shards(directory, name, num_shards, rows_per_shard=100):
+  shards = []
+  for i in range(num_shards):
+    random_state = numpy.random.RandomState(hash((name, i)) % (2**32))
+    X = random_state.rand(rows_per_shard, 3)
+    y = (X[:, 0] > 0.5).astype(int)
+    features_path, label_path = directory / f"{name}-{i}-X.npy", directory / f"{name}-{i}-y.npy"
+    numpy.save(features_path, X)
+    numpy.save(label_path, y)
+    shards.append((str(features_path), str(label_path)))
+  return shards
+
+
+class TestDataIter(object):
+  @pytest.fixture
+  def train_shards(self, tmp_path):
+    return write_shards(tmp_path, "train", 3)
+
+  @pytest.fixture
+  def test_shards(self, tmp_path):
+    return write_shards(tmp_path, "test", 2)
+
+  def test_numpy_shards(self, train_shards):
+    data_iter = NumpyShardIter(train_shards)
+    batches = list(iterate_batches(data_iter))
+    assert [batch.num_row() for batch in batches] == [100, 100, 100]
+    dtrain = IterDMatrix(data_iter)
+    assert (dtrain.num_row(), dtrain.num_col()) == (300, 3)
+    assert numpy.array_equal(dtrain.get_label(), numpy.concatenate([batch.get_label() for batch in batches]))
+
+  def test_pages_are_cached_in_a_temporary_directory(self, train_shards, tmp_path):
+    data_iter = NumpyShardIter(train_shards)
+    cache_dir = os.path.dirname(data_iter.cache_prefix)
+    assert os.path.basename(cache_dir).startswith("sigopt-xgboost-")
+    dtrain = IterDMatrix(data_iter)
+    assert dtrain.num_row() == 300
+    assert os.listdir(cache_dir)
+    del data_iter, dtrain
+    gc.collect()
+    assert not os.path.exists(cache_dir)
+    cache_prefix = str(tmp_path / "cache")
+    assert NumpyShardIter(train_shards, cache_prefix=cache_prefix).cache_prefix == cache_prefix
+
+  def test_metrics_stream_over_batches(self, test_shards):
+    dtest = IterDMatrix(NumpyShardIter(test_shards))
+    in_memory = xgboost.DMatrix(
+      numpy.concatenate([numpy.load(X) for X, _ in test_shards]),
+      label=numpy.concatenate([numpy.load(y) for _, y in test_shards]),
+    )
+    model = xgboost.train({"objective": "binary:logistic"}, in_memory, 3)
+    streamed = compute_classification_metrics(model, (dtest, "test"), probabilities=True, chunk_size=30)
+    expected = compute_classification_metrics(model, (in_memory, "test"), probabilities=True)
+    assert streamed.keys() == expected.keys()
+    for name, value in expected.items():
+      assert numpy.isclose(streamed[name], value)
+    sampled = compute_classification_metrics(model, (dtest, "test"), sample_size=50)
+    assert sampled.keys() == {"test-accuracy", "test-F1", "test-recall", "test-precision"}
+
+  def test_run_with_data_iter(self, train_shards, test_shards):
+    run_context = RunContext(Mock(), Mock(assignments={}))
+    run_context.log_metrics = Mock()
+    run_context.log_metadata = Mock()
+    xgb_run = run(
+      {"objective": "binary:logistic"},
+      NumpyShardIter(train_shards),
+      num_boost_round=3,
+      evals=NumpyShardIter(test_shards),
+      run_options={"run": run_context, "autolog_feature_importances": False},
+    )
+    assert xgb_run.model.num_boosted_rounds() == 3
+    run_context.log_metadata.assert_any_call("Dataset rows", 300)
+    logged_metrics = {}
+    for metrics_call in run_context.log_metrics.call_args_list:
+      logged_metrics.update(metrics_call[0][0])
+    assert "TestSet-accuracy" in logged_metrics
+
+  def test_run_rejects_other_evals(self):
+    with pytest.raises(TypeError):
+      run({}, Mock(), evals="test")
+
+  def test_parquet_shards(self, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "shard.parquet"
+    pq.write_table(pa.table({"a": [0.1, 0.9], "b": [1.0, 2.0], "label": [0, 1]}), str(path))
+    (batch,) = iterate_batches(ParquetShardIter([str(path)], label_column="label"))
+    assert batch.feature_names == ["a", "b"]
+    assert batch.get_label().tolist() == [0, 1]
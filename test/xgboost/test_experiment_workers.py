@@ -0,0 +1,98 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import concurrent.futures
+import sys
+import threading
+
+import numpy
+import pytest
+import xgboost
+from mock import Mock, patch
+
+from sigopt.run_context import RunContext
+from sigopt.xgboost.experiment import XGBExperiment
+from sigopt.xgboost.run import parse_run_options
+
+
+def make_run(run_id):
+  run = RunContext(Mock(), Mock(id=run_id, assignments={"max_depth": 2}))
+  run.log_checkpoint = Mock()
+  return run
+
+
+class TestExperimentWorkers(object):
+  @pytest.fixture
+  def dtrain(self):
+    random_state = numpy.random.RandomState(0)
+    X = random_state.rand(200, 4)
+    return xgboost.DMatrix(X, label=(X[:, 0] > 0.5).astype(int))
+
+  def make_experiment(self, dtrain, params, n_workers):
+    xgb_experiment = XGBExperiment(
+      {"parallel_bandwidth": n_workers},
+      dtrain,
+      [(dtrain, "test")],
+      params,
+      3,
+      None,
+      parse_run_options(None),
+      n_workers=n_workers,
+    )
+    xgb_experiment.sigopt_experiment = Mock()
+    return xgb_experiment
+
+  def test_invalid_n_workers(self, dtrain):
+    with pytest.raises(ValueError):
+      self.make_experiment(dtrain, {}, 0)
+
+  def test_boosters_train_concurrently(self, dtrain):
+    xgb_experiment = self.make_experiment(dtrain, {"objective": "binary:logistic"}, 3)
+    runs = [make_run(str(i)) for i in range(6)]
+    trained = []
+    trained_lock = threading.Lock()
+    original_train = xgboost.train
+
+    def train(**kwargs):
+      with trained_lock:
+        trained.append((kwargs["params"], kwargs["callbacks"]))
+      return original_train(**kwargs)
+
+    def optimize(fn, workers, stop_on_failure):
+      with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fn, runs))
+      return []
+
+    xgb_experiment.sigopt_experiment.optimize.side_effect = optimize
+    experiment_module = sys.modules[XGBExperiment.__module__]
+    with patch.object(experiment_module, "get_available_cpu_count", return_value=8), patch(
+      "xgboost.train", side_effect=train
+    ):
+      xgb_experiment.run_experiment()
+    assert xgb_experiment.sigopt_experiment.optimize.call_args[1]["workers"] == 3
+    assert xgb_experiment.sigopt_experiment.optimize.call_args[1]["stop_on_failure"]
+    assert len(trained) == len(runs)
+    assert all(params["nthread"] == 2 for params, _ in trained)
+    callbacks = [callback for _, run_callbacks in trained for callback in run_callbacks]
+    assert sorted(callback.run.id for callback in callbacks) == [run.id for run in runs]
+    for run in runs:
+      assert run.log_checkpoint.called
+
+  def test_user_nthread_and_failures(self, dtrain):
+    xgb_experiment = self.make_experiment(dtrain, {"nthread": 1}, 2)
+    error = ValueError("failed trial")
+    xgb_experiment.sigopt_experiment.optimize.return_value = [("1", error)]
+    assert xgb_experiment.get_worker_params(2) == {"nthread": 1}
+    with pytest.raises(ValueError):
+      xgb_experiment.run_experiment()
+
+  def test_trial_bookkeeping_is_one_update(self, dtrain):
+    xgb_experiment = self.make_experiment(dtrain, {"objective": "binary:logistic"}, 1)
+    run = RunContext(Mock(), Mock(id="1", assignments={"max_depth": 2}))
+    xgb_experiment.run_trial(run, xgb_experiment.get_worker_params(1), xgb_experiment.run_options)
+    requests = [request_call[0] for request_call in run.connection.impl.request.call_args_list]
+    merges = [request for request in requests if request[0] == "MERGE"]
+    assert len(merges) == 1
+    body = merges[0][2]
+    assert "test-accuracy" in body["values"]
+    assert body["assignments"]["num_boost_round"] == 3
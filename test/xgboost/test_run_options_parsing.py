@@ -77,6 +77,14 @@ class TestRunOptionsParsing(object):
     with pytest.raises(TypeError):
       parse_run_options(run_options)
 
+  def test_run_options_metrics_scoring(self):
+    assert parse_run_options({})["metrics_chunk_size"] is None
+    assert parse_run_options({"metrics_chunk_size": 1000, "metrics_sample_size": None})["metrics_chunk_size"] == 1000
+    with pytest.raises(TypeError):
+      parse_run_options({"metrics_chunk_size": 0.5})
+    with pytest.raises(ValueError):
+      parse_run_options({"metrics_sample_size": 0})
+
   def test_run_options_run_and_name_keys(self):
     run_options = {
       "name": "test-run",
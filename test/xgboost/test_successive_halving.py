@@ -0,0 +1,178 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import threading
+
+import numpy
+import pytest
+import xgboost
+from mock import Mock
+
+from sigopt.run_context import RunContext
+from sigopt.xgboost.checkpoint_callback import SigOptCheckpointCallback
+from sigopt.xgboost.experiment import XGBExperiment
+from sigopt.xgboost.run import parse_run_options
+from sigopt.xgboost.successive_halving import SuccessiveHalving, SuccessiveHalvingTrial, get_rung_schedule
+
+
+EXPERIMENT_CONFIG = dict(
+  parameters=[
+    dict(name="eta", type="double", bounds={"min": 0.01, "max": 1}),
+    dict(name="num_boost_round", type="int", bounds={"min": 2, "max": 8}),
+  ],
+  metrics=[dict(name="accuracy", strategy="optimize", objective="maximize")],
+  parallel_bandwidth=1,
+)
+
+
+class TestSuccessiveHalving(object):
+  @pytest.fixture
+  def dtrain(self):
+    random_state = numpy.random.RandomState(0)
+    X = random_state.rand(300, 4)
+    return xgboost.DMatrix(X, label=(X[:, 0] + 0.2 * random_state.rand(300) > 0.6).astype(int))
+
+  def make_experiment(self, dtrain, n_workers=1):
+    xgb_experiment = XGBExperiment(
+      EXPERIMENT_CONFIG,
+      dtrain,
+      [(dtrain, "test")],
+      {"objective": "binary:logistic"},
+      None,
+      None,
+      parse_run_options(None),
+      n_workers=n_workers,
+      successive_halving=True,
+      reduction_factor=2,
+    )
+    xgb_experiment.parse_and_create_metrics()
+    xgb_experiment.parse_and_create_parameters()
+    xgb_experiment.parse_fidelity()
+    xgb_experiment.experiment_config_parsed["parallel_bandwidth"] = n_workers
+    return xgb_experiment
+
+  def test_rung_schedule(self):
+    assert get_rung_schedule(10, 200, 3) == [10, 30, 90, 200]
+    assert get_rung_schedule(5, 5, 3) == [5]
+    with pytest.raises(ValueError):
+      get_rung_schedule(10, 200, 1)
+    with pytest.raises(ValueError):
+      get_rung_schedule(0, 200, 3)
+
+  def test_fidelity_removed_from_search_space(self, dtrain):
+    xgb_experiment = self.make_experiment(dtrain)
+    assert [p["name"] for p in xgb_experiment.experiment_config_parsed["parameters"]] == ["eta"]
+    assert (xgb_experiment.min_num_boost_round, xgb_experiment.max_num_boost_round) == (2, 8)
+
+  @pytest.mark.parametrize("n_workers", [1, 2])
+  def test_runs(self, dtrain, n_workers):
+    xgb_experiment = self.make_experiment(dtrain, n_workers=n_workers)
+    runs = [
+      RunContext(Mock(), Mock(id=str(i), assignments={"eta": eta}))
+      for i, eta in enumerate([0.01, 1, 0.02, 0.5, 0.03, 0.8])
+    ]
+    lock = threading.Lock()
+    open_runs = []
+    max_open_runs = []
+
+    def create_run_within_budget():
+      with lock:
+        if not runs:
+          return None
+        run = runs.pop(0)
+        open_runs.append(run)
+        max_open_runs.append(len(open_runs))
+      end = run._end
+
+      def end_run(exception):
+        with lock:
+          open_runs.remove(run)
+        end(exception)
+
+      run._end = end_run
+      created_runs.append(run)
+      return run
+
+    created_runs = []
+    sigopt_experiment = Mock()
+    sigopt_experiment.create_run_within_budget.side_effect = create_run_within_budget
+    xgb_experiment.sigopt_experiment = sigopt_experiment
+    xgb_experiment.run_experiment()
+
+    assert len(created_runs) == 6
+    assert max(max_open_runs) <= n_workers
+    assert not open_runs
+    assert any(run.params["num_boost_round"] == 8 for run in created_runs)
+    for run in created_runs:
+      if run.params["num_boost_round"] < 8:
+        assert "successive halving" in run.stopping_reason
+      else:
+        assert run.stopping_reason is None
+    assert any(run.stopping_reason for run in created_runs)
+
+  def test_promotion(self, dtrain):
+    successive_halving = SuccessiveHalving(self.make_experiment(dtrain), 2, 2, 8)
+    assert successive_halving.promote(0, 0.5)
+    assert not successive_halving.promote(0, 0.4)
+    assert successive_halving.promote(0, 0.6)
+    assert not successive_halving.promote(0, 0.45)
+    assert not successive_halving.promote(0, float("nan"))
+    assert successive_halving.promote(1, 0.1)
+
+  def test_trial_bookkeeping_is_one_update(self, dtrain):
+    xgb_experiment = self.make_experiment(dtrain)
+    xgb_experiment.early_stopping_round_used_sigopt_default = True
+    successive_halving = SuccessiveHalving(xgb_experiment, 2, 2, 8)
+    run = RunContext(Mock(), Mock(id="1", assignments={"eta": 1}))
+    successive_halving.run_trial(run, {"objective": "binary:logistic"}, xgb_experiment.run_options)
+    merges = [request[0] for request in run.connection.impl.request.call_args_list if request[0][0] == "MERGE"]
+    # one update for the metrics of each rung, and one for the metadata, parameters and their sources
+    assert len(merges) == len(successive_halving.rungs) + 1
+    body = merges[-1][2]
+    assert "assignments_sources" in body
+    assert body["assignments"]["num_boost_round"] == 8
+
+  def test_checkpoint_epochs_continue_across_rungs(self, dtrain):
+    xgb_experiment = self.make_experiment(dtrain)
+    run = RunContext(Mock(), Mock(id="1", assignments={"eta": 1}))
+    trial = SuccessiveHalvingTrial(
+      run,
+      {"objective": "binary:logistic"},
+      dtrain,
+      xgb_experiment.evals,
+      None,
+      xgb_experiment.run_options,
+      8,
+    )
+    (checkpoint_callback,) = [
+      callback for callback in trial.handler.callbacks if isinstance(callback, SigOptCheckpointCallback)
+    ]
+    start_epochs = []
+    for num_boost_round in [2, 4, 8]:
+      trial.train(num_boost_round, "test-accuracy")
+      start_epochs.append(checkpoint_callback.start_epoch)
+    assert start_epochs == [0, 2, 4]
+
+  def test_multiple_optimized_metrics(self, dtrain):
+    config = dict(
+      EXPERIMENT_CONFIG,
+      metrics=[
+        dict(name="accuracy", strategy="optimize", objective="maximize"),
+        dict(name="F1", strategy="optimize", objective="maximize"),
+      ],
+    )
+    xgb_experiment = XGBExperiment(
+      config,
+      dtrain,
+      [(dtrain, "test")],
+      {"objective": "binary:logistic"},
+      None,
+      None,
+      parse_run_options(None),
+      successive_halving=True,
+      reduction_factor=2,
+    )
+    xgb_experiment.parse_and_create_metrics()
+    xgb_experiment.parse_and_create_parameters()
+    with pytest.raises(ValueError, match="single metric"):
+      xgb_experiment.parse_fidelity()
@@ -0,0 +1,48 @@
+# Copyright © 2022 Intel Corporation
+#
+# SPDX-License-Identifier: MIT
+import statistics
+import subprocess  # nosec
+import sys
+import time
+
+import click
+
+from sigopt.cli import cli
+
+
+def iter_command_paths(group, ctx, prefix=()):
+  for name in group.list_commands(ctx):
+    command = group.get_command(ctx, name)
+    path = (*prefix, name)
+    yield path
+    if isinstance(command, click.Group):
+      yield from iter_command_paths(command, ctx, path)
+
+
+def time_process(args, repeat):
+  durations = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], capture_output=True, check=True)  # nosec
+    durations.append(time.perf_counter() - start)
+  return durations
+
+
+def print_row(label, durations):
+  print(f"{label:<36} {statistics.median(durations) * 1000:>10.1f} {min(durations) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+  import argparse
+
+  parser = argparse.ArgumentParser(description="Measure the startup time of each sigopt CLI command.")
+  parser.add_argument("--repeat", type=int, default=10, help="number of runs per command")
+  args = parser.parse_args()
+  with click.Context(cli) as ctx:
+    command_paths = [()] + list(iter_command_paths(cli, ctx))
+  print(f"{'command':<36} {'median ms':>10} {'min ms':>10}")
+  print_row("python -c pass", time_process(["-c", "pass"], args.repeat))
+  print_row("python -c 'import sigopt'", time_process(["-c", "import sigopt"], args.repeat))
+  for path in command_paths:
+    print_row(" ".join(("sigopt", *path, "--help")), time_process(["-m", "sigopt.cli", *path, "--help"], args.repeat))